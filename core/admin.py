@@ -1,11 +1,80 @@
+from datetime import date
+
 from django.contrib import admin
-from .models import Paciente, Profissional, Agendamento, Consulta, Servico
+from django.utils import timezone
+from django.utils.html import format_html
+from .models import Paciente, Profissional, JornadaTrabalho, Agendamento, Consulta, Servico, Tarefa, LembreteAgendamento
+from .dateranges import inicio_do_dia
+from .forms import AgendamentoAdminForm
+from .pagination import PaginadorEstimado
+from .scheduling import salvar_agendamento
+from .search import buscar_pacientes
+
+class ListagemGrandeMixin:
+    """
+    Changelists de tabelas grandes: sem o segundo ``COUNT(*)`` da tabela
+    inteira e com contagem estimada quando não há filtro.
+    """
+    paginator = PaginadorEstimado
+    show_full_result_count = False
+
+class BuscaPacienteMixin:
+    """
+    Busca pelo paciente via ``core.search`` (FTS5/trigram/prefixo indexado)
+    em vez de ``icontains`` com joins; ``campo_paciente`` é o caminho até
+    o paciente.
+    """
+    campo_paciente = None
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        if self.campo_paciente is None:
+            return buscar_pacientes(queryset, search_term), False
+        pacientes = buscar_pacientes(Paciente.objects.all(), search_term).values('pk')
+        return queryset.filter(**{f'{self.campo_paciente}__in': pacientes}), False
+
+class FiltroAno(admin.SimpleListFilter):
+    """
+    Alternativa ao ``date_hierarchy``, cuja lista de anos é um ``SELECT
+    DISTINCT`` sobre a tabela inteira: aqui os anos vêm do primeiro e do
+    último valor (duas buscas no índice) e o filtro é um intervalo semiaberto.
+    """
+    title = 'ano'
+    parameter_name = 'ano'
+    campo = None
+
+    def lookups(self, request, model_admin):
+        # MIN e MAX na mesma query fazem o SQLite percorrer a tabela.
+        valores = model_admin.model._default_manager.values_list(self.campo, flat=True)
+        primeiro = valores.order_by(self.campo).first()
+        if primeiro is None:
+            return []
+        ultimo = valores.order_by(f'-{self.campo}').first()
+        anos = range(timezone.localtime(ultimo).year, timezone.localtime(primeiro).year - 1, -1)
+        return [(str(ano), str(ano)) for ano in anos]
+
+    def queryset(self, request, queryset):
+        if not (self.value() or '').isdigit():
+            return queryset
+        ano = int(self.value())
+        return queryset.filter(**{
+            f'{self.campo}__gte': inicio_do_dia(date(ano, 1, 1)),
+            f'{self.campo}__lt': inicio_do_dia(date(ano + 1, 1, 1)),
+        })
+
+class AnoDataHoraFiltro(FiltroAno):
+    campo = 'data_hora'
+
+class AnoCriadoEmFiltro(FiltroAno):
+    campo = 'criado_em'
 
 @admin.register(Paciente)
-class PacienteAdmin(admin.ModelAdmin):
+class PacienteAdmin(ListagemGrandeMixin, BuscaPacienteMixin, admin.ModelAdmin):
     list_display = ['nome', 'cpf', 'telefone', 'idade', 'ativo', 'criado_em']
     list_filter = ['ativo', 'sexo', 'criado_em']
-    search_fields = ['nome', 'cpf', 'telefone', 'email']
+    search_fields = ['nome', 'cpf', 'telefone']
+    search_help_text = 'Nome (início das palavras), CPF ou telefone'
     list_editable = ['ativo']
     ordering = ['nome']
     
@@ -20,33 +89,108 @@ class PacienteAdmin(admin.ModelAdmin):
             'fields': ('observacoes', 'ativo')
         }),
     )
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).com_idade()
+    
+    @admin.display(description='Idade', ordering='idade_anos')
+    def idade(self, obj):
+        return obj.idade_anos
+
+class JornadaTrabalhoInline(admin.TabularInline):
+    model = JornadaTrabalho
+    extra = 0
 
 @admin.register(Profissional)
 class ProfissionalAdmin(admin.ModelAdmin):
-    list_display = ['nome', 'especialidade', 'crm', 'telefone', 'ativo']
+    list_display = ['nome', 'especialidade', 'crm', 'telefone', 'duracao_consulta', 'ativo']
     list_filter = ['ativo', 'especialidade']
     search_fields = ['nome', 'crm', 'especialidade']
     list_editable = ['ativo']
+    inlines = [JornadaTrabalhoInline]
 
 @admin.register(Agendamento)
-class AgendamentoAdmin(admin.ModelAdmin):
-    list_display = ['paciente', 'profissional', 'data_hora', 'status']
-    list_filter = ['status', 'profissional', 'data_hora']
-    search_fields = ['paciente__nome', 'profissional__nome']
+class AgendamentoAdmin(ListagemGrandeMixin, BuscaPacienteMixin, admin.ModelAdmin):
+    list_display = ['paciente', 'profissional', 'data_hora', 'duracao', 'status']
+    # Com o JOIN, o SQLite escolhe varrer pacientes e ordenar tudo; sem ele,
+    # a página sai do índice de data_hora e as relações vêm por prefetch.
+    list_select_related = ()
+    list_filter = ['status', 'profissional', AnoDataHoraFiltro, 'data_hora']
+    search_fields = ['paciente__nome']
+    search_help_text = 'Nome, CPF ou telefone do paciente'
+    campo_paciente = 'paciente'
     list_editable = ['status']
-    date_hierarchy = 'data_hora'
+    raw_id_fields = ['paciente']
+    form = AgendamentoAdminForm
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('paciente', 'profissional')
+    
+    def get_changelist_form(self, request, **kwargs):
+        # Mudar o status na listagem pode devolver um horário liberado à agenda.
+        return super().get_changelist_form(request, form=AgendamentoAdminForm, **kwargs)
+    
+    def save_model(self, request, obj, form, change):
+        salvar_agendamento(obj)
 
 @admin.register(Consulta)
-class ConsultaAdmin(admin.ModelAdmin):
-    list_display = ['agendamento', 'valor', 'pago', 'criado_em']
-    list_filter = ['pago', 'criado_em']
+class ConsultaAdmin(ListagemGrandeMixin, BuscaPacienteMixin, admin.ModelAdmin):
+    list_display = ['paciente', 'data_hora', 'valor', 'pago', 'criado_em']
+    list_select_related = ['agendamento__paciente']
+    list_filter = ['pago', AnoCriadoEmFiltro, 'criado_em']
     search_fields = ['agendamento__paciente__nome']
+    search_help_text = 'Nome, CPF ou telefone do paciente'
+    campo_paciente = 'agendamento__paciente'
     list_editable = ['pago']
-    date_hierarchy = 'criado_em'
+    raw_id_fields = ['agendamento']
+    
+    @admin.display(description='Paciente', ordering='agendamento__paciente__nome')
+    def paciente(self, obj):
+        return obj.agendamento.paciente.nome
+    
+    @admin.display(description='Data/Hora', ordering='agendamento__data_hora')
+    def data_hora(self, obj):
+        return obj.agendamento.data_hora
 
 @admin.register(Servico)
 class ServicoAdmin(admin.ModelAdmin):
     list_display = ['nome', 'valor', 'ativo', 'criado_em']
     list_filter = ['ativo']
     search_fields = ['nome', 'descricao']
-    list_editable = ['ativo']
\ No newline at end of file
+    list_editable = ['ativo']
+
+@admin.register(Tarefa)
+class TarefaAdmin(ListagemGrandeMixin, admin.ModelAdmin):
+    list_display = ['__str__', 'status', 'barra_progresso', 'mensagem', 'tentativas', 'executar_apos', 'concluido_em']
+    list_filter = ['status', 'nome', AnoCriadoEmFiltro]
+    search_fields = ['nome', 'mensagem']
+    actions = ['reenfileirar']
+    readonly_fields = [
+        'nome', 'argumentos', 'status', 'tentativas', 'progresso', 'mensagem', 'resultado', 'erro',
+        'worker', 'criado_em', 'iniciado_em', 'concluido_em',
+    ]
+    
+    @admin.display(description='Progresso', ordering='progresso')
+    def barra_progresso(self, obj):
+        return format_html('<progress value="{}" max="100"></progress> {}%', obj.progresso, obj.progresso)
+    
+    @admin.action(description='Reenfileirar tarefas selecionadas')
+    def reenfileirar(self, request, queryset):
+        total = queryset.exclude(status='executando').update(
+            status='pendente', tentativas=0, progresso=0, erro='', executar_apos=timezone.now()
+        )
+        self.message_user(request, f'{total} tarefa(s) reenfileirada(s).')
+    
+    def has_add_permission(self, request):
+        return False
+
+@admin.register(LembreteAgendamento)
+class LembreteAgendamentoAdmin(ListagemGrandeMixin, admin.ModelAdmin):
+    list_display = ['agendamento', 'email', 'status', 'criado_em', 'enviado_em']
+    list_select_related = ['agendamento__paciente']
+    list_filter = ['status', 'criado_em']
+    search_fields = ['email', 'agendamento__paciente__nome']
+    readonly_fields = ['agendamento', 'data_hora', 'email', 'status', 'lote', 'erro', 'criado_em', 'enviado_em']
+    
+    def has_add_permission(self, request):
+        return False
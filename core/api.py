@@ -0,0 +1,144 @@
+"""
+API JSON somente leitura (``/consultorio/api/...``).
+
+As respostas levam ``ETag`` forte e ``Last-Modified`` derivados dos
+contadores de versão de ``core.caching``: enquanto nenhum modelo de que o
+endpoint depende for alterado, requisições condicionais (``If-None-Match``)
+recebem ``304`` sem tocar no banco. Isso torna barato o polling do
+dashboard. Nos endpoints do dia (dashboard e agenda) os dois validadores
+também mudam à meia-noite.
+"""
+import hashlib
+from datetime import date, timedelta
+
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.views.decorators.http import condition, require_GET
+
+from .models import Paciente, Agendamento, Profissional
+from .caching import estatisticas_dashboard, versoes_modelos, ultima_modificacao
+from .dateranges import inicio_do_dia, intervalo_dias
+from .pagination import KeysetPaginator
+from .search import buscar_pacientes
+from .scheduling import horarios_livres
+from .routers import usar_replica
+
+POR_PAGINA = 50
+MAX_DIAS_HORARIOS = 92
+
+DEPENDENCIAS = {
+    'dashboard': ('paciente', 'agendamento', 'consulta'),
+    'agenda': ('agendamento', 'paciente', 'profissional'),
+    'pacientes': ('paciente',),
+}
+# Endpoints cujo conteúdo muda com a virada do dia, mesmo sem gravações
+POR_DIA = frozenset({'dashboard', 'agenda'})
+
+
+def _etag(endpoint):
+    """ETag = hash do endpoint, do dia local, da query string e das versões"""
+    def etag_func(request, *args, **kwargs):
+        modelos = DEPENDENCIAS[endpoint]
+        versoes = versoes_modelos(modelos)
+        partes = [endpoint, timezone.localdate().isoformat(), request.GET.urlencode()]
+        partes += [f'{modelo}={versoes[modelo]}' for modelo in modelos]
+        return hashlib.sha1('|'.join(partes).encode()).hexdigest()
+    return etag_func
+
+
+def _last_modified(endpoint):
+    """Última alteração dos modelos; nos endpoints ``POR_DIA``, no mínimo o início do dia"""
+    def last_modified_func(request, *args, **kwargs):
+        modificado = ultima_modificacao(DEPENDENCIAS[endpoint])
+        if endpoint in POR_DIA:
+            inicio = inicio_do_dia(timezone.localdate())
+            modificado = inicio if modificado is None else max(modificado, inicio)
+        return modificado
+    return last_modified_func
+
+
+def _condicional(endpoint):
+    return condition(etag_func=_etag(endpoint), last_modified_func=_last_modified(endpoint))
+
+
+def agendamento_json(agendamento):
+    return {
+        'id': agendamento.id,
+        'data_hora': timezone.localtime(agendamento.data_hora).isoformat(),
+        'status': agendamento.status,
+        'status_display': agendamento.get_status_display(),
+        'paciente': {'id': agendamento.paciente_id, 'nome': agendamento.paciente.nome},
+        'profissional': {'id': agendamento.profissional_id, 'nome': agendamento.profissional.nome},
+    }
+
+
+def paciente_json(paciente):
+    return {
+        'id': paciente.id,
+        'nome': paciente.nome,
+        'cpf': paciente.cpf,
+        'telefone': paciente.telefone,
+        'email': paciente.email,
+        'data_nascimento': paciente.data_nascimento.isoformat(),
+        'ativo': paciente.ativo,
+    }
+
+
+@usar_replica
+@require_GET
+@_condicional('dashboard')
+def dashboard(request):
+    """KPIs do dashboard"""
+    return JsonResponse(estatisticas_dashboard().as_context())
+
+
+@usar_replica
+@require_GET
+@_condicional('agenda')
+def agenda(request):
+    """Agendamentos de hoje, paginados por cursor"""
+    inicio, fim = intervalo_dias(timezone.localdate())
+    pagina = KeysetPaginator(
+        Agendamento.objects.para_lista().filter(data_hora__gte=inicio, data_hora__lt=fim),
+        campos=('data_hora', 'id'),
+        tamanho=POR_PAGINA
+    ).pagina(request.GET.get('cursor'))
+    return JsonResponse({
+        'resultados': [agendamento_json(agendamento) for agendamento in pagina],
+        'proximo_cursor': pagina.proximo_cursor,
+    })
+
+
+@require_GET
+@_condicional('pacientes')
+def pacientes(request):
+    """Busca de pacientes ativos, paginada por cursor"""
+    queryset = buscar_pacientes(Paciente.objects.ativos().para_lista(), request.GET.get('busca', ''))
+    pagina = KeysetPaginator(
+        queryset, campos=('nome', 'id'), tamanho=POR_PAGINA
+    ).pagina(request.GET.get('cursor'))
+    return JsonResponse({
+        'resultados': [paciente_json(paciente) for paciente in pagina],
+        'proximo_cursor': pagina.proximo_cursor,
+    })
+
+
+@require_GET
+def horarios(request, profissional_id):
+    """Horários livres de um profissional (``?inicio=AAAA-MM-DD&fim=AAAA-MM-DD``)"""
+    profissional = get_object_or_404(Profissional, pk=profissional_id, ativo=True)
+    try:
+        inicio = date.fromisoformat(request.GET.get('inicio') or timezone.localdate().isoformat())
+        fim = date.fromisoformat(request.GET.get('fim') or inicio.isoformat())
+    except ValueError:
+        return JsonResponse({'erro': 'Datas devem estar no formato AAAA-MM-DD.'}, status=400)
+    if fim < inicio or fim - inicio > timedelta(days=MAX_DIAS_HORARIOS):
+        return JsonResponse({'erro': f'Período inválido (máximo de {MAX_DIAS_HORARIOS} dias).'}, status=400)
+    
+    livres = horarios_livres(profissional, inicio, fim)
+    return JsonResponse({
+        'profissional': {'id': profissional.id, 'nome': profissional.nome},
+        'duracao': profissional.duracao_consulta,
+        'horarios': [timezone.localtime(horario.inicio).isoformat() for horario in livres],
+    })
@@ -2,4 +2,8 @@
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'core'
\ No newline at end of file
+    name = 'core'
+
+    def ready(self):
+        from . import signals  # noqa: F401 - registra os receivers
+        from . import jobs  # noqa: F401 - registra as tarefas em segundo plano
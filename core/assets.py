@@ -0,0 +1,160 @@
+"""
+Pacotes de CSS/JS por página, minificados e pré-comprimidos.
+
+Cada página carrega um único CSS e um único JS: os arquivos-fonte de
+``PACOTES`` são concatenados e minificados em ``pacotes/<nome>.<tipo>``
+durante o ``collectstatic`` (ver ``core.storage.ArmazenamentoEstatico``),
+que também acrescenta o hash do conteúdo ao nome e grava ao lado as versões
+``.gz`` e ``.br`` (esta só com o pacote ``brotli`` instalado).
+
+Em desenvolvimento (``PULSE_PACOTES_ESTATICOS`` falso, padrão quando
+``DEBUG``) as tags ``{% pacote_css %}``/``{% pacote_js %}`` apontam para os
+arquivos-fonte, sem precisar de build.
+
+A minificação é conservadora: no CSS remove comentários e espaços fora de
+strings; no JS só indentação, linhas vazias e comentários de linha inteira
+— o grosso da economia vem da compressão.
+"""
+import gzip
+import mimetypes
+import posixpath
+import re
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:  # dependência opcional
+    brotli = None
+
+PACOTES = {
+    'base': {
+        'css': ['css/base.css'],
+        'js': ['js/base.js'],
+    },
+    'dashboard': {
+        'css': ['css/base.css', 'css/paginas/dashboard.css'],
+        'js': ['js/base.js', 'js/paginas/dashboard.js'],
+    },
+    'agenda': {
+        'css': ['css/base.css', 'css/paginas/agenda.css'],
+        'js': ['js/base.js', 'js/paginas/agenda.js'],
+    },
+    'pacientes': {
+        'css': ['css/base.css', 'css/paginas/pacientes.css'],
+        'js': ['js/base.js', 'js/paginas/pacientes.js'],
+    },
+    'financeiro': {
+        'css': ['css/paginas/financeiro.css'],
+    },
+    'admin': {
+        'css': ['admin/css/pulse_admin.css', 'admin/css/pulse_perfect.css', 'admin/css/pulse_base_site.css'],
+        'js': ['admin/js/pulse_admin.js'],
+    },
+}
+DIRETORIO_PACOTES = 'pacotes'
+EXTENSOES_COMPRIMIVEIS = ('.css', '.js', '.svg', '.json', '.map', '.txt', '.html', '.xml')
+TAMANHO_MINIMO_COMPRESSAO = 512  # bytes
+CACHE_IMUTAVEL = 'public, max-age=31536000, immutable'
+CACHE_SEM_HASH = 'public, max-age=300'
+# Nomes gerados pelo ManifestStaticFilesStorage: ``nome.<12 hex>.ext``
+_NOME_COM_HASH = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+
+_STRING_OU_COMENTARIO = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|/\*.*?\*/', re.S)
+_ESPACOS_CSS = re.compile(r'\s+')
+_ESPACOS_EM_TORNO = re.compile(r'\s*([{};,>])\s*')
+
+
+def usar_pacotes():
+    return getattr(settings, 'PULSE_PACOTES_ESTATICOS', not settings.DEBUG)
+
+
+def caminho_pacote(nome, tipo):
+    return f'{DIRETORIO_PACOTES}/{nome}.{tipo}'
+
+
+def arquivos_da_pagina(nome, tipo):
+    """Caminhos estáticos a incluir para o pacote ``nome``: o pacote ou as fontes"""
+    fontes = PACOTES[nome].get(tipo, [])
+    if fontes and usar_pacotes():
+        return [caminho_pacote(nome, tipo)]
+    return fontes
+
+
+def minificar_css(codigo):
+    partes = []
+    fim = 0
+    for trecho in _STRING_OU_COMENTARIO.finditer(codigo):
+        partes.append(_minificar_trecho_css(codigo[fim:trecho.start()]))
+        partes.append(trecho.group(1) or '')  # strings ficam; comentários saem
+        fim = trecho.end()
+    partes.append(_minificar_trecho_css(codigo[fim:]))
+    return ''.join(partes).strip()
+
+
+def _minificar_trecho_css(trecho):
+    return _ESPACOS_EM_TORNO.sub(r'\1', _ESPACOS_CSS.sub(' ', trecho)).replace(';}', '}')
+
+
+def minificar_js(codigo):
+    linhas = (linha.strip() for linha in codigo.splitlines())
+    return '\n'.join(linha for linha in linhas if linha and not linha.startswith('//'))
+
+
+def montar_pacote(ler, fontes, tipo):
+    """Concatena e minifica ``fontes``; ``ler(caminho)`` devolve o texto de cada uma"""
+    if tipo == 'css':
+        return '\n'.join(minificar_css(ler(fonte)) for fonte in fontes) + '\n'
+    # ``;`` entre arquivos evita que um sem ponto e vírgula final emende no próximo.
+    return ';\n'.join(minificar_js(ler(fonte)) for fonte in fontes) + '\n'
+
+
+def comprimivel(caminho):
+    return caminho.endswith(EXTENSOES_COMPRIMIVEIS)
+
+
+def comprimir(conteudo):
+    """Versões ``{'.gz': bytes, '.br': bytes}`` menores que o original"""
+    versoes = {'.gz': gzip.compress(conteudo, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        versoes['.br'] = brotli.compress(conteudo, quality=11)
+    return {sufixo: dados for sufixo, dados in versoes.items() if len(dados) < len(conteudo)}
+
+
+def resposta_estatico(request, caminho, raiz):
+    """
+    Serve ``caminho`` de ``raiz`` (``STATIC_ROOT``) escolhendo a versão
+    pré-comprimida aceita pelo cliente. ``None`` se o arquivo não existir.
+    """
+    caminho = posixpath.normpath(caminho).lstrip('/')
+    if caminho.startswith('..') or caminho.endswith(('.gz', '.br')):
+        return None
+    arquivo = raiz / caminho
+    if not arquivo.is_file():
+        return None
+
+    aceitas = request.headers.get('Accept-Encoding', '')
+    escolhido, codificacao = arquivo, None
+    for sufixo, nome in (('.br', 'br'), ('.gz', 'gzip')):
+        alternativa = arquivo.with_name(arquivo.name + sufixo)
+        if nome in aceitas and alternativa.is_file():
+            escolhido, codificacao = alternativa, nome
+            break
+
+    estado = escolhido.stat()
+    if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), estado.st_mtime):
+        return HttpResponseNotModified()
+    content_type = mimetypes.guess_type(arquivo.name)[0] or 'application/octet-stream'
+    response = FileResponse(escolhido.open('rb'), content_type=content_type)
+    del response.headers['Content-Disposition']
+    response.headers['Last-Modified'] = http_date(estado.st_mtime)
+    response.headers['Cache-Control'] = CACHE_IMUTAVEL if _NOME_COM_HASH.search(caminho) else CACHE_SEM_HASH
+    if codificacao:
+        response.headers['Content-Encoding'] = codificacao
+    if comprimivel(caminho):
+        patch_vary_headers(response, ['Accept-Encoding'])
+    return response
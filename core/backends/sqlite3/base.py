@@ -0,0 +1,61 @@
+"""
+Backend SQLite do Pulse para instalações pequenas com escrita concorrente.
+
+É o backend do Django com duas diferenças:
+
+* PRAGMAs aplicados em toda conexão nova (``PRAGMAS_PADRAO``, ajustáveis
+  em ``OPTIONS['pragmas']``; ``None`` remove um padrão): journal em WAL,
+  para que leituras não bloqueiem a escrita e vice-versa; ``busy_timeout``,
+  para esperar pelo lock em vez de falhar na hora; ``synchronous=NORMAL``,
+  seguro com WAL e sem um fsync por commit; ``mmap_size`` e ``cache_size``
+  maiores que os padrões do SQLite.
+* Transações abertas com ``BEGIN IMMEDIATE`` (``OPTIONS['transaction_mode']``,
+  mesmo nome da opção que o Django 5.1 passou a ter). Com o ``BEGIN``
+  padrão (DEFERRED) uma transação que lê e depois escreve só pede o lock de
+  escrita no meio; se outra escreveu antes, o SQLite devolve "database is
+  locked" na hora, sem passar pelo ``busy_timeout``. Com IMMEDIATE o lock é
+  pedido no início e a espera funciona.
+
+Uso: ``'ENGINE': 'core.backends.sqlite3'`` em ``DATABASES``.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS
+from django.db.backends.sqlite3 import base
+
+PRAGMAS_PADRAO = {
+    'journal_mode': 'WAL',
+    'busy_timeout': 5000,  # ms
+    'synchronous': 'NORMAL',
+    'mmap_size': 128 * 1024 * 1024,  # bytes
+    'cache_size': -20000,  # negativo = KiB (~20 MB por conexão)
+}
+MODOS_TRANSACAO = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def __init__(self, settings_dict, alias=DEFAULT_DB_ALIAS):
+        super().__init__(settings_dict, alias)
+        opcoes = self.settings_dict['OPTIONS']
+        self.pragmas = {**PRAGMAS_PADRAO, **opcoes.get('pragmas', {})}
+        self.modo_transacao = opcoes.get('transaction_mode', 'IMMEDIATE').upper()
+        if self.modo_transacao not in MODOS_TRANSACAO:
+            raise ImproperlyConfigured(
+                f"transaction_mode deve ser um de {', '.join(MODOS_TRANSACAO)} (recebido: {self.modo_transacao})"
+            )
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        kwargs.pop('pragmas', None)
+        kwargs.pop('transaction_mode', None)
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for nome, valor in self.pragmas.items():
+            if valor is not None:
+                conn.execute(f'PRAGMA {nome} = {valor}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {self.modo_transacao}')
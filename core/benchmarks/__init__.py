@@ -0,0 +1,20 @@
+"""
+Suíte de benchmarks das views do Pulse.
+
+Para cada tamanho de base, semeia dados sintéticos (``core.loadgen``) numa
+transação que é desfeita ao final, exercita cada cenário de
+``cenarios.CENARIOS`` pelo test client e registra, por view:
+
+* tempo de parede (p50/p95 das repetições);
+* número de queries e tempo total de SQL;
+* pico de memória alocada (``tracemalloc``, medido numa execução à parte
+  para não distorcer os tempos).
+
+O resultado é um dicionário serializável em JSON; ``comparar`` aponta as
+regressões em relação a um resultado anterior. Uso pelo comando
+``benchmark_views``.
+"""
+from .executor import executar_suite
+from .comparacao import comparar, Regressao
+
+__all__ = ['executar_suite', 'comparar', 'Regressao']
@@ -0,0 +1,16 @@
+"""Cenários medidos: (nome, nome da URL, parâmetros GET)"""
+
+CENARIOS = [
+    ('dashboard', 'core:dashboard', {}),
+    ('agenda', 'core:agenda', {}),
+    ('pacientes', 'core:pacientes', {}),
+    ('pacientes_busca_nome', 'core:pacientes', {'busca': 'silva'}),
+    ('pacientes_busca_cpf', 'core:pacientes', {'busca': '123.4'}),
+    ('financeiro', 'core:financeiro', {}),
+    ('api_dashboard', 'core:api_dashboard', {}),
+    ('api_agenda', 'core:api_agenda', {}),
+    ('api_pacientes', 'core:api_pacientes', {}),
+    ('admin_pacientes', 'admin:core_paciente_changelist', {}),
+    ('admin_agendamentos', 'admin:core_agendamento_changelist', {}),
+    ('admin_consultas', 'admin:core_consulta_changelist', {}),
+]
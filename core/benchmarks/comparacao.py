@@ -0,0 +1,46 @@
+from dataclasses import dataclass
+
+# Diferenças absolutas abaixo destes valores são tratadas como ruído.
+TOLERANCIA_TEMPO_MS = 1.0
+TOLERANCIA_MEMORIA_KB = 64.0
+
+
+@dataclass(frozen=True)
+class Regressao:
+    tamanho: str
+    cenario: str
+    metrica: str
+    antes: float
+    depois: float
+
+    def __str__(self):
+        return f'[{self.tamanho}] {self.cenario}.{self.metrica}: {self.antes} -> {self.depois}'
+
+
+def comparar(base, atual, limite=0.2):
+    """
+    Regressões de ``atual`` em relação a ``base`` (resultados de
+    ``executar_suite``). Tempo e memória regridem quando crescem mais que
+    ``limite`` (fração) e além da tolerância de ruído; qualquer query a
+    mais é regressão.
+    """
+    regressoes = []
+    for tamanho, cenarios in atual['resultados'].items():
+        anteriores = base['resultados'].get(tamanho, {})
+        for cenario, metricas in cenarios.items():
+            antes = anteriores.get(cenario)
+            if antes is None:
+                continue
+            checagens = [
+                ('tempo_ms_p50', TOLERANCIA_TEMPO_MS, limite),
+                ('tempo_sql_ms', TOLERANCIA_TEMPO_MS, limite),
+                ('memoria_pico_kb', TOLERANCIA_MEMORIA_KB, limite),
+                ('queries', 0, 0),
+            ]
+            for metrica, tolerancia, fracao in checagens:
+                if metrica not in antes:
+                    continue
+                valor_antes, valor_depois = antes[metrica], metricas[metrica]
+                if valor_depois > valor_antes * (1 + fracao) and valor_depois - valor_antes > tolerancia:
+                    regressoes.append(Regressao(tamanho, cenario, metrica, valor_antes, valor_depois))
+    return regressoes
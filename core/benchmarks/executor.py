@@ -0,0 +1,109 @@
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+import django
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.loadgen import GeradorCarga
+from .cenarios import CENARIOS
+
+AGENDAMENTOS_POR_PACIENTE = 3
+
+
+def _percentil(valores, fracao):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(fracao * (len(ordenados) - 1))))]
+
+
+def _commit_atual():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def medir_cenario(client, url, params, repeticoes):
+    """Métricas de um cenário; a primeira execução aquece e não entra na conta"""
+    client.get(url, params)
+
+    tempos, tempos_sql, queries = [], [], 0
+    for _ in range(repeticoes):
+        with CaptureQueriesContext(connection) as capturadas:
+            inicio = time.perf_counter()
+            resposta = client.get(url, params)
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        if resposta.status_code != 200:
+            raise RuntimeError(f'{url} respondeu {resposta.status_code}')
+        queries = len(capturadas)
+        tempos_sql.append(sum(float(q['time']) for q in capturadas.captured_queries) * 1000)
+
+    tracemalloc.start()
+    try:
+        client.get(url, params)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'tempo_ms_p50': round(statistics.median(tempos), 3),
+        'tempo_ms_p95': round(_percentil(tempos, 0.95), 3),
+        'queries': queries,
+        'tempo_sql_ms': round(statistics.median(tempos_sql), 3),
+        'memoria_pico_kb': round(pico / 1024, 1),
+    }
+
+
+def executar_suite(tamanhos, repeticoes=10, seed=42, cenarios=None, com_cache=False, progresso=None):
+    """Executa os cenários para cada tamanho (número de pacientes) e devolve o resultado"""
+    progresso = progresso or (lambda mensagem: None)
+    cenarios = cenarios or CENARIOS
+    resultado = {
+        'metadados': {
+            'commit': _commit_atual(),
+            'data': timezone.now().isoformat(),
+            'banco': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'repeticoes': repeticoes,
+            'seed': seed,
+            'com_cache': com_cache,
+        },
+        'resultados': {},
+    }
+    # Sem cache, cada repetição mede o trabalho real das views (KPIs inclusive).
+    caches = {} if com_cache else {
+        'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+    }
+    # DEBUG precisa estar ligado para o tempo das queries ser registrado.
+    with override_settings(ALLOWED_HOSTS=['testserver'], DEBUG=True, **caches):
+        for tamanho in tamanhos:
+            with transaction.atomic():
+                progresso(f'🌱 Semeando {tamanho} pacientes...')
+                GeradorCarga(
+                    seed=seed, prefixo='bench', pacientes=tamanho,
+                    agendamentos=tamanho * AGENDAMENTOS_POR_PACIENTE,
+                ).gerar()
+                if connection.vendor in ('sqlite', 'postgresql'):
+                    with connection.cursor() as cursor:
+                        cursor.execute('ANALYZE')
+
+                client = Client()
+                client.force_login(User.objects.create_superuser(f'bench_{seed}_{tamanho}', '', None))
+                metricas = {}
+                for nome, url_nome, params in cenarios:
+                    metricas[nome] = medir_cenario(client, reverse(url_nome), params, repeticoes)
+                    progresso(f'  {nome}: {metricas[nome]["tempo_ms_p50"]:.1f} ms, '
+                              f'{metricas[nome]["queries"]} queries')
+                resultado['resultados'][str(tamanho)] = metricas
+                transaction.set_rollback(True)
+    return resultado
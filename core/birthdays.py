@@ -0,0 +1,75 @@
+"""
+Consultas de aniversariantes.
+
+``Paciente.aniversario`` guarda ``mês * 100 + dia`` da data de nascimento
+(ex.: 14 de março -> 314), mantido em ``save()`` e indexado. Qualquer
+período vira uma ou duas faixas desse inteiro (duas quando atravessa a
+virada do ano), resolvidas por busca no índice em vez de extrair mês e dia
+linha a linha.
+
+Nascidos em 29 de fevereiro comemoram em 28 de fevereiro nos anos não
+bissextos.
+"""
+import calendar
+from datetime import date, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+FEVEREIRO_29 = 229
+
+
+def chave_aniversario(data):
+    """Chave ``mês * 100 + dia`` usada na coluna ``Paciente.aniversario``"""
+    return data.month * 100 + data.day
+
+
+def _faixas(inicio, fim):
+    """Faixas ``(de, ate)`` de chaves cobrindo as datas de ``inicio`` a ``fim``"""
+    if (fim - inicio).days >= 365:
+        return [(101, 1231)]
+    de, ate = chave_aniversario(inicio), chave_aniversario(fim)
+    if inicio.year == fim.year:
+        return [(de, ate)]
+    return [(de, 1231), (101, ate)]
+
+
+def _inclui_29_fevereiro_extra(inicio, fim):
+    # Em ano não bissexto, 28/02 dentro do período também vale para 29/02.
+    return any(
+        not calendar.isleap(ano) and inicio <= date(ano, 2, 28) <= fim
+        for ano in range(inicio.year, fim.year + 1)
+    )
+
+
+def filtro_aniversario(inicio, fim=None):
+    """``Q`` para pacientes que fazem aniversário entre ``inicio`` e ``fim`` (inclusive)"""
+    fim = fim or inicio
+    filtro = Q()
+    for de, ate in _faixas(inicio, fim):
+        filtro |= Q(aniversario__gte=de, aniversario__lte=ate)
+    if _inclui_29_fevereiro_extra(inicio, fim):
+        filtro |= Q(aniversario=FEVEREIRO_29)
+    return filtro
+
+
+def aniversariantes(queryset, inicio, fim=None):
+    """Filtra ``queryset`` de ``Paciente`` pelos aniversários no período"""
+    return queryset.filter(filtro_aniversario(inicio, fim)).order_by('aniversario', 'nome')
+
+
+def aniversariantes_hoje(queryset, hoje=None):
+    hoje = hoje or timezone.localdate()
+    return aniversariantes(queryset, hoje)
+
+
+def aniversariantes_semana(queryset, hoje=None):
+    """Aniversariantes de hoje até os próximos 6 dias"""
+    hoje = hoje or timezone.localdate()
+    return aniversariantes(queryset, hoje, hoje + timedelta(days=6))
+
+
+def aniversariantes_mes(queryset, hoje=None):
+    hoje = hoje or timezone.localdate()
+    ultimo_dia = calendar.monthrange(hoje.year, hoje.month)[1]
+    return aniversariantes(queryset, hoje.replace(day=1), hoje.replace(day=ultimo_dia))
@@ -0,0 +1,179 @@
+"""
+Cache versionado dos indicadores (KPIs) do consultório.
+
+Cada modelo monitorado possui um contador de versão guardado no cache,
+incrementado pelos sinais ``post_save``/``post_delete`` (ver
+``core.signals``). As chaves dos KPIs incluem o período (dia ou mês) e as
+versões dos modelos de que dependem, então qualquer alteração torna as
+entradas antigas inalcançáveis sem precisar apagá-las.
+
+Os fragmentos de template por linha (``fragmentos_por_linha``) seguem a
+mesma ideia: a chave de cada linha inclui o ``atualizado_em`` do objeto,
+então uma linha alterada simplesmente deixa de ser encontrada.
+"""
+import base64
+import hashlib
+import time
+from operator import attrgetter
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .instrumentation import registrar_cache
+from .stats import calcular_estatisticas_dashboard, calcular_contadores_pacientes
+
+PREFIXO = 'core'
+TIMEOUT_KPIS = 60 * 60  # 1 hora; a invalidação real é feita pelas versões
+TIMEOUT_FRAGMENTOS = 24 * 60 * 60
+MODELOS_VERSIONADOS = ('paciente', 'agendamento', 'consulta', 'profissional')
+MODELOS_KPIS = ('paciente', 'agendamento', 'consulta')
+
+CHAVE_HITS = f'{PREFIXO}:cache:hits'
+CHAVE_MISSES = f'{PREFIXO}:cache:misses'
+
+
+def _chave_versao(modelo):
+    return f'{PREFIXO}:versao:{modelo}'
+
+
+def _chave_modificado(modelo):
+    return f'{PREFIXO}:modificado:{modelo}'
+
+
+def _versao_inicial():
+    # Baseada no relógio para nunca repetir uma versão já usada caso o
+    # contador seja despejado do cache.
+    return time.time_ns() // 1000
+
+
+def versoes_modelos(modelos=MODELOS_VERSIONADOS):
+    """Retorna ``{modelo: versao}`` lendo todos os contadores de uma vez"""
+    chaves = {_chave_versao(modelo): modelo for modelo in modelos}
+    encontradas = cache.get_many(list(chaves))
+
+    versoes = {}
+    for chave, modelo in chaves.items():
+        versao = encontradas.get(chave)
+        if versao is None:
+            cache.add(chave, _versao_inicial(), timeout=None)
+            versao = cache.get(chave)
+        versoes[modelo] = versao
+    return versoes
+
+
+def incrementar_versao(modelo):
+    """Invalida todos os KPIs que dependem de ``modelo``"""
+    chave = _chave_versao(modelo)
+    cache.set(_chave_modificado(modelo), timezone.now(), timeout=None)
+    try:
+        return cache.incr(chave)
+    except ValueError:
+        versao = _versao_inicial()
+        cache.set(chave, versao, timeout=None)
+        return versao
+
+
+def ultima_modificacao(modelos=MODELOS_VERSIONADOS):
+    """Instante da alteração mais recente entre ``modelos`` (ou ``None``)"""
+    valores = cache.get_many([_chave_modificado(modelo) for modelo in modelos])
+    return max(valores.values(), default=None)
+
+
+def _contar(chave):
+    try:
+        cache.incr(chave)
+    except ValueError:
+        cache.add(chave, 1, timeout=None)
+
+
+def obter_ou_calcular(nome, escopo, modelos, calcular, timeout=TIMEOUT_KPIS):
+    """
+    Busca ``nome`` no cache para o ``escopo`` (ex.: dia ou mês) e as versões
+    atuais de ``modelos``; em caso de miss executa ``calcular()`` e guarda
+    o resultado.
+    """
+    versoes = versoes_modelos(modelos)
+    assinatura = '.'.join(f'{modelo}{versoes[modelo]}' for modelo in modelos)
+    chave = f'{PREFIXO}:kpi:{nome}:{escopo}:{assinatura}'
+
+    valor = cache.get(chave)
+    if valor is not None:
+        _contar(CHAVE_HITS)
+        registrar_cache(hit=True)
+        return valor
+
+    _contar(CHAVE_MISSES)
+    registrar_cache(hit=False)
+    valor = calcular()
+    cache.set(chave, valor, timeout)
+    return valor
+
+
+def chave_fragmento(nome, objeto, campos, assinatura=''):
+    # Chave curta: os backends validam as chaves caractere a caractere e
+    # uma página pode ter centenas de linhas.
+    valores = [nome, str(objeto.pk), assinatura] + [str(attrgetter(campo)(objeto)) for campo in campos]
+    resumo = hashlib.blake2b('|'.join(valores).encode(), digest_size=15).digest()
+    return f'{PREFIXO}:frag:{base64.urlsafe_b64encode(resumo).decode()}'
+
+
+def fragmentos_por_linha(nome, objetos, renderizar, campos=('atualizado_em',), modelos=(), extras=(),
+                         timeout=TIMEOUT_FRAGMENTOS):
+    """
+    HTML de ``renderizar(objeto)`` para cada objeto, com cache por linha.
+
+    A chave de cada linha leva o pk, os ``campos`` do objeto (caminhos com
+    ponto, ex.: ``paciente.atualizado_em``), as versões de ``modelos`` e os
+    ``extras``. A página inteira é lida com um ``get_many`` e só as linhas
+    ausentes são renderizadas e gravadas (um ``set_many``).
+    """
+    objetos = list(objetos)
+    if not objetos:
+        return []
+    versoes = versoes_modelos(modelos) if modelos else {}
+    assinatura = '.'.join([f'{modelo}{versoes[modelo]}' for modelo in modelos] + [str(extra) for extra in extras])
+    chaves = [chave_fragmento(nome, objeto, campos, assinatura) for objeto in objetos]
+
+    prontos = cache.get_many(chaves)
+    novos = {}
+    partes = []
+    for chave, objeto in zip(chaves, objetos):
+        html = prontos.get(chave)
+        if html is None:
+            html = novos[chave] = renderizar(objeto)
+        partes.append(html)
+    if novos:
+        cache.set_many(novos, timeout)
+    return partes
+
+
+def estatisticas_dashboard(hoje=None):
+    """``DashboardStats`` do dia, servido do cache enquanto nada mudar"""
+    hoje = hoje or timezone.localdate()
+    return obter_ou_calcular(
+        'dashboard', hoje.isoformat(), MODELOS_KPIS,
+        lambda: calcular_estatisticas_dashboard(hoje),
+    )
+
+
+def contadores_pacientes(hoje=None):
+    """Contadores do cabeçalho de pacientes, por mês"""
+    hoje = hoje or timezone.localdate()
+    return obter_ou_calcular(
+        'pacientes', hoje.strftime('%Y-%m'), ('paciente', 'consulta'),
+        lambda: calcular_contadores_pacientes(hoje),
+    )
+
+
+def metricas_cache():
+    """Contadores de hit/miss acumulados, para monitoramento"""
+    valores = cache.get_many([CHAVE_HITS, CHAVE_MISSES])
+    hits = valores.get(CHAVE_HITS, 0)
+    misses = valores.get(CHAVE_MISSES, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else 0.0,
+        'versoes': versoes_modelos(),
+    }
@@ -0,0 +1,354 @@
+"""
+Importação e exportação de pacientes e agendamentos em CSV.
+
+A importação lê o arquivo em lotes, valida cada linha com as regras do
+``PacienteForm`` (``validar_cpf``/``validar_telefone``) e com os
+validadores dos campos do modelo, resolve as chaves estrangeiras com mapas
+em memória (uma query por lote) e grava com ``bulk_create`` em uma
+transação por lote. Agendamentos que sobrepõem a agenda (no banco ou no
+próprio arquivo) são recusados como no formulário (``core.scheduling``).
+Linhas inválidas são puladas e relatadas pelo número da linha no arquivo;
+se o banco recusar o lote (um registro gravado por outro processo no meio
+da importação), ele é refeito linha a linha e só as recusadas ficam de fora.
+
+A exportação gera as linhas sob demanda a partir de
+``values_list(...).iterator()``, para uso com ``StreamingHttpResponse``:
+o queryset nunca é carregado inteiro na memória. As colunas são as mesmas
+aceitas pela importação.
+"""
+import csv
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .caching import incrementar_versao
+from .forms import validar_cpf, validar_telefone
+from .managers import STATUS_LIBERADOS
+from .models import Paciente, Profissional, Agendamento
+from .scheduling import conflitos_em_lote, travar_agendas
+
+COLUNAS_PACIENTES = [
+    'nome', 'cpf', 'rg', 'data_nascimento', 'sexo', 'telefone',
+    'email', 'endereco', 'observacoes', 'ativo',
+]
+COLUNAS_AGENDAMENTOS = [
+    'paciente_cpf', 'profissional_crm', 'data_hora', 'duracao', 'status', 'observacoes',
+]
+TAMANHO_LOTE = 1000
+VALORES_VERDADEIROS = {'1', 'true', 'sim', 's', 'yes', 'verdadeiro'}
+
+
+@dataclass
+class ResultadoImportacao:
+    lidas: int = 0
+    importadas: int = 0
+    erros: list = field(default_factory=list)  # [(linha, mensagem)]
+
+
+def ler_em_lotes(arquivo, tamanho=TAMANHO_LOTE, obrigatorias=()):
+    """Lotes de ``[(numero_da_linha, {coluna: valor})]`` de um CSV com cabeçalho"""
+    leitor = csv.DictReader(arquivo)
+    faltando = [coluna for coluna in obrigatorias if coluna not in (leitor.fieldnames or [])]
+    if faltando:
+        raise ValueError(f'Colunas obrigatórias ausentes: {", ".join(faltando)}')
+
+    linhas = enumerate(leitor, start=2)  # a linha 1 é o cabeçalho
+    while True:
+        lote = list(islice(linhas, tamanho))
+        if not lote:
+            return
+        yield lote
+
+
+def _texto(linha, coluna):
+    return (linha.get(coluna) or '').strip()
+
+
+def _data(valor):
+    for formato in ('%Y-%m-%d', '%d/%m/%Y'):
+        try:
+            return datetime.strptime(valor, formato).date()
+        except ValueError:
+            pass
+    raise ValidationError(f'Data inválida: "{valor}" (use AAAA-MM-DD ou DD/MM/AAAA)')
+
+
+def _data_hora(valor):
+    try:
+        data_hora = datetime.fromisoformat(valor)
+    except ValueError:
+        try:
+            data_hora = datetime.strptime(valor, '%d/%m/%Y %H:%M')
+        except ValueError:
+            raise ValidationError(f'Data/hora inválida: "{valor}" (use AAAA-MM-DDTHH:MM ou DD/MM/AAAA HH:MM)')
+    if timezone.is_naive(data_hora):
+        data_hora = timezone.make_aware(data_hora)
+    return data_hora
+
+
+def _booleano(valor, padrao=True):
+    return valor.lower() in VALORES_VERDADEIROS if valor else padrao
+
+
+def _mensagem(erro):
+    if hasattr(erro, 'message_dict'):
+        return '; '.join(f'{campo}: {" ".join(mensagens)}' for campo, mensagens in erro.message_dict.items())
+    return '; '.join(erro.messages)
+
+
+class ImportadorCSV(ABC):
+    """Esqueleto comum: lotes, validação por linha, bulk_create por transação"""
+    modelo = None
+    colunas_obrigatorias = ()
+    modelos_alterados = ()
+
+    def __init__(self, tamanho_lote=TAMANHO_LOTE):
+        self.tamanho_lote = tamanho_lote
+        self._chaves_vistas = set()
+
+    @abstractmethod
+    def converter(self, linha, contexto):
+        """Instância não salva do modelo para ``linha``; levanta ``ValidationError``"""
+
+    def carregar_contexto(self, lote):
+        """Mapas de chaves estrangeiras necessários para o lote"""
+        return {}
+
+    @abstractmethod
+    def chave(self, objeto):
+        """Chave única do objeto, usada para detectar duplicatas"""
+
+    @abstractmethod
+    def chaves_existentes(self, objetos):
+        """Chaves de ``objetos`` que já existem no banco (uma query)"""
+
+    def preparar_lote(self, lote, erros):
+        contexto = self.carregar_contexto(lote)
+        candidatos = []
+        for numero, linha in lote:
+            try:
+                objeto = self.converter(linha, contexto)
+            except ValidationError as erro:
+                erros.append((numero, _mensagem(erro)))
+                continue
+            chave = self.chave(objeto)
+            if chave is not None and chave in self._chaves_vistas:
+                erros.append((numero, 'Registro repetido no arquivo'))
+                continue
+            self._chaves_vistas.add(chave)
+            candidatos.append((numero, objeto))
+
+        existentes = self.chaves_existentes([objeto for _, objeto in candidatos])
+        objetos = []
+        for numero, objeto in candidatos:
+            if self.chave(objeto) in existentes:
+                erros.append((numero, 'Registro já existe no banco'))
+            else:
+                objetos.append((numero, objeto))
+        return objetos
+
+    def antes_de_gravar(self, objetos, erros):
+        """Chamado na transação do lote, antes do ``bulk_create``; devolve os ``(linha, objeto)`` a gravar"""
+        return objetos
+
+    def gravar_lote(self, objetos, erros, simular=False):
+        """Grava os ``(linha, objeto)`` numa transação; devolve quantos foram gravados"""
+        recusados = []
+        try:
+            with transaction.atomic():
+                gravar = self.antes_de_gravar(objetos, recusados)
+                self.modelo.objects.bulk_create([objeto for _, objeto in gravar], batch_size=self.tamanho_lote)
+                transaction.set_rollback(simular)
+        except IntegrityError:
+            # Outro processo gravou o mesmo registro depois de chaves_existentes():
+            # refaz o lote linha a linha para não perder as linhas válidas.
+            return self.gravar_linha_a_linha(objetos, erros, simular)
+        erros.extend(recusados)
+        return len(gravar)
+
+    def gravar_linha_a_linha(self, objetos, erros, simular=False):
+        """Como ``gravar_lote``, com um savepoint por linha: só as recusadas pelo banco ficam de fora"""
+        gravados = 0
+        with transaction.atomic():
+            for numero, objeto in self.antes_de_gravar(objetos, erros):
+                try:
+                    with transaction.atomic():
+                        self.modelo.objects.bulk_create([objeto])
+                except IntegrityError as erro:
+                    erros.append((numero, f'Recusado pelo banco: {erro}'))
+                else:
+                    gravados += 1
+            transaction.set_rollback(simular)
+        return gravados
+
+    def importar(self, arquivo, simular=False, progresso=None):
+        """
+        Importa ``arquivo`` (texto); com ``simular`` nada é gravado.
+        ``progresso(resultado)`` é chamado ao fim de cada lote.
+        """
+        resultado = ResultadoImportacao()
+        for lote in ler_em_lotes(arquivo, self.tamanho_lote, self.colunas_obrigatorias):
+            resultado.lidas += len(lote)
+            objetos = self.preparar_lote(lote, resultado.erros)
+            resultado.importadas += self.gravar_lote(objetos, resultado.erros, simular)
+            if progresso:
+                progresso(resultado)
+
+        # bulk_create não dispara post_save: invalida os KPIs manualmente.
+        if resultado.importadas and not simular:
+            for modelo in self.modelos_alterados:
+                incrementar_versao(modelo)
+        return resultado
+
+
+class ImportadorPacientes(ImportadorCSV):
+    modelo = Paciente
+    colunas_obrigatorias = ('nome', 'cpf', 'data_nascimento', 'sexo', 'telefone')
+    modelos_alterados = ('paciente',)
+
+    def converter(self, linha, contexto):
+        paciente = Paciente(
+            nome=_texto(linha, 'nome'),
+            cpf=validar_cpf(_texto(linha, 'cpf')),
+            rg=_texto(linha, 'rg'),
+            data_nascimento=_data(_texto(linha, 'data_nascimento')),
+            sexo=_texto(linha, 'sexo').upper(),
+            telefone=validar_telefone(_texto(linha, 'telefone')),
+            email=_texto(linha, 'email'),
+            endereco=_texto(linha, 'endereco'),
+            observacoes=_texto(linha, 'observacoes'),
+            ativo=_booleano(_texto(linha, 'ativo')),
+        )
+        paciente.full_clean(validate_unique=False, validate_constraints=False)
+        paciente.atualizar_campos_derivados()
+        return paciente
+
+    def chave(self, paciente):
+        return paciente.cpf
+
+    def chaves_existentes(self, pacientes):
+        return set(Paciente.objects.filter(
+            cpf__in=[paciente.cpf for paciente in pacientes]
+        ).values_list('cpf', flat=True))
+
+
+class ImportadorAgendamentos(ImportadorCSV):
+    modelo = Agendamento
+    colunas_obrigatorias = ('paciente_cpf', 'profissional_crm', 'data_hora')
+    modelos_alterados = ('agendamento',)
+
+    def __init__(self, tamanho_lote=TAMANHO_LOTE):
+        super().__init__(tamanho_lote)
+        # Poucos profissionais: o mapa inteiro é carregado uma única vez.
+        self.profissionais = dict(Profissional.objects.values_list('crm', 'id'))
+
+    def carregar_contexto(self, lote):
+        cpfs = set()
+        for _, linha in lote:
+            try:
+                cpfs.add(validar_cpf(_texto(linha, 'paciente_cpf')))
+            except ValidationError:
+                pass  # Relatado em converter()
+        return {'pacientes': dict(Paciente.objects.filter(cpf__in=cpfs).values_list('cpf', 'id'))}
+
+    def converter(self, linha, contexto):
+        cpf = validar_cpf(_texto(linha, 'paciente_cpf'))
+        paciente_id = contexto['pacientes'].get(cpf)
+        if paciente_id is None:
+            raise ValidationError(f'Paciente com CPF {cpf} não encontrado')
+        crm = _texto(linha, 'profissional_crm')
+        profissional_id = self.profissionais.get(crm)
+        if profissional_id is None:
+            raise ValidationError(f'Profissional com CRM {crm} não encontrado')
+
+        agendamento = Agendamento(
+            paciente_id=paciente_id,
+            profissional_id=profissional_id,
+            data_hora=_data_hora(_texto(linha, 'data_hora')),
+            status=_texto(linha, 'status') or 'agendado',
+            observacoes=_texto(linha, 'observacoes'),
+        )
+        if _texto(linha, 'duracao'):
+            agendamento.duracao = _texto(linha, 'duracao')
+        # As FKs já foram resolvidas pelos mapas; validá-las custaria uma query por linha.
+        agendamento.full_clean(exclude=['paciente', 'profissional'], validate_unique=False, validate_constraints=False)
+        return agendamento
+
+    def chave(self, agendamento):
+        # Espelha a restrição única parcial: cancelados/faltas não ocupam o horário.
+        if agendamento.status in STATUS_LIBERADOS:
+            return None
+        return (agendamento.profissional_id, agendamento.data_hora)
+
+    def chaves_existentes(self, agendamentos):
+        chaves = {self.chave(agendamento) for agendamento in agendamentos} - {None}
+        if not chaves:
+            return set()
+        return set(Agendamento.objects.ocupando_agenda().filter(
+            profissional_id__in={profissional_id for profissional_id, _ in chaves},
+            data_hora__in={data_hora for _, data_hora in chaves},
+        ).values_list('profissional_id', 'data_hora')) & chaves
+
+    def antes_de_gravar(self, agendamentos, erros):
+        # Mesma regra de sobreposição do agendamento pelo formulário, com as
+        # agendas travadas até o fim da transação do lote.
+        travar_agendas([agendamento.profissional_id for _, agendamento in agendamentos])
+        conflitos = conflitos_em_lote([agendamento for _, agendamento in agendamentos])
+        livres = []
+        for indice, (numero, agendamento) in enumerate(agendamentos):
+            if indice in conflitos:
+                erros.append((numero, _mensagem(conflitos[indice])))
+            else:
+                livres.append((numero, agendamento))
+        return livres
+
+
+class _Eco:
+    """Pseudoarquivo que devolve o que seria escrito (para o csv.writer)"""
+
+    def write(self, valor):
+        return valor
+
+
+def linhas_csv(cabecalho, registros):
+    """Gera as linhas CSV, uma por vez"""
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(cabecalho)
+    for registro in registros:
+        yield escritor.writerow(registro)
+
+
+def formatar_valor(valor):
+    if isinstance(valor, bool):
+        return '1' if valor else '0'
+    if isinstance(valor, datetime):
+        return timezone.localtime(valor).isoformat()
+    if isinstance(valor, date):
+        return valor.isoformat()
+    return valor
+
+
+def exportar_pacientes(queryset=None, tamanho_lote=TAMANHO_LOTE):
+    queryset = Paciente.objects.all() if queryset is None else queryset
+    registros = queryset.order_by('pk').values_list(*COLUNAS_PACIENTES).iterator(chunk_size=tamanho_lote)
+    return linhas_csv(COLUNAS_PACIENTES, (map(formatar_valor, registro) for registro in registros))
+
+
+def exportar_agendamentos(queryset=None, tamanho_lote=TAMANHO_LOTE):
+    queryset = Agendamento.objects.all() if queryset is None else queryset
+    registros = queryset.order_by('pk').values_list(
+        'paciente__cpf', 'profissional__crm', 'data_hora', 'duracao', 'status', 'observacoes'
+    ).iterator(chunk_size=tamanho_lote)
+    return linhas_csv(COLUNAS_AGENDAMENTOS, (map(formatar_valor, registro) for registro in registros))
+
+
+def resposta_csv(linhas, nome_arquivo):
+    response = StreamingHttpResponse(linhas, content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{nome_arquivo}"'
+    return response
@@ -0,0 +1,54 @@
+"""
+Intervalos de datas para filtros de queries.
+
+Lookups como ``data_hora__date=hoje`` aplicam uma função (com conversão
+para o fuso ``TIME_ZONE``) sobre a coluna e impedem o uso de índices. Aqui
+datas locais são convertidas em intervalos semiabertos ``[inicio, fim)``
+de ``datetime`` com fuso, que o banco compara diretamente com a coluna.
+
+O início de cada dia é calculado no fuso local, então dias com transição
+de horário de verão (mais curtos ou mais longos que 24h) ficam corretos.
+"""
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.db.models import Q
+from django.utils import timezone
+
+
+def inicio_do_dia(dia, tz=None):
+    """Primeiro instante de ``dia`` no fuso ``tz`` (padrão: fuso atual)"""
+    tz = tz or timezone.get_current_timezone()
+    # Se a meia-noite não existir (início do horário de verão), o zoneinfo
+    # usa o deslocamento anterior à transição, que cai exatamente no
+    # instante em que o dia começa. A ida e volta por UTC troca a hora
+    # inexistente pela hora local real (01:00), que, ao contrário dela, se
+    # compara corretamente com datetimes de outros fusos.
+    return datetime.combine(dia, time.min, tzinfo=tz).astimezone(dt_timezone.utc).astimezone(tz)
+
+
+def intervalo_dias(inicio, fim=None, tz=None):
+    """
+    Intervalo ``[inicio, fim)`` cobrindo as datas locais de ``inicio`` até
+    ``fim`` (inclusive). Sem ``fim``, cobre apenas ``inicio``.
+    """
+    fim = fim or inicio
+    return inicio_do_dia(inicio, tz), inicio_do_dia(fim + timedelta(days=1), tz)
+
+
+def intervalo_hoje(tz=None):
+    """Intervalo do dia local corrente"""
+    return intervalo_dias(timezone.localdate(timezone=tz), tz=tz)
+
+
+def intervalo_mes(dia=None, tz=None):
+    """Intervalo do mês local que contém ``dia`` (padrão: hoje)"""
+    dia = dia or timezone.localdate(timezone=tz)
+    primeiro = dia.replace(day=1)
+    proximo = (primeiro + timedelta(days=32)).replace(day=1)
+    return inicio_do_dia(primeiro, tz), inicio_do_dia(proximo, tz)
+
+
+def no_intervalo(campo, intervalo):
+    """``Q`` para ``inicio <= campo < fim``"""
+    inicio, fim = intervalo
+    return Q(**{f'{campo}__gte': inicio, f'{campo}__lt': fim})
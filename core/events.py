@@ -0,0 +1,156 @@
+"""
+Publicação e assinatura de eventos em tempo real (agenda).
+
+As alterações de ``Agendamento`` são publicadas por ``core.signals`` e
+entregues às telas abertas pelo endpoint SSE ``/consultorio/eventos/agenda/``.
+Cada processo mantém seus assinantes em memória; com o broker Redis, um
+único listener por processo recebe as mensagens do canal e as distribui
+localmente, então o número de telas abertas não multiplica conexões nem
+queries.
+
+Configuração (``settings``):
+
+* ``PULSE_EVENTOS_BROKER``: ``'memoria'`` (padrão) ou ``'redis'``;
+* ``PULSE_EVENTOS_REDIS_URL``: URL do Redis (padrão ``redis://127.0.0.1:6379/2``).
+"""
+import asyncio
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+logger = logging.getLogger(__name__)
+
+CANAL_AGENDA = 'pulse:agenda'
+TAMANHO_FILA = 100
+
+
+class Assinatura:
+    """Fila de eventos de um assinante, ligada ao event loop que a criou"""
+
+    def __init__(self, canal, loop):
+        self.canal = canal
+        self.loop = loop
+        self.fila = asyncio.Queue(maxsize=TAMANHO_FILA)
+
+    def entregar(self, mensagem):
+        # Executado no event loop do assinante. Um cliente lento perde os
+        # eventos mais antigos em vez de bloquear o publicador.
+        if self.fila.full():
+            self.fila.get_nowait()
+        self.fila.put_nowait(mensagem)
+
+    async def proxima(self, timeout=None):
+        """Próxima mensagem, ou ``None`` se ``timeout`` expirar"""
+        try:
+            return await asyncio.wait_for(self.fila.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class BrokerMemoria:
+    """Fan-out dentro do processo; usado em desenvolvimento e testes"""
+
+    def __init__(self):
+        self._assinaturas = set()
+        self._lock = threading.Lock()
+
+    def publicar(self, canal, mensagem):
+        """Publica ``mensagem`` (dict serializável) em ``canal``; pode ser chamado de qualquer thread"""
+        self._distribuir(canal, json.dumps(mensagem, cls=DjangoJSONEncoder))
+
+    def _distribuir(self, canal, dados):
+        with self._lock:
+            destinos = [a for a in self._assinaturas if a.canal == canal]
+        for assinatura in destinos:
+            try:
+                assinatura.loop.call_soon_threadsafe(assinatura.entregar, dados)
+            except RuntimeError:
+                # Loop já encerrado: o assinante foi embora sem cancelar.
+                self.cancelar(assinatura)
+
+    def assinar(self, canal):
+        """Cria uma assinatura no event loop atual"""
+        assinatura = Assinatura(canal, asyncio.get_running_loop())
+        with self._lock:
+            self._assinaturas.add(assinatura)
+        return assinatura
+
+    def cancelar(self, assinatura):
+        with self._lock:
+            self._assinaturas.discard(assinatura)
+
+    @property
+    def total_assinantes(self):
+        with self._lock:
+            return len(self._assinaturas)
+
+
+class BrokerRedis(BrokerMemoria):
+    """Publica no Redis; um listener por processo repassa aos assinantes locais"""
+
+    def __init__(self, url):
+        super().__init__()
+        import redis  # dependência opcional, só necessária com este broker
+
+        self.url = url
+        self._cliente = redis.Redis.from_url(url)
+        self._listeners = {}
+
+    def publicar(self, canal, mensagem):
+        self._cliente.publish(canal, json.dumps(mensagem, cls=DjangoJSONEncoder))
+
+    def assinar(self, canal):
+        assinatura = super().assinar(canal)
+        chave = (id(assinatura.loop), canal)
+        listener = self._listeners.get(chave)
+        if listener is None or listener.done():
+            self._listeners[chave] = assinatura.loop.create_task(self._escutar(canal))
+        return assinatura
+
+    async def _escutar(self, canal):
+        import redis.asyncio
+
+        cliente = redis.asyncio.Redis.from_url(self.url)
+        pubsub = cliente.pubsub()
+        await pubsub.subscribe(canal)
+        try:
+            async for mensagem in pubsub.listen():
+                if mensagem['type'] != 'message':
+                    continue
+                dados = mensagem['data']
+                if isinstance(dados, bytes):
+                    dados = dados.decode()
+                self._distribuir(canal, dados)
+        except Exception:
+            logger.exception('Listener Redis do canal %s encerrado', canal)
+        finally:
+            await pubsub.close()
+            await cliente.close()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def obter_broker():
+    """Broker configurado para este processo (criado sob demanda)"""
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            tipo = getattr(settings, 'PULSE_EVENTOS_BROKER', 'memoria')
+            if tipo == 'redis':
+                _broker = BrokerRedis(getattr(settings, 'PULSE_EVENTOS_REDIS_URL', 'redis://127.0.0.1:6379/2'))
+            else:
+                _broker = BrokerMemoria()
+        return _broker
+
+
+def publicar_evento_agenda(tipo, **dados):
+    """Publica um evento da agenda, sem deixar falhas do broker quebrarem o save"""
+    try:
+        obter_broker().publicar(CANAL_AGENDA, {'tipo': tipo, **dados})
+    except Exception:
+        logger.exception('Falha ao publicar evento %s', tipo)
@@ -0,0 +1,245 @@
+"""
+Resumos financeiros materializados.
+
+``ResumoFinanceiroDiario`` e ``ResumoFinanceiroMensal`` guardam, por dia/mês
+(local, pela data de registro da consulta) e profissional, a quantidade de
+consultas e os valores faturado e recebido. Os sinais de ``Consulta``
+aplicam apenas a diferença entre o estado anterior e o novo com
+``UPDATE ... SET campo = campo + delta``, então as páginas do financeiro
+leem algumas dezenas de linhas independentemente do tamanho do histórico.
+A gravação e a diferença ficam na mesma transação (``GravacaoAtomica``).
+
+Gravações que não disparam sinais (``bulk_create``, ``QuerySet.update``,
+SQL direto) deixam os resumos defasados; ``manage.py rebuild_financeiro``
+os recalcula a partir de ``Consulta``.
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.apps import apps as django_apps
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .dateranges import inicio_do_dia
+from .models import Agendamento, Consulta, Profissional, ResumoFinanceiroDiario, ResumoFinanceiroMensal
+from .scheduling import travar_agendas
+
+CAMPOS = ('consultas', 'consultas_pagas', 'valor_total', 'valor_pago')
+ZERO = Decimal('0.00')
+MESES_SERIE = 12
+
+
+def primeiro_do_mes(dia):
+    return dia.replace(day=1)
+
+
+def somar_meses(mes, quantidade):
+    indice = mes.year * 12 + mes.month - 1 + quantidade
+    return date(indice // 12, indice % 12 + 1, 1)
+
+
+def contribuicao(valor, pago, sinal=1):
+    """Quanto uma consulta soma (``sinal=1``) ou subtrai (``-1``) dos resumos"""
+    valor = Decimal(valor) * sinal
+    return {
+        'consultas': sinal,
+        'consultas_pagas': sinal if pago else 0,
+        'valor_total': valor,
+        'valor_pago': valor if pago else ZERO,
+    }
+
+
+def _somar(modelo, chave, delta):
+    delta = {campo: valor for campo, valor in delta.items() if valor}
+    if not delta:
+        return
+    expressoes = {campo: F(campo) + valor for campo, valor in delta.items()}
+    if modelo.objects.filter(**chave).update(**expressoes):
+        return
+    try:
+        with transaction.atomic():
+            modelo.objects.create(**chave, **delta)
+    except IntegrityError:
+        # Outra transação criou a linha entre o UPDATE e o INSERT.
+        modelo.objects.filter(**chave).update(**expressoes)
+
+
+def aplicar(dia, profissional_id, delta):
+    """Soma ``delta`` aos resumos diário e mensal de ``profissional_id``"""
+    with transaction.atomic():
+        _somar(ResumoFinanceiroDiario, {'dia': dia, 'profissional_id': profissional_id}, delta)
+        _somar(ResumoFinanceiroMensal, {'mes': primeiro_do_mes(dia), 'profissional_id': profissional_id}, delta)
+
+
+def aplicar_travado(mudancas):
+    """
+    Aplica ``[(dia, profissional_id, delta)]`` com os profissionais travados
+    até o fim da transação, a mesma trava de ``reconstruir_resumos``.
+    """
+    with transaction.atomic():
+        travar_agendas([profissional_id for _, profissional_id, _ in mudancas if profissional_id is not None])
+        for dia, profissional_id, delta in mudancas:
+            aplicar(dia, profissional_id, delta)
+
+
+def _profissional_do_agendamento(agendamento_id):
+    return Agendamento.objects.filter(pk=agendamento_id).values_list('profissional_id', flat=True).first()
+
+
+def registrar_consulta(consulta, created):
+    """Aplica a diferença entre o estado carregado e o salvo de ``consulta``"""
+    dia = timezone.localdate(consulta.criado_em)
+    profissional_id = _profissional_do_agendamento(consulta.agendamento_id)
+    original = None if created else getattr(consulta, '_financeiro_original', None)
+
+    if original is None:
+        aplicar_travado([(dia, profissional_id, contribuicao(consulta.valor, consulta.pago))])
+    else:
+        agendamento_id, criado_em, valor, pago = original
+        dia_anterior = timezone.localdate(criado_em)
+        profissional_anterior = (
+            profissional_id if agendamento_id == consulta.agendamento_id
+            else _profissional_do_agendamento(agendamento_id)
+        )
+        if (dia_anterior, profissional_anterior) == (dia, profissional_id):
+            novo = contribuicao(consulta.valor, consulta.pago)
+            antigo = contribuicao(valor, pago)
+            aplicar_travado([(dia, profissional_id, {campo: novo[campo] - antigo[campo] for campo in CAMPOS})])
+        else:
+            aplicar_travado([
+                (dia_anterior, profissional_anterior, contribuicao(valor, pago, sinal=-1)),
+                (dia, profissional_id, contribuicao(consulta.valor, consulta.pago)),
+            ])
+
+    consulta._financeiro_original = (consulta.agendamento_id, consulta.criado_em, consulta.valor, consulta.pago)
+
+
+def remover_consulta(consulta):
+    profissional_id = _profissional_do_agendamento(consulta.agendamento_id)
+    if profissional_id is None:
+        return  # Agendamento já removido; rebuild_financeiro corrige
+    aplicar_travado([(timezone.localdate(consulta.criado_em), profissional_id,
+                      contribuicao(consulta.valor, consulta.pago, sinal=-1))])
+
+
+def transferir_profissional(agendamento, profissional_anterior):
+    """Move a consulta do agendamento para o novo profissional nos resumos"""
+    consulta = Consulta.objects.filter(agendamento=agendamento).values('criado_em', 'valor', 'pago').first()
+    if consulta is None:
+        return
+    dia = timezone.localdate(consulta['criado_em'])
+    aplicar_travado([
+        (dia, profissional_anterior, contribuicao(consulta['valor'], consulta['pago'], sinal=-1)),
+        (dia, agendamento.profissional_id, contribuicao(consulta['valor'], consulta['pago'])),
+    ])
+
+
+def reconstruir_resumos(desde=None, apps=None):
+    """
+    Recalcula os resumos a partir de ``Consulta`` (todos, ou a partir do
+    mês de ``desde``). ``apps`` permite o uso em migrações.
+
+    Roda com todos os profissionais travados (``aplicar_travado``): uma
+    consulta gravada durante a reconstrução espera e tem a diferença
+    aplicada sobre os resumos novos, em vez de se perder ou contar duas
+    vezes. Em migrações não há gravações concorrentes e nada é travado.
+    """
+    with transaction.atomic():
+        if apps is None:
+            travar_agendas(Profissional.objects.values_list('pk', flat=True))
+        return _reconstruir(desde, apps or django_apps)
+
+
+def _reconstruir(desde, apps):
+    Diario = apps.get_model('core', 'ResumoFinanceiroDiario')
+    Mensal = apps.get_model('core', 'ResumoFinanceiroMensal')
+
+    consultas = apps.get_model('core', 'Consulta').objects.all()
+    diarios, mensais = Diario.objects.all(), Mensal.objects.all()
+    if desde is not None:
+        desde = primeiro_do_mes(desde)
+        consultas = consultas.filter(criado_em__gte=inicio_do_dia(desde))
+        diarios, mensais = diarios.filter(dia__gte=desde), mensais.filter(mes__gte=desde)
+
+    decimal = DecimalField(max_digits=14, decimal_places=2)
+    linhas = consultas.annotate(
+        dia=TruncDate('criado_em', tzinfo=timezone.get_current_timezone())
+    ).order_by().values('dia', 'agendamento__profissional_id').annotate(
+        total=Count('id'),
+        pagas=Count('id', filter=Q(pago=True)),
+        soma=Coalesce(Sum('valor'), Value(ZERO), output_field=decimal),
+        soma_paga=Coalesce(Sum('valor', filter=Q(pago=True)), Value(ZERO), output_field=decimal),
+    )
+
+    por_dia, por_mes = [], {}
+    for linha in linhas.iterator():
+        valores = {
+            'consultas': linha['total'], 'consultas_pagas': linha['pagas'],
+            'valor_total': linha['soma'], 'valor_pago': linha['soma_paga'],
+        }
+        profissional_id = linha['agendamento__profissional_id']
+        por_dia.append(Diario(dia=linha['dia'], profissional_id=profissional_id, **valores))
+        mensal = por_mes.setdefault(
+            (primeiro_do_mes(linha['dia']), profissional_id), dict.fromkeys(CAMPOS, 0)
+        )
+        for campo, valor in valores.items():
+            mensal[campo] += valor
+
+    diarios.delete()
+    mensais.delete()
+    Diario.objects.bulk_create(por_dia, batch_size=1000)
+    Mensal.objects.bulk_create([
+        Mensal(mes=mes, profissional_id=profissional_id, **valores)
+        for (mes, profissional_id), valores in por_mes.items()
+    ], batch_size=1000)
+    return len(por_dia), len(por_mes)
+
+
+def _totais(resumos):
+    totais = {campo: sum((getattr(resumo, campo) for resumo in resumos), 0) for campo in CAMPOS}
+    totais['valor_pendente'] = totais['valor_total'] - totais['valor_pago']
+    return totais
+
+
+def painel_financeiro(mes=None):
+    """Contexto da página do financeiro para ``mes`` (padrão: mês atual)"""
+    mes = primeiro_do_mes(mes or timezone.localdate())
+    inicio_serie = somar_meses(mes, -(MESES_SERIE - 1))
+
+    # Uma query para a série e o detalhamento: são no máximo
+    # MESES_SERIE linhas por profissional.
+    resumos = list(
+        ResumoFinanceiroMensal.objects.filter(mes__gte=inicio_serie, mes__lte=mes)
+        .select_related('profissional').order_by('mes', '-valor_total')
+    )
+    por_profissional = [resumo for resumo in resumos if resumo.mes == mes]
+
+    serie_mensal = [
+        {'mes': somar_meses(inicio_serie, indice), 'valor_total': ZERO, 'valor_pago': ZERO}
+        for indice in range(MESES_SERIE)
+    ]
+    por_mes = {item['mes']: item for item in serie_mensal}
+    for resumo in resumos:
+        por_mes[resumo.mes]['valor_total'] += resumo.valor_total
+        por_mes[resumo.mes]['valor_pago'] += resumo.valor_pago
+    maximo = max((item['valor_total'] for item in serie_mensal), default=ZERO) or 1
+    for item in serie_mensal:
+        item['altura'] = int(item['valor_total'] / maximo * 100)
+
+    serie_diaria = list(
+        ResumoFinanceiroDiario.objects.filter(dia__gte=mes, dia__lt=somar_meses(mes, 1))
+        .order_by('dia').values('dia')
+        .annotate(consultas=Sum('consultas'), valor_total=Sum('valor_total'), valor_pago=Sum('valor_pago'))
+    )
+
+    return {
+        'mes': mes,
+        'mes_anterior': somar_meses(mes, -1),
+        'mes_seguinte': somar_meses(mes, 1) if mes < primeiro_do_mes(timezone.localdate()) else None,
+        'totais': _totais(por_profissional),
+        'por_profissional': por_profissional,
+        'serie_mensal': serie_mensal,
+        'serie_diaria': serie_diaria,
+    }
@@ -3,6 +3,35 @@
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 from .models import Paciente, Agendamento, Profissional, Servico, Consulta
+from .scheduling import salvar_agendamento, verificar_horario
+
+def validar_cpf(cpf):
+    """Valida o CPF e devolve no formato 000.000.000-00 (também usado na importação)"""
+    if cpf:
+        # Remove caracteres não numéricos
+        cpf_numbers = ''.join(filter(str.isdigit, cpf))
+        
+        # Verifica se tem 11 dígitos
+        if len(cpf_numbers) != 11:
+            raise forms.ValidationError("CPF deve ter 11 dígitos")
+        
+        # Adiciona formatação se necessário
+        if len(cpf) == 11 and cpf.isdigit():
+            cpf = f"{cpf[:3]}.{cpf[3:6]}.{cpf[6:9]}-{cpf[9:]}"
+            
+    return cpf
+
+def validar_telefone(telefone):
+    """Valida o telefone (também usado na importação)"""
+    if telefone:
+        # Remove caracteres não numéricos
+        phone_numbers = ''.join(filter(str.isdigit, telefone))
+        
+        # Verifica se tem pelo menos 10 dígitos
+        if len(phone_numbers) < 10:
+            raise forms.ValidationError("Telefone deve ter pelo menos 10 dígitos")
+            
+    return telefone
 
 class PacienteForm(forms.ModelForm):
     """Formulário para cadastro e edição de pacientes"""
@@ -59,41 +88,40 @@ class Meta:
     
     def clean_cpf(self):
         """Validação customizada do CPF"""
-        cpf = self.cleaned_data.get('cpf')
-        if cpf:
-            # Remove caracteres não numéricos
-            cpf_numbers = ''.join(filter(str.isdigit, cpf))
-            
-            # Verifica se tem 11 dígitos
-            if len(cpf_numbers) != 11:
-                raise forms.ValidationError("CPF deve ter 11 dígitos")
-            
-            # Adiciona formatação se necessário
-            if len(cpf) == 11 and cpf.isdigit():
-                cpf = f"{cpf[:3]}.{cpf[3:6]}.{cpf[6:9]}-{cpf[9:]}"
-                
-        return cpf
+        return validar_cpf(self.cleaned_data.get('cpf'))
     
     def clean_telefone(self):
         """Validação do telefone"""
-        telefone = self.cleaned_data.get('telefone')
-        if telefone:
-            # Remove caracteres não numéricos
-            phone_numbers = ''.join(filter(str.isdigit, telefone))
-            
-            # Verifica se tem pelo menos 10 dígitos
-            if len(phone_numbers) < 10:
-                raise forms.ValidationError("Telefone deve ter pelo menos 10 dígitos")
-                
-        return telefone
+        return validar_telefone(self.cleaned_data.get('telefone'))
 
-class AgendamentoForm(forms.ModelForm):
+class HorarioLivreMixin:
+    """Valida e grava agendamentos pelo motor de agenda (core.scheduling)"""
+
+    def _post_clean(self):
+        super()._post_clean()
+        # Depois do super(): a instância já tem os valores do formulário.
+        if not self.errors:
+            try:
+                verificar_horario(self.instance)
+            except forms.ValidationError as erro:
+                self.add_error(None, erro)
+
+    def save(self, commit=True):
+        if not commit:
+            return super().save(commit=False)
+        # Verifica de novo com a agenda travada: outra reserva pode ter
+        # ocupado o horário depois da validação.
+        salvar_agendamento(self.instance)
+        self._save_m2m()
+        return self.instance
+
+class AgendamentoForm(HorarioLivreMixin, forms.ModelForm):
     """Formulário para agendamentos"""
     
     class Meta:
         model = Agendamento
         fields = [
-            'paciente', 'profissional', 'servico', 'data_hora',
+            'paciente', 'profissional', 'data_hora', 'duracao',
             'status', 'observacoes'
         ]
         widgets = {
@@ -103,13 +131,13 @@ class Meta:
             'profissional': forms.Select(attrs={
                 'class': 'form-control'
             }),
-            'servico': forms.Select(attrs={
-                'class': 'form-control'
-            }),
             'data_hora': forms.DateTimeInput(attrs={
                 'class': 'form-control',
                 'type': 'datetime-local'
             }),
+            'duracao': forms.NumberInput(attrs={
+                'class': 'form-control'
+            }),
             'status': forms.Select(attrs={
                 'class': 'form-control'
             }),
@@ -137,6 +165,13 @@ def clean_data_hora(self):
                 
         return data_hora
 
+class AgendamentoAdminForm(HorarioLivreMixin, forms.ModelForm):
+    """Formulário do admin (aceita datas passadas, ao contrário do AgendamentoForm)"""
+    
+    class Meta:
+        model = Agendamento
+        fields = '__all__'
+
 class ProfissionalForm(forms.ModelForm):
     """Formulário para profissionais"""
     
@@ -0,0 +1,309 @@
+"""
+Instrumentação por requisição (ver ``core.middleware.InstrumentacaoMiddleware``).
+
+A medição da requisição corrente fica numa ``ContextVar``, que acompanha a
+requisição também nas threads do ``sync_to_async``. ``Medicao`` não tem
+lock: código que roda em várias threads ao mesmo tempo (os painéis de
+``core.panels``) mede cada thread à parte e soma depois com ``somar``. Os
+pontos medidos só consultam essa variável:
+
+* queries: um ``execute_wrapper`` instalado uma vez em cada conexão
+  (sinal ``connection_created``) soma tempo e contagem e guarda as N mais
+  lentas;
+* cache: ``core.caching`` chama ``registrar_cache`` a cada hit/miss dos KPIs;
+* templates: o backend ``core.templating.DjangoTemplates`` chama
+  ``registrar_template`` em cada renderização de primeiro nível.
+
+Os histogramas são agregados em memória e uma thread de cada processo os
+descarrega no cache compartilhado a cada ``INTERVALO_DESCARGA`` segundos:
+a requisição só atualiza alguns contadores locais e nunca espera pelo
+cache. No Redis a descarga é um único pipeline de ``INCRBY``; nos demais
+backends, um ``incr`` por contador. As rotas conhecidas ficam numa lista
+só de acréscimos (``add`` + ``incr``, ambos atômicos), para processos
+registrando rotas ao mesmo tempo não apagarem as rotas uns dos outros. O
+que estiver pendente quando o processo terminar se perde (no máximo
+``INTERVALO_DESCARGA`` segundos de métricas).
+"""
+import heapq
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache, caches, DEFAULT_CACHE_ALIAS
+from django.core.cache.backends.redis import RedisCache
+
+logger = logging.getLogger(__name__)
+
+PREFIXO = 'core:perf'
+CHAVE_TOTAL_ROTAS = f'{PREFIXO}:rotas:total'
+# Limites superiores (ms) das faixas do histograma; a última é aberta.
+FAIXAS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+INTERVALO_DESCARGA = 10  # segundos
+TAMANHO_SQL_LOG = 500
+
+_medicao = ContextVar('pulse_medicao', default=None)
+
+
+class Medicao:
+    """Métricas de uma requisição"""
+    __slots__ = (
+        'inicio', 'queries', 'tempo_sql', 'cache_hits', 'cache_misses',
+        'tempo_template', 'profundidade_template', 'top_queries', '_limite_top',
+    )
+
+    def __init__(self, limite_top=5):
+        self.inicio = time.perf_counter()
+        self.queries = 0
+        self.tempo_sql = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.tempo_template = 0.0
+        self.profundidade_template = 0
+        self.top_queries = []  # heap de (duração, sql)
+        self._limite_top = limite_top
+
+    @property
+    def decorrido(self):
+        return time.perf_counter() - self.inicio
+
+    def registrar_query(self, sql, duracao):
+        self.queries += 1
+        self.tempo_sql += duracao
+        if len(self.top_queries) < self._limite_top:
+            heapq.heappush(self.top_queries, (duracao, sql))
+        elif duracao > self.top_queries[0][0]:
+            heapq.heapreplace(self.top_queries, (duracao, sql))
+
+    def queries_mais_lentas(self):
+        return sorted(self.top_queries, reverse=True)
+
+    def somar(self, outra):
+        """Acrescenta as métricas de ``outra`` (p.ex. de um painel, medido na própria thread)"""
+        self.queries += outra.queries
+        self.tempo_sql += outra.tempo_sql
+        self.cache_hits += outra.cache_hits
+        self.cache_misses += outra.cache_misses
+        self.tempo_template += outra.tempo_template
+        for duracao, sql in outra.top_queries:
+            if len(self.top_queries) < self._limite_top:
+                heapq.heappush(self.top_queries, (duracao, sql))
+            elif duracao > self.top_queries[0][0]:
+                heapq.heapreplace(self.top_queries, (duracao, sql))
+
+
+def iniciar_medicao():
+    """Começa a medir; devolve ``(medicao, token)`` para ``encerrar_medicao``"""
+    medicao = Medicao(getattr(settings, 'PULSE_REQUISICAO_LENTA_TOP_QUERIES', 5))
+    return medicao, _medicao.set(medicao)
+
+
+def encerrar_medicao(token):
+    _medicao.reset(token)
+
+
+def medicao_atual():
+    return _medicao.get()
+
+
+def _wrapper_sql(execute, sql, params, many, context):
+    medicao = _medicao.get()
+    if medicao is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        medicao.registrar_query(sql, time.perf_counter() - inicio)
+
+
+def instalar_wrapper_sql(connection):
+    """Instala o wrapper de medição na conexão (idempotente)"""
+    if _wrapper_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_wrapper_sql)
+
+
+def registrar_cache(hit):
+    medicao = _medicao.get()
+    if medicao is not None:
+        if hit:
+            medicao.cache_hits += 1
+        else:
+            medicao.cache_misses += 1
+
+
+class medir_template:
+    """Context manager que soma o tempo de renderização ao da requisição"""
+    __slots__ = ('medicao', 'inicio')
+
+    def __enter__(self):
+        self.medicao = _medicao.get()
+        if self.medicao is not None:
+            self.medicao.profundidade_template += 1
+            self.inicio = time.perf_counter()
+
+    def __exit__(self, *exc):
+        medicao = self.medicao
+        if medicao is not None:
+            medicao.profundidade_template -= 1
+            # Renderizações aninhadas já estão contidas na de fora.
+            if medicao.profundidade_template == 0:
+                medicao.tempo_template += time.perf_counter() - self.inicio
+
+
+def faixa(duracao_ms):
+    """Índice da faixa do histograma para ``duracao_ms``"""
+    for indice, limite in enumerate(FAIXAS_MS):
+        if duracao_ms <= limite:
+            return indice
+    return len(FAIXAS_MS)
+
+
+def _incrementar(chave, valor):
+    """``incr`` que cria a chave (sem expiração) se ela ainda não existir"""
+    try:
+        return cache.incr(chave, valor)
+    except ValueError:
+        if cache.add(chave, valor, timeout=None):
+            return valor
+        return cache.incr(chave, valor)
+
+
+def registrar_rotas(rotas):
+    """Acrescenta ``rotas`` à lista compartilhada, sem ler e regravar a lista"""
+    for rota in rotas:
+        # ``add`` só grava se a chave não existir: um único processo
+        # registra cada rota, e a posição vem de um ``incr``.
+        if cache.add(f'{PREFIXO}:rotas:registrada:{rota}', True, timeout=None):
+            posicao = _incrementar(CHAVE_TOTAL_ROTAS, 1)
+            cache.set(f'{PREFIXO}:rotas:{posicao}', rota, timeout=None)
+
+
+def rotas_registradas():
+    total = cache.get(CHAVE_TOTAL_ROTAS) or 0
+    chaves = [f'{PREFIXO}:rotas:{posicao}' for posicao in range(1, total + 1)]
+    return sorted(set(cache.get_many(chaves).values()))
+
+
+def _somar_no_cache(incrementos):
+    """Soma ``{chave: incremento}`` aos contadores do cache em lote"""
+    backend = caches[DEFAULT_CACHE_ALIAS]
+    if isinstance(backend, RedisCache):
+        # Uma ida ao Redis para todos os contadores; INCRBY cria os ausentes.
+        cliente = backend._cache.get_client(write=True)
+        with cliente.pipeline(transaction=False) as pipeline:
+            for chave, incremento in incrementos.items():
+                pipeline.incrby(backend.make_and_validate_key(chave), incremento)
+            pipeline.execute()
+        return
+    for chave, incremento in incrementos.items():
+        _incrementar(chave, incremento)
+
+
+class AgregadorHistogramas:
+    """Acumula métricas por rota no processo; uma thread descarrega no cache periodicamente"""
+
+    CAMPOS = ('requisicoes', 'tempo_ms', 'queries', 'tempo_sql_ms', 'template_ms', 'cache_hits', 'cache_misses')
+
+    def __init__(self, intervalo=INTERVALO_DESCARGA):
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+        self._pendentes = {}
+        self._rotas_registradas = set()
+        self._thread = None
+        self._pid = None
+
+    def registrar(self, rota, medicao, duracao_ms):
+        with self._lock:
+            pendente = self._pendentes.setdefault(rota, {})
+            valores = (
+                1, duracao_ms, medicao.queries, medicao.tempo_sql * 1000,
+                medicao.tempo_template * 1000, medicao.cache_hits, medicao.cache_misses,
+            )
+            for campo, valor in zip(self.CAMPOS, valores):
+                pendente[campo] = pendente.get(campo, 0) + valor
+            chave_faixa = f'faixa{faixa(duracao_ms)}'
+            pendente[chave_faixa] = pendente.get(chave_faixa, 0) + 1
+            self._iniciar_thread()
+
+    def _iniciar_thread(self):
+        # Chamado com o lock. Depois de um fork a thread do pai não existe
+        # no filho, que inicia a sua.
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._descarregar_periodicamente, name='pulse-histogramas', daemon=True)
+        self._thread.start()
+
+    def _descarregar_periodicamente(self):
+        while True:
+            time.sleep(self.intervalo)
+            try:
+                self.descarregar()
+            except Exception:
+                logger.exception('Falha ao descarregar os histogramas de desempenho')
+
+    def descarregar(self):
+        """Soma os contadores pendentes aos do cache compartilhado"""
+        with self._lock:
+            pendentes, self._pendentes = self._pendentes, {}
+        if not pendentes:
+            return
+        novas = set(pendentes) - self._rotas_registradas
+        if novas:
+            registrar_rotas(sorted(novas))
+            self._rotas_registradas |= novas
+        _somar_no_cache({
+            # Tempos guardados em microssegundos para o incremento ser inteiro.
+            f'{PREFIXO}:{rota}:{campo}': round(valor * 1000) if campo.endswith('_ms') else valor
+            for rota, campos in pendentes.items()
+            for campo, valor in campos.items()
+        })
+
+
+agregador = AgregadorHistogramas()
+
+
+def _percentil_faixas(contagens, total, fracao):
+    """Limite superior (ms) da faixa que contém o percentil ``fracao``"""
+    alvo = fracao * total
+    acumulado = 0
+    for indice, contagem in enumerate(contagens):
+        acumulado += contagem
+        if contagem and acumulado >= alvo:
+            return FAIXAS_MS[indice] if indice < len(FAIXAS_MS) else None
+    return None
+
+
+def resumo_histogramas():
+    """Métricas agregadas de todos os processos, por rota"""
+    agregador.descarregar()
+    rotas = rotas_registradas()
+    campos = list(AgregadorHistogramas.CAMPOS) + [f'faixa{i}' for i in range(len(FAIXAS_MS) + 1)]
+    valores = cache.get_many([f'{PREFIXO}:{rota}:{campo}' for rota in rotas for campo in campos])
+
+    resumo = {}
+    for rota in rotas:
+        dados = {campo: valores.get(f'{PREFIXO}:{rota}:{campo}', 0) for campo in campos}
+        total = dados['requisicoes']
+        if not total:
+            continue
+        contagens = [dados[f'faixa{i}'] for i in range(len(FAIXAS_MS) + 1)]
+        resumo[rota] = {
+            'requisicoes': total,
+            'tempo_medio_ms': round(dados['tempo_ms'] / 1000 / total, 2),
+            'p50_ms_ate': _percentil_faixas(contagens, total, 0.5),
+            'p95_ms_ate': _percentil_faixas(contagens, total, 0.95),
+            'queries_media': round(dados['queries'] / total, 2),
+            'tempo_sql_medio_ms': round(dados['tempo_sql_ms'] / 1000 / total, 2),
+            'template_medio_ms': round(dados['template_ms'] / 1000 / total, 2),
+            'cache_hits': dados['cache_hits'],
+            'cache_misses': dados['cache_misses'],
+            'histograma': {
+                (f'<= {limite} ms' if limite else f'> {FAIXAS_MS[-1]} ms'): contagem
+                for limite, contagem in zip(list(FAIXAS_MS) + [None], contagens)
+            },
+        }
+    return resumo
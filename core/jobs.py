@@ -0,0 +1,117 @@
+"""
+Tarefas em segundo plano do Pulse (registradas em ``core.tasks``).
+
+Importado em ``CoreConfig.ready`` para que o registro exista tanto no
+processo web, que enfileira, quanto no ``run_worker``, que executa.
+"""
+import math
+import os
+from datetime import date, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+from .caching import estatisticas_dashboard, contadores_pacientes
+from .reminders import enviar_lembretes as enviar_lembretes_do_dia
+from .csvio import ImportadorPacientes, ImportadorAgendamentos, TAMANHO_LOTE as LOTE_IMPORTACAO
+from .reports import consultas_do_periodo, EXPORTADORES, TAMANHO_LOTE as LOTE_RELATORIO
+from .models import Tarefa
+from .tasks import tarefa, enfileirar
+
+IMPORTADORES = {'pacientes': ImportadorPacientes, 'agendamentos': ImportadorAgendamentos}
+PASTA_RELATORIOS = 'relatorios'
+HORARIO_LEMBRETES = '18:00'
+
+
+@tarefa(usar_replica=True)
+def gerar_relatorio_consultas(registro, inicio, fim, formato='csv'):
+    """Grava o relatório de consultas em ``MEDIA_ROOT/relatorios``"""
+    consultas = consultas_do_periodo(date.fromisoformat(inicio), date.fromisoformat(fim))
+    total = consultas.count()
+    lotes = max(1, math.ceil(total / LOTE_RELATORIO))
+
+    relativo = Path(PASTA_RELATORIOS) / f'consultas_{inicio}_{fim}_{registro.pk}.{formato}'
+    destino = Path(settings.MEDIA_ROOT) / relativo
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    modo, encoding = ('wb', None) if formato == 'xlsx' else ('w', 'utf-8')
+    with open(destino, modo, encoding=encoding, newline='' if encoding else None) as saida:
+        for indice, parte in enumerate(EXPORTADORES[formato](consultas), start=1):
+            saida.write(parte)
+            if indice % 5 == 0:
+                linhas = min(indice * LOTE_RELATORIO, total)
+                registro.atualizar_progresso(min(99, indice * 100 / lotes), f'{linhas} de {total} linhas')
+    return {'arquivo': str(relativo), 'linhas': total}
+
+
+@tarefa(max_tentativas=1)
+def importar_csv(registro, caminho, tipo='pacientes', lote=LOTE_IMPORTACAO, encoding='utf-8-sig'):
+    """Importação em lotes de ``core.csvio``; uma única tentativa (não é idempotente)"""
+    tamanho = os.path.getsize(caminho) or 1
+    with open(caminho, newline='', encoding=encoding) as arquivo:
+        resultado = IMPORTADORES[tipo](tamanho_lote=lote).importar(
+            arquivo,
+            progresso=lambda parcial: registro.atualizar_progresso(
+                arquivo.buffer.tell() * 100 / tamanho,
+                f'{parcial.lidas} linhas lidas, {parcial.importadas} importadas',
+            ),
+        )
+    if resultado.importadas:
+        enfileirar('aquecer_cache')
+    return {
+        'lidas': resultado.lidas,
+        'importadas': resultado.importadas,
+        'total_erros': len(resultado.erros),
+        'erros': resultado.erros[:100],
+    }
+
+
+@tarefa(max_tentativas=1)
+def aquecer_cache(registro):
+    """Recalcula os KPIs do dia para a próxima requisição já encontrá-los no cache"""
+    hoje = timezone.localdate()
+    estatisticas_dashboard(hoje)
+    contadores_pacientes(hoje)
+
+
+def proxima_execucao_lembretes(agora=None):
+    """Próximo ``PULSE_LEMBRETES_HORARIO`` (hora local, padrão 18:00)"""
+    agora = timezone.localtime(agora)
+    hora, minuto = map(int, getattr(settings, 'PULSE_LEMBRETES_HORARIO', HORARIO_LEMBRETES).split(':'))
+    proxima = agora.replace(hour=hora, minute=minuto, second=0, microsecond=0)
+    if proxima <= agora:
+        proxima = timezone.localtime(proxima + timedelta(days=1)).replace(hour=hora, minute=minuto)
+    return proxima
+
+
+def agendar_lembretes():
+    """Enfileira o envio diário recorrente, se ainda não houver um pendente"""
+    pendente = Tarefa.objects.filter(
+        nome='enviar_lembretes', status__in=['pendente', 'executando'], argumentos__recorrente=True
+    ).first()
+    if pendente:
+        return pendente
+    atraso = (proxima_execucao_lembretes() - timezone.now()).total_seconds()
+    return enfileirar('enviar_lembretes', atraso=atraso, recorrente=True)
+
+
+def _reagendar_lembretes(registro, status):
+    # Marca esta antes, para agendar_lembretes não a ver pendente.
+    Tarefa.objects.filter(pk=registro.pk).update(status=status)
+    agendar_lembretes()
+
+
+@tarefa()
+def enviar_lembretes(registro, dia=None, recorrente=False):
+    """Lembretes do dia seguinte; ``recorrente`` reagenda para o próximo dia"""
+    try:
+        resultado = enviar_lembretes_do_dia(date.fromisoformat(dia) if dia else None)
+    except Exception:
+        # Antes da última tentativa a própria fila repete esta tarefa; na
+        # última, sem reagendar, a cadeia diária pararia de vez.
+        if recorrente and registro.tentativas >= registro.max_tentativas:
+            _reagendar_lembretes(registro, 'falhou')
+        raise
+    if recorrente:
+        _reagendar_lembretes(registro, 'concluida')
+    return {'enviados': resultado.enviados, 'falhas': resultado.falhas, 'ja_reservados': resultado.ja_reservados}
@@ -0,0 +1,303 @@
+"""
+Gerador determinístico de dados sintéticos para testes de carga.
+
+Tudo é derivado de ``(prefixo, seed)`` e do índice de cada registro, então
+a mesma configuração gera sempre os mesmos dados, seja em um processo ou
+em vários (cada lote tem seu próprio ``random.Random``):
+
+* CPFs válidos e únicos: o índice do paciente passa por uma permutação de
+  ``[0, 10**9)`` e recebe os dígitos verificadores;
+* agendas sem colisões: o agendamento ``i`` vai para o profissional
+  ``i % P`` no ``i // P``-ésimo horário livre da sua jornada (seg–sex,
+  08h–18h), espaçados conforme a ``ocupacao``; o calendário é centrado
+  em hoje, com passado (realizados, faltas, cancelados) e futuro; horários
+  que já estejam ocupados no banco são descartados pela mesma verificação
+  da importação CSV (``core.scheduling.conflitos_em_lote``);
+* o paciente de cada agendamento também é calculado pelo índice e
+  resolvido pelo CPF, uma query por lote.
+
+As gravações usam ``bulk_create``; ``bulk_create`` não dispara sinais,
+então os contadores de versão dos KPIs são incrementados ao final.
+"""
+import hashlib
+import multiprocessing
+import random
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connections, router, transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from .caching import incrementar_versao, MODELOS_VERSIONADOS
+from .finance import reconstruir_resumos
+from .models import Paciente, Profissional, JornadaTrabalho, Agendamento, Consulta
+from .scheduling import conflitos_em_lote, travar_agendas
+
+PRIMEIROS_NOMES = [
+    'Ana', 'João', 'Maria', 'José', 'Antônio', 'Francisca', 'Carlos', 'Paulo',
+    'Lúcia', 'Pedro', 'Márcia', 'Sérgio', 'Beatriz', 'Fábio', 'Helena', 'Ícaro',
+    'Juliana', 'Rafael', 'Camila', 'Gabriel', 'Larissa', 'Mateus', 'Letícia', 'Thiago',
+]
+SOBRENOMES = [
+    'Silva', 'Santos', 'Oliveira', 'Souza', 'Conceição', 'Araújo', 'Gonçalves',
+    'Lima', 'Gomes', 'Ribeiro', 'Simões', 'Magalhães', 'Fernandes', 'Brandão',
+    'Costa', 'Pereira', 'Carvalho', 'Almeida', 'Rocha', 'Barbosa',
+]
+ESPECIALIDADES = ['Clínica Geral', 'Cardiologia', 'Dermatologia', 'Pediatria', 'Ortopedia', 'Ginecologia']
+DDDS = ['11', '21', '31', '41', '51', '61', '71', '81', '85', '19']
+VALORES_CONSULTA = [80, 120, 150, 180, 200, 250, 300]
+
+INICIO_EXPEDIENTE = time(8)
+DURACAO_SLOT = 30  # minutos
+SLOTS_POR_DIA = 20  # 08h às 18h
+MULTIPLICADOR_CPF = 7_654_321  # coprimo com 10**9: a permutação é bijetora
+MULTIPLICADOR_PACIENTE = 2_654_435_761  # espalha os pacientes entre os agendamentos
+TAMANHO_LOTE = 5000
+
+
+def cpf_valido(numero):
+    """CPF formatado, com dígitos verificadores, para a base de 9 dígitos ``numero``"""
+    digitos = [int(d) for d in f'{numero:09d}']
+    for _ in range(2):
+        soma = sum(d * peso for d, peso in zip(digitos, range(len(digitos) + 1, 1, -1)))
+        digitos.append(soma * 10 % 11 % 10)
+    cpf = ''.join(map(str, digitos))
+    return f'{cpf[:3]}.{cpf[3:6]}.{cpf[6:9]}-{cpf[9:]}'
+
+
+def _executar_lote(args):
+    """Ponto de entrada dos processos filhos"""
+    config, metodo, lote = args
+    try:
+        return getattr(GeradorCarga(**config), metodo)(lote)
+    finally:
+        connections.close_all()
+
+
+class GeradorCarga:
+    def __init__(self, seed=42, prefixo='carga', profissionais=20, pacientes=10000,
+                 agendamentos=50000, ocupacao=0.75, tamanho_lote=TAMANHO_LOTE, hoje=None):
+        if not 0 < ocupacao <= 1:
+            raise ValueError('A ocupação deve estar entre 0 e 1')
+        if agendamentos and not (profissionais and pacientes):
+            raise ValueError('Agendamentos exigem profissionais e pacientes')
+        self.seed = seed
+        self.prefixo = prefixo
+        self.profissionais = profissionais
+        self.pacientes = pacientes
+        self.agendamentos = agendamentos
+        self.ocupacao = ocupacao
+        self.tamanho_lote = tamanho_lote
+        self.hoje = hoje or timezone.localdate()
+        digest = hashlib.sha256(f'{prefixo}:{seed}'.encode()).digest()
+        self._deslocamento_cpf = int.from_bytes(digest[:8], 'big') % 10**9
+
+    @property
+    def config(self):
+        return {
+            'seed': self.seed, 'prefixo': self.prefixo, 'profissionais': self.profissionais,
+            'pacientes': self.pacientes, 'agendamentos': self.agendamentos,
+            'ocupacao': self.ocupacao, 'tamanho_lote': self.tamanho_lote, 'hoje': self.hoje,
+        }
+
+    def _rng(self, tipo, lote):
+        return random.Random(f'{self.prefixo}:{self.seed}:{tipo}:{lote}')
+
+    def _lotes(self, total):
+        return range((total + self.tamanho_lote - 1) // self.tamanho_lote)
+
+    def _crm(self, indice):
+        return f'{self.prefixo.upper()}-{self.seed}-{indice}'
+
+    def cpf_paciente(self, indice):
+        return cpf_valido((indice * MULTIPLICADOR_CPF + self._deslocamento_cpf) % 10**9)
+
+    # Profissionais ---------------------------------------------------------
+
+    def gerar_profissionais(self):
+        """Usuários, profissionais e jornadas (seg–sex, 08h–18h); sempre em um processo"""
+        if Profissional.objects.filter(crm=self._crm(0)).exists():
+            raise ValueError(
+                f'Já existem dados de carga para prefixo "{self.prefixo}" e seed {self.seed}; '
+                'use outra seed ou outro prefixo'
+            )
+        rng = self._rng('profissionais', 0)
+        usuarios = User.objects.bulk_create([
+            User(username=f'{self.prefixo}_{self.seed}_{i}') for i in range(self.profissionais)
+        ])
+        profissionais = Profissional.objects.bulk_create([
+            Profissional(
+                usuario=usuario,
+                nome=f'{rng.choice(PRIMEIROS_NOMES)} {rng.choice(SOBRENOMES)}',
+                especialidade=rng.choice(ESPECIALIDADES),
+                crm=self._crm(i),
+                telefone=f'({rng.choice(DDDS)}) 3{rng.randrange(1000):03d}-{rng.randrange(10000):04d}',
+                email=f'{self.prefixo}.{self.seed}.{i}@pulse.com',
+                duracao_consulta=DURACAO_SLOT,
+            )
+            for i, usuario in enumerate(usuarios)
+        ])
+        fim_expediente = time(INICIO_EXPEDIENTE.hour + SLOTS_POR_DIA * DURACAO_SLOT // 60)
+        JornadaTrabalho.objects.bulk_create([
+            JornadaTrabalho(
+                profissional=profissional, dia_semana=dia,
+                hora_inicio=INICIO_EXPEDIENTE, hora_fim=fim_expediente
+            )
+            for profissional in profissionais for dia in range(5)
+        ])
+        return len(profissionais)
+
+    # Pacientes -------------------------------------------------------------
+
+    def gerar_pacientes(self, lote):
+        """Cria o lote ``lote`` de pacientes; devolve quantos foram inseridos"""
+        rng = self._rng('pacientes', lote)
+        inicio = lote * self.tamanho_lote
+        fim = min(inicio + self.tamanho_lote, self.pacientes)
+        agora = timezone.now()
+        pacientes = []
+        for indice in range(inicio, fim):
+            primeiro = rng.choice(PRIMEIROS_NOMES)
+            paciente = Paciente(
+                nome=f'{primeiro} {rng.choice(SOBRENOMES)} {rng.choice(SOBRENOMES)}',
+                cpf=self.cpf_paciente(indice),
+                data_nascimento=date(1935, 1, 1) + timedelta(days=rng.randrange(88 * 365)),
+                sexo=rng.choice(['M', 'F']),
+                telefone=f'({rng.choice(DDDS)}) 9{rng.randrange(10000):04d}-{rng.randrange(10000):04d}',
+                email=f'{primeiro.lower()}.{indice}@exemplo.com' if rng.random() < 0.6 else '',
+                ativo=rng.random() > 0.05,
+                # Cadastros distribuídos pelos últimos 5 anos
+                criado_em=agora - timedelta(minutes=rng.randrange(5 * 365 * 24 * 60)),
+            )
+            paciente.atualizar_campos_derivados()
+            pacientes.append(paciente)
+        with transaction.atomic():
+            # CPFs reais já cadastrados são mantidos como estão.
+            existentes = set(Paciente.objects.filter(
+                cpf__in=[paciente.cpf for paciente in pacientes]
+            ).values_list('cpf', flat=True))
+            pacientes = [paciente for paciente in pacientes if paciente.cpf not in existentes]
+            # auto_now_add sobrescreve criado_em no bulk_create; a data
+            # histórica é regravada em seguida, num único UPDATE preparado.
+            cadastros = [paciente.criado_em for paciente in pacientes]
+            Paciente.objects.bulk_create(pacientes, batch_size=1000)
+            self._regravar_cadastros(pacientes, cadastros)
+        return len(pacientes)
+
+    def _regravar_cadastros(self, pacientes, cadastros):
+        """Grava ``cadastros`` em ``criado_em`` dos ``pacientes`` já inseridos"""
+        conexao = connections[router.db_for_write(Paciente)]
+        nome = conexao.ops.quote_name
+        opcoes = Paciente._meta
+        with conexao.cursor() as cursor:
+            cursor.executemany(
+                f'UPDATE {nome(opcoes.db_table)} SET {nome(opcoes.get_field("criado_em").column)} = %s '
+                f'WHERE {nome(opcoes.pk.column)} = %s',
+                [(conexao.ops.adapt_datetimefield_value(criado_em), paciente.pk)
+                 for paciente, criado_em in zip(pacientes, cadastros)],
+            )
+
+    # Agendamentos e consultas ----------------------------------------------
+
+    def _primeiro_dia(self):
+        """Segunda-feira em que o calendário começa (metade dele fica no passado)"""
+        slots_por_profissional = -(-self.agendamentos // self.profissionais) / self.ocupacao
+        semanas = int(slots_por_profissional // (SLOTS_POR_DIA * 5)) + 1
+        segunda = self.hoje - timedelta(days=self.hoje.weekday())
+        return segunda - timedelta(weeks=semanas // 2)
+
+    def _horario(self, primeiro_dia, slot, tz):
+        dia_util, posicao = divmod(slot, SLOTS_POR_DIA)
+        semana, dia_semana = divmod(dia_util, 5)
+        dia = primeiro_dia + timedelta(weeks=semana, days=dia_semana)
+        return datetime.combine(dia, INICIO_EXPEDIENTE, tzinfo=tz) + timedelta(minutes=posicao * DURACAO_SLOT)
+
+    def gerar_agendamentos(self, lote):
+        """Cria o lote ``lote`` de agendamentos e as consultas dos realizados"""
+        rng = self._rng('agendamentos', lote)
+        inicio = lote * self.tamanho_lote
+        fim = min(inicio + self.tamanho_lote, self.agendamentos)
+        tz = timezone.get_current_timezone()
+        agora = timezone.now()
+        primeiro_dia = self._primeiro_dia()
+
+        profissionais = dict(Profissional.objects.filter(
+            crm__in=[self._crm(i) for i in range(self.profissionais)]
+        ).values_list('crm', 'id'))
+        indices_pacientes = {i: i * MULTIPLICADOR_PACIENTE % self.pacientes for i in range(inicio, fim)}
+        pacientes = dict(Paciente.objects.filter(
+            cpf__in={self.cpf_paciente(j) for j in indices_pacientes.values()}
+        ).values_list('cpf', 'id'))
+
+        agendamentos = []
+        for indice in range(inicio, fim):
+            sequencia = indice // self.profissionais
+            data_hora = self._horario(primeiro_dia, int(sequencia / self.ocupacao), tz)
+            if data_hora < agora:
+                status = rng.choices(['realizado', 'faltou', 'cancelado'], [75, 10, 15])[0]
+            else:
+                status = rng.choices(['agendado', 'confirmado', 'cancelado'], [60, 30, 10])[0]
+            agendamentos.append(Agendamento(
+                paciente_id=pacientes[self.cpf_paciente(indices_pacientes[indice])],
+                profissional_id=profissionais[self._crm(indice % self.profissionais)],
+                data_hora=data_hora,
+                duracao=DURACAO_SLOT,
+                status=status,
+            ))
+
+        with transaction.atomic():
+            # As agendas geradas não colidem entre si, mas um profissional
+            # já existente (mesmo prefixo) pode ter horários ocupados.
+            travar_agendas(profissionais.values())
+            conflitos = conflitos_em_lote(agendamentos)
+            agendamentos = [agendamento for i, agendamento in enumerate(agendamentos) if i not in conflitos]
+            Agendamento.objects.bulk_create(agendamentos, batch_size=1000)
+            consultas = [
+                Consulta(
+                    agendamento_id=agendamento.pk,
+                    sintomas='Queixa registrada na triagem',
+                    diagnostico='Sem alterações relevantes',
+                    tratamento='Orientações gerais',
+                    valor=Decimal(rng.choice(VALORES_CONSULTA)),
+                    pago=rng.random() < 0.7,
+                )
+                for agendamento in agendamentos if agendamento.status == 'realizado'
+            ]
+            Consulta.objects.bulk_create(consultas, batch_size=1000)
+            # A consulta é registrada no horário do atendimento.
+            Consulta.objects.filter(pk__in=[consulta.pk for consulta in consultas]).update(
+                criado_em=Subquery(Agendamento.objects.filter(pk=OuterRef('agendamento_id')).values('data_hora')[:1])
+            )
+        return len(agendamentos)
+
+    # Orquestração ----------------------------------------------------------
+
+    def _executar(self, metodo, total, processos, progresso):
+        lotes = self._lotes(total)
+        # O SQLite tem um único escritor: processos paralelos só gerariam
+        # "database is locked".
+        if processos > 1 and len(lotes) > 1 and connections['default'].vendor != 'sqlite':
+            # Os filhos (fork) abrem suas próprias conexões.
+            connections.close_all()
+            contexto = multiprocessing.get_context('fork')
+            with contexto.Pool(processos) as pool:
+                tarefas = [(self.config, metodo, lote) for lote in lotes]
+                for quantidade in pool.imap_unordered(_executar_lote, tarefas):
+                    progresso(metodo, quantidade)
+        else:
+            for lote in lotes:
+                progresso(metodo, getattr(self, metodo)(lote))
+
+    def gerar(self, processos=1, progresso=None):
+        """Gera tudo; ``progresso(etapa, quantidade)`` é chamado a cada lote"""
+        progresso = progresso or (lambda etapa, quantidade: None)
+        if self.profissionais:
+            progresso('gerar_profissionais', self.gerar_profissionais())
+        self._executar('gerar_pacientes', self.pacientes, processos, progresso)
+        self._executar('gerar_agendamentos', self.agendamentos, processos, progresso)
+        # As consultas entram por bulk_create, sem os sinais que mantêm os resumos.
+        reconstruir_resumos()
+        for modelo in MODELOS_VERSIONADOS:
+            incrementar_versao(modelo)
@@ -0,0 +1,92 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from datetime import date, timedelta
+from core.models import Paciente
+from core.search import buscar_pacientes, obter_backend
+import random
+import statistics
+import time
+
+PRIMEIROS_NOMES = [
+    'Ana', 'João', 'Maria', 'José', 'Antônio', 'Francisca', 'Carlos', 'Paulo',
+    'Lúcia', 'Pedro', 'Márcia', 'Sérgio', 'Beatriz', 'Fábio', 'Helena', 'Ícaro',
+]
+SOBRENOMES = [
+    'Silva', 'Santos', 'Oliveira', 'Souza', 'Conceição', 'Araújo', 'Gonçalves',
+    'Lima', 'Gomes', 'Ribeiro', 'Simões', 'Magalhães', 'Fernandes', 'Brandão',
+]
+
+
+class Command(BaseCommand):
+    help = 'Compara a latência da busca de pacientes antiga (icontains) com a indexada'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pacientes', type=int, default=50000, help='Quantidade de pacientes a semear')
+        parser.add_argument('--repeticoes', type=int, default=20, help='Execuções de cada termo')
+        parser.add_argument('--seed', type=int, default=42, help='Semente do gerador aleatório')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        self.stdout.write(f'🔎 Backend de busca: {obter_backend().nome}')
+
+        # Tudo é desfeito ao final: o benchmark nunca altera o banco.
+        with transaction.atomic():
+            self.stdout.write(f'👥 Semeando {options["pacientes"]} pacientes...')
+            self.semear(options['pacientes'], rng)
+
+            termos = ['silva', 'Joã', 'maria santos', 'conceicao', '123.4', '(11) 98']
+            self.stdout.write(f'{"termo":<16}{"antiga p50":>12}{"antiga p95":>12}{"nova p50":>12}{"nova p95":>12}')
+            for termo in termos:
+                antiga = self.medir(lambda: self.busca_antiga(termo), options['repeticoes'])
+                nova = self.medir(lambda: self.busca_nova(termo), options['repeticoes'])
+                self.stdout.write(
+                    f'{termo:<16}{antiga[0]:>10.2f}ms{antiga[1]:>10.2f}ms'
+                    f'{nova[0]:>10.2f}ms{nova[1]:>10.2f}ms'
+                )
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('✅ Benchmark concluído (dados removidos)'))
+
+    def semear(self, quantidade, rng):
+        """Cria pacientes em lote, já com as colunas de busca preenchidas"""
+        base_nascimento = date(1940, 1, 1)
+        lote = []
+        for i in range(quantidade):
+            cpf = f'{rng.randrange(10**11):011d}'
+            paciente = Paciente(
+                nome=f'{rng.choice(PRIMEIROS_NOMES)} {rng.choice(SOBRENOMES)} {rng.choice(SOBRENOMES)}',
+                cpf=f'{cpf[:3]}.{cpf[3:6]}.{cpf[6:9]}-{cpf[9:]}',
+                data_nascimento=base_nascimento + timedelta(days=rng.randrange(80 * 365)),
+                sexo=rng.choice(['M', 'F']),
+                telefone=f'(11) 9{rng.randrange(10000):04d}-{rng.randrange(10000):04d}',
+            )
+            paciente.atualizar_campos_derivados()
+            lote.append(paciente)
+            if len(lote) >= 5000:
+                Paciente.objects.bulk_create(lote, ignore_conflicts=True)
+                lote = []
+        if lote:
+            Paciente.objects.bulk_create(lote, ignore_conflicts=True)
+
+    def busca_antiga(self, termo):
+        return list(Paciente.objects.filter(ativo=True).filter(
+            Q(nome__icontains=termo) |
+            Q(cpf__icontains=termo) |
+            Q(telefone__icontains=termo)
+        ).order_by('nome')[:50])
+
+    def busca_nova(self, termo):
+        return list(buscar_pacientes(Paciente.objects.filter(ativo=True), termo).order_by('nome')[:50])
+
+    def medir(self, funcao, repeticoes):
+        """Retorna (p50, p95) em milissegundos"""
+        tempos = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            funcao()
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        tempos.sort()
+        p95 = tempos[min(len(tempos) - 1, int(round(0.95 * (len(tempos) - 1))))]
+        return statistics.median(tempos), p95
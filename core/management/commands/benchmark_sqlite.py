@@ -0,0 +1,137 @@
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+from django.db.utils import load_backend
+from pathlib import Path
+import statistics
+import tempfile
+import threading
+import time
+
+ALIAS = 'benchmark_sqlite'
+VARIANTES = [
+    ('padrão do Django', 'django.db.backends.sqlite3', {}),
+    ('WAL, BEGIN DEFERRED', 'core.backends.sqlite3', {'transaction_mode': 'DEFERRED'}),
+    ('perfil Pulse', 'core.backends.sqlite3', {}),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Simula recepção e médicos gravando ao mesmo tempo num SQLite: compara o '
+        'backend padrão com o perfil do Pulse (WAL, busy_timeout, BEGIN IMMEDIATE)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escritores', type=int, default=8, help='Threads gravando')
+        parser.add_argument('--leitores', type=int, default=2, help='Threads lendo')
+        parser.add_argument('--transacoes', type=int, default=100, help='Transações por escritor')
+        parser.add_argument('--pausa-ms', type=float, default=1.0, help='Trabalho entre a leitura e a escrita')
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'🔒 {options["escritores"]} escritores x {options["transacoes"]} transações, '
+            f'{options["leitores"]} leitores'
+        )
+        self.stdout.write(
+            f'{"variante":<22}{"ok":>7}{"locked":>8}{"tx/s":>9}{"p50":>10}{"p95":>10}{"leituras":>10}'
+        )
+        for nome, engine, opcoes in VARIANTES:
+            with tempfile.TemporaryDirectory() as pasta:
+                # Banco descartável, fora de DATABASES; os demais valores são os padrões.
+                configuracao = connections.configure_settings({
+                    **connections.settings,
+                    ALIAS: {'ENGINE': engine, 'NAME': str(Path(pasta) / 'bench.sqlite3'), 'OPTIONS': opcoes},
+                })[ALIAS]
+                r = self.executar(configuracao, options)
+            self.stdout.write(
+                f'{nome:<22}{r["ok"]:>7}{r["locked"]:>8}{r["tps"]:>9.0f}'
+                f'{r["p50"]:>8.1f}ms{r["p95"]:>8.1f}ms{r["leituras"]:>10}'
+            )
+        self.stdout.write(self.style.SUCCESS('✅ Benchmark concluído'))
+
+    def conectar(self, configuracao):
+        """Conexão desta thread, acessível por ``connections[ALIAS]`` só nela"""
+        conexao = load_backend(configuracao['ENGINE']).DatabaseWrapper(configuracao, ALIAS)
+        connections[ALIAS] = conexao
+        return conexao
+
+    def executar(self, configuracao, options):
+        conexao = self.conectar(configuracao)
+        with conexao.cursor() as cursor:
+            cursor.execute('CREATE TABLE contador (id INTEGER PRIMARY KEY, total INTEGER NOT NULL)')
+            cursor.execute('CREATE TABLE evento (id INTEGER PRIMARY KEY, contador_id INTEGER, criado_em REAL)')
+            for numero in range(options['escritores']):
+                cursor.execute('INSERT INTO contador (id, total) VALUES (%s, 0)', [numero])
+        conexao.close()
+
+        tempos, erros, leituras = [], [], []
+        fim_escrita = threading.Event()
+        escritores = [
+            threading.Thread(target=self.escrever, args=(configuracao, numero, options, tempos, erros))
+            for numero in range(options['escritores'])
+        ]
+        leitores = [
+            threading.Thread(target=self.ler, args=(configuracao, fim_escrita, leituras))
+            for _ in range(options['leitores'])
+        ]
+        inicio = time.perf_counter()
+        for thread in escritores + leitores:
+            thread.start()
+        for thread in escritores:
+            thread.join()
+        duracao = time.perf_counter() - inicio
+        fim_escrita.set()
+        for thread in leitores:
+            thread.join()
+
+        tempos.sort()
+        p95 = tempos[min(len(tempos) - 1, int(round(0.95 * (len(tempos) - 1))))] if tempos else 0.0
+        return {
+            'ok': len(tempos),
+            'locked': len(erros),
+            'tps': len(tempos) / duracao,
+            'p50': statistics.median(tempos) if tempos else 0.0,
+            'p95': p95,
+            'leituras': sum(leituras),
+        }
+
+    def escrever(self, configuracao, numero, options, tempos, erros):
+        conexao = self.conectar(configuracao)
+        pausa = options['pausa_ms'] / 1000
+        try:
+            for _ in range(options['transacoes']):
+                inicio = time.perf_counter()
+                try:
+                    # Lê e depois grava na mesma transação, como ao remarcar
+                    # um horário conferindo a agenda antes.
+                    with transaction.atomic(using=ALIAS), conexao.cursor() as cursor:
+                        cursor.execute('SELECT total FROM contador WHERE id = %s', [numero])
+                        total = cursor.fetchone()[0]
+                        time.sleep(pausa)
+                        cursor.execute('UPDATE contador SET total = %s WHERE id = %s', [total + 1, numero])
+                        cursor.execute('INSERT INTO evento (contador_id, criado_em) VALUES (%s, %s)', [numero, time.time()])
+                except OperationalError as erro:
+                    erros.append(str(erro))
+                    continue
+                tempos.append((time.perf_counter() - inicio) * 1000)
+        finally:
+            conexao.close()
+            del connections[ALIAS]
+
+    def ler(self, configuracao, fim_escrita, leituras):
+        conexao = self.conectar(configuracao)
+        total = 0
+        try:
+            while not fim_escrita.is_set():
+                try:
+                    with conexao.cursor() as cursor:
+                        cursor.execute('SELECT COUNT(*) FROM evento')
+                        cursor.fetchone()
+                    total += 1
+                except OperationalError:
+                    pass
+                time.sleep(0.001)
+        finally:
+            conexao.close()
+            del connections[ALIAS]
+            leituras.append(total)
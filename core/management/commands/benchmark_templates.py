@@ -0,0 +1,102 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.template import Context, Engine
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from django.utils import timezone
+from datetime import datetime, time as hora, timedelta
+from core.models import Agendamento, Paciente, Profissional
+from core.pagination import PaginaCursor
+import random
+import statistics
+import time
+
+STATUS = ['agendado', 'confirmado', 'confirmado', 'realizado', 'cancelado']
+LOADERS = ['django.template.loaders.filesystem.Loader', 'django.template.loaders.app_directories.Loader']
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede a renderização da agenda de um dia cheio: sem o loader em cache, '
+        'com o loader em cache e com os fragmentos por linha aquecidos'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--agendamentos', type=int, default=500, help='Agendamentos no dia')
+        parser.add_argument('--repeticoes', type=int, default=20, help='Renderizações medidas por variante')
+        parser.add_argument('--seed', type=int, default=42, help='Semente do gerador aleatório')
+
+    def handle(self, *args, **options):
+        contexto = self.contexto(options['agendamentos'], random.Random(options['seed']))
+        base = Engine.get_default()
+        sem_cache = self.engine(base, LOADERS)
+        com_cache = self.engine(base, [('django.template.loaders.cached.Loader', LOADERS)])
+
+        # Cache local e isolado: o benchmark não toca o cache configurado.
+        local = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'OPTIONS': {'MAX_ENTRIES': 100000}}
+        with override_settings(CACHES={'default': local}):
+            variantes = [
+                ('sem loader em cache', lambda: self.renderizar(sem_cache, contexto, limpar=True)),
+                ('loader em cache', lambda: self.renderizar(com_cache, contexto, limpar=True)),
+                ('loader + fragmentos', lambda: self.renderizar(com_cache, contexto)),
+            ]
+            self.stdout.write(f'🧩 Agenda com {options["agendamentos"]} agendamentos')
+            self.stdout.write(f'{"variante":<24}{"p50":>12}{"p95":>12}{"KB":>8}')
+            referencia = None
+            for nome, funcao in variantes:
+                tamanho = len(funcao())  # aquece o loader e os fragmentos
+                p50, p95 = self.medir(funcao, options['repeticoes'])
+                referencia = referencia or p50
+                self.stdout.write(
+                    f'{nome:<24}{p50:>10.2f}ms{p95:>10.2f}ms{tamanho / 1024:>8.1f}  ({referencia / p50:.1f}x)'
+                )
+
+        self.stdout.write(self.style.SUCCESS('✅ Benchmark concluído'))
+
+    def engine(self, base, loaders):
+        return Engine(
+            dirs=base.dirs, loaders=loaders, libraries=base.libraries,
+            string_if_invalid=base.string_if_invalid, debug=False,
+        )
+
+    def contexto(self, quantidade, rng):
+        """Agendamentos em memória (sem banco) como os da view da agenda"""
+        agora = timezone.now()
+        dia = timezone.localdate()
+        inicio = timezone.make_aware(datetime.combine(dia, hora(7)))
+        profissionais = [
+            Profissional(pk=numero, nome=f'Dr(a). Profissional {numero}', especialidade=especialidade)
+            for numero, especialidade in enumerate(['Clínica Geral', 'Cardiologia', 'Pediatria', 'Dermatologia'], 1)
+        ]
+        agendamentos = []
+        for numero in range(1, quantidade + 1):
+            paciente = Paciente(pk=numero, nome=f'Paciente {numero:05d}', telefone='(11) 90000-0000', atualizado_em=agora)
+            agendamentos.append(Agendamento(
+                pk=numero, paciente=paciente, profissional=rng.choice(profissionais),
+                data_hora=inicio + timedelta(minutes=numero * 12 // len(profissionais)),
+                status=rng.choice(STATUS), atualizado_em=agora,
+            ))
+        request = RequestFactory().get('/consultorio/agenda/')
+        return {
+            'request': request,
+            'agendamentos_hoje': PaginaCursor(itens=agendamentos),
+            'proximo_cursor': '',
+            'proximos_agendamentos': agendamentos[:10],
+            'data_hoje': dia,
+        }
+
+    def renderizar(self, engine, contexto, limpar=False):
+        if limpar:
+            cache.clear()
+        return engine.get_template('core/consultorio_agenda.html').render(Context(contexto))
+
+    def medir(self, funcao, repeticoes):
+        """Retorna (p50, p95) em milissegundos"""
+        tempos = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            funcao()
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        tempos.sort()
+        p95 = tempos[min(len(tempos) - 1, int(round(0.95 * (len(tempos) - 1))))]
+        return statistics.median(tempos), p95
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.benchmarks import executar_suite, comparar
+from core.benchmarks.cenarios import CENARIOS
+import json
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede tempo, queries, tempo de SQL e pico de memória das views em várias '
+        'escalas de dados e emite JSON comparável entre commits'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanhos', default='1000,10000', help='Quantidades de pacientes, separadas por vírgula')
+        parser.add_argument('--repeticoes', type=int, default=10, help='Execuções medidas por cenário')
+        parser.add_argument('--seed', type=int, default=42, help='Semente dos dados gerados')
+        parser.add_argument('--cenarios', default='', help='Filtra os cenários pelo nome (separados por vírgula)')
+        parser.add_argument('--com-cache', action='store_true', help='Mantém o cache configurado ligado')
+        parser.add_argument('--saida', help='Grava o resultado JSON neste arquivo (padrão: stdout)')
+        parser.add_argument('--comparar', help='Resultado JSON anterior para detectar regressões')
+        parser.add_argument('--limite', type=float, default=0.2, help='Piora relativa tolerada (0.2 = 20%%)')
+
+    def handle(self, *args, **options):
+        try:
+            tamanhos = [int(valor) for valor in options['tamanhos'].split(',') if valor.strip()]
+        except ValueError:
+            raise CommandError('--tamanhos deve ser uma lista de inteiros')
+
+        cenarios = CENARIOS
+        if options['cenarios']:
+            nomes = {nome.strip() for nome in options['cenarios'].split(',')}
+            cenarios = [cenario for cenario in CENARIOS if cenario[0] in nomes]
+            if not cenarios:
+                raise CommandError(f'Nenhum cenário encontrado; disponíveis: {", ".join(c[0] for c in CENARIOS)}')
+
+        resultado = executar_suite(
+            tamanhos, repeticoes=options['repeticoes'], seed=options['seed'],
+            cenarios=cenarios, com_cache=options['com_cache'],
+            progresso=lambda mensagem: self.stderr.write(mensagem),
+        )
+
+        saida = json.dumps(resultado, indent=2, ensure_ascii=False)
+        if options['saida']:
+            with open(options['saida'], 'w', encoding='utf-8') as arquivo:
+                arquivo.write(saida + '\n')
+            self.stderr.write(f'💾 Resultado gravado em {options["saida"]}')
+        else:
+            self.stdout.write(saida)
+
+        if options['comparar']:
+            with open(options['comparar'], encoding='utf-8') as arquivo:
+                base = json.load(arquivo)
+            regressoes = comparar(base, resultado, options['limite'])
+            if regressoes:
+                for regressao in regressoes:
+                    self.stderr.write(self.style.ERROR(f'❌ {regressao}'))
+                raise CommandError(f'{len(regressoes)} regressão(ões) acima de {options["limite"]:.0%}')
+            self.stderr.write(self.style.SUCCESS(f'✅ Sem regressões em relação a {options["comparar"]}'))
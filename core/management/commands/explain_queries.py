@@ -0,0 +1,112 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction, connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from core import views
+from core.loadgen import GeradorCarga
+import json
+
+# Rotas verificadas: (nome, view, parâmetros GET)
+ROTAS = [
+    ('dashboard', views.dashboard, {}),
+    ('agenda', views.agenda, {}),
+    ('pacientes', views.pacientes, {}),
+    ('pacientes?busca=nome', views.pacientes, {'busca': 'silva'}),
+    ('pacientes?busca=cpf', views.pacientes, {'busca': '123.4'}),
+    ('financeiro', views.financeiro, {}),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Executa EXPLAIN nas queries do dashboard, agenda, pacientes e financeiro e falha se houver '
+        'varredura sequencial ou se alguma view exceder seu orçamento de queries'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pacientes', type=int, default=20000, help='Pacientes a semear')
+        parser.add_argument('--agendamentos', type=int, default=50000, help='Agendamentos a semear')
+        parser.add_argument('--seed', type=int, default=42, help='Semente do gerador aleatório')
+        parser.add_argument('--verbose-plans', action='store_true', help='Mostra o plano completo de cada query')
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            raise CommandError(f'Banco não suportado: {connection.vendor}')
+
+        falhas = []
+        # Os dados semeados são descartados no final; o cache é desligado
+        # para que todas as queries dos KPIs sejam de fato executadas.
+        with transaction.atomic(), override_settings(
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+        ):
+            self.stdout.write('🌱 Semeando dados...')
+            self.semear(options['pacientes'], options['agendamentos'], options['seed'])
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+            factory = RequestFactory()
+            for nome, view, params in ROTAS:
+                with CaptureQueriesContext(connection) as queries:
+                    view(factory.get('/', params))
+                orcamento = getattr(view, 'orcamento_queries', None)
+                if orcamento is not None and len(queries) > orcamento:
+                    falhas.append((nome, f'{len(queries)} queries', [f'orçamento de {orcamento} excedido']))
+                for query in queries.captured_queries:
+                    sql = query['sql']
+                    if not sql.lstrip().upper().startswith('SELECT'):
+                        continue
+                    plano = self.explicar(sql)
+                    varreduras = self.varreduras_sequenciais(sql, plano)
+                    if options['verbose_plans']:
+                        self.stdout.write(f'\n[{nome}] {sql}\n  ' + '\n  '.join(plano))
+                    if varreduras:
+                        falhas.append((nome, sql, varreduras))
+
+            transaction.set_rollback(True)
+
+        if falhas:
+            for nome, sql, varreduras in falhas:
+                self.stdout.write(self.style.ERROR(f'❌ [{nome}] {", ".join(varreduras)}'))
+                self.stdout.write(f'   {sql}')
+            raise CommandError(f'{len(falhas)} problemas de performance encontrados')
+        self.stdout.write(self.style.SUCCESS('✅ Nenhuma varredura sequencial e orçamentos de queries respeitados'))
+
+    def explicar(self, sql):
+        """Retorna as linhas do plano de execução de ``sql``"""
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                return [linha[-1] for linha in cursor.fetchall()]
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+            plano = cursor.fetchone()[0]
+            if isinstance(plano, str):
+                plano = json.loads(plano)
+            linhas = []
+            pendentes = [plano[0]['Plan']]
+            while pendentes:
+                no = pendentes.pop()
+                linhas.append(f"{no['Node Type']} {no.get('Relation Name', '')}".strip())
+                pendentes.extend(no.get('Plans', []))
+            return linhas
+
+    def varreduras_sequenciais(self, sql, plano):
+        if connection.vendor == 'sqlite':
+            # Percorrer um índice já na ordem do ORDER BY até o LIMIT é o
+            # melhor plano possível para listagens paginadas.
+            ordenado_com_limite = ' LIMIT ' in sql and not any('TEMP B-TREE' in linha for linha in plano)
+            # Fora isso, qualquer varredura da tabela inteira (direta ou por
+            # índice não coberto) é uma degradação. Varreduras só do índice
+            # (COVERING) e da tabela virtual FTS5 são aceitáveis.
+            return [
+                linha for linha in plano
+                if linha.startswith('SCAN ')
+                and 'COVERING INDEX' not in linha
+                and 'VIRTUAL TABLE' not in linha
+                and not (ordenado_com_limite and 'USING INDEX' in linha)
+            ]
+        return [linha for linha in plano if linha.startswith('Seq Scan')]
+
+    def semear(self, total_pacientes, total_agendamentos, seed):
+        GeradorCarga(
+            seed=seed, prefixo='explain', pacientes=total_pacientes, agendamentos=total_agendamentos
+        ).gerar()
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.reports import consultas_do_periodo, EXPORTADORES, TAMANHO_LOTE
+from datetime import date
+import time
+
+
+class Command(BaseCommand):
+    help = (
+        'Exporta as consultas de um período (paciente, profissional e valores) em CSV ou XLSX, '
+        'lendo em lotes com memória constante'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--inicio', required=True, help='Data inicial (AAAA-MM-DD)')
+        parser.add_argument('--fim', required=True, help='Data final, inclusive (AAAA-MM-DD)')
+        parser.add_argument('--formato', choices=sorted(EXPORTADORES), default='csv')
+        parser.add_argument('--saida', help='Arquivo de saída (padrão: saída padrão)')
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help='Linhas lidas por vez')
+
+    def handle(self, *args, **options):
+        try:
+            inicio = date.fromisoformat(options['inicio'])
+            fim = date.fromisoformat(options['fim'])
+        except ValueError:
+            raise CommandError('Use datas no formato AAAA-MM-DD')
+        if fim < inicio:
+            raise CommandError('--fim deve ser igual ou posterior a --inicio')
+
+        formato = options['formato']
+        partes = EXPORTADORES[formato](consultas_do_periodo(inicio, fim), options['lote'])
+        if not options['saida']:
+            if formato == 'xlsx':
+                raise CommandError('XLSX exige --saida')
+            for parte in partes:
+                self.stdout.write(parte, ending='')
+            return
+
+        inicio_exportacao = time.perf_counter()
+        modo, encoding = ('wb', None) if formato == 'xlsx' else ('w', 'utf-8')
+        tamanho = 0
+        with open(options['saida'], modo, encoding=encoding, newline='' if encoding else None) as saida:
+            for parte in partes:
+                saida.write(parte)
+                tamanho += len(parte)
+        self.stderr.write(self.style.SUCCESS(
+            f'✅ {options["saida"]} ({tamanho / 1024 / 1024:.1f} MB) em {time.perf_counter() - inicio_exportacao:.1f}s'
+        ))
@@ -0,0 +1,8 @@
+from core.csvio import ImportadorAgendamentos, COLUNAS_AGENDAMENTOS
+from core.management.commands.import_pacientes import Command as ImportarPacientes
+
+
+class Command(ImportarPacientes):
+    help = 'Importa agendamentos de um CSV em lotes (colunas: %s)' % ', '.join(COLUNAS_AGENDAMENTOS)
+    importador = ImportadorAgendamentos
+    tipo = 'agendamentos'
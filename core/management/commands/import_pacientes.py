@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.csvio import ImportadorPacientes, COLUNAS_PACIENTES, TAMANHO_LOTE
+from core.tasks import enfileirar
+import os
+
+
+class Command(BaseCommand):
+    help = 'Importa pacientes de um CSV em lotes (colunas: %s)' % ', '.join(COLUNAS_PACIENTES)
+    importador = ImportadorPacientes
+    tipo = 'pacientes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Caminho do arquivo CSV (com cabeçalho)')
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help='Linhas por lote/transação')
+        parser.add_argument('--encoding', default='utf-8-sig', help='Codificação do arquivo')
+        parser.add_argument('--simular', action='store_true', help='Valida tudo sem gravar no banco')
+        parser.add_argument('--max-erros', type=int, default=50, help='Quantidade de erros exibidos')
+        parser.add_argument(
+            '--em-segundo-plano', action='store_true',
+            help='Apenas enfileira a importação para o run_worker (progresso no admin, em Tarefas)'
+        )
+
+    def handle(self, *args, **options):
+        if options['em_segundo_plano']:
+            if options['simular']:
+                raise CommandError('--simular não pode ser usado com --em-segundo-plano')
+            tarefa = enfileirar(
+                'importar_csv', caminho=os.path.abspath(options['arquivo']), tipo=self.tipo,
+                lote=options['lote'], encoding=options['encoding'],
+            )
+            self.stdout.write(self.style.SUCCESS(f'✅ Importação enfileirada: tarefa #{tarefa.pk}'))
+            return
+
+        importador = self.importador(tamanho_lote=options['lote'])
+        try:
+            with open(options['arquivo'], newline='', encoding=options['encoding']) as arquivo:
+                resultado = importador.importar(arquivo, simular=options['simular'])
+        except (OSError, ValueError) as erro:
+            raise CommandError(str(erro))
+
+        for linha, mensagem in resultado.erros[:options['max_erros']]:
+            self.stderr.write(f'  linha {linha}: {mensagem}')
+        if len(resultado.erros) > options['max_erros']:
+            self.stderr.write(f'  ... e mais {len(resultado.erros) - options["max_erros"]} erro(s)')
+
+        acao = 'seriam importados' if options['simular'] else 'importados'
+        estilo = self.style.WARNING if resultado.erros else self.style.SUCCESS
+        self.stdout.write(estilo(
+            f'✅ {resultado.importadas} de {resultado.lidas} registros {acao} '
+            f'({len(resultado.erros)} com erro)'
+        ))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.finance import reconstruir_resumos
+from datetime import datetime
+import time
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula os resumos financeiros diários e mensais a partir das consultas '
+        '(necessário após gravações que não disparam sinais, como bulk_create)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help='Recalcula só a partir deste mês (AAAA-MM)')
+
+    def handle(self, *args, **options):
+        desde = None
+        if options['desde']:
+            try:
+                desde = datetime.strptime(options['desde'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError('Use --desde no formato AAAA-MM')
+
+        inicio = time.perf_counter()
+        dias, meses = reconstruir_resumos(desde)
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {dias} resumos diários e {meses} mensais recalculados em {time.perf_counter() - inicio:.1f}s'
+        ))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db import connections
+from core.tasks import Worker
+import multiprocessing
+import signal
+
+
+def _rodar_processo(threads, intervalo, ate_esvaziar):
+    worker = Worker(threads=threads, intervalo=intervalo)
+    signal.signal(signal.SIGTERM, lambda *args: worker.parar())
+    signal.signal(signal.SIGINT, lambda *args: worker.parar())
+    worker.rodar(ate_esvaziar=ate_esvaziar)
+
+
+class Command(BaseCommand):
+    help = 'Executa as tarefas em segundo plano da fila (core.tasks) com um pool de threads/processos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4, help='Tarefas simultâneas por processo')
+        parser.add_argument('--processos', type=int, default=1, help='Processos worker (cada um com --threads)')
+        parser.add_argument('--intervalo', type=float, default=1.0, help='Segundos entre consultas à fila vazia')
+        parser.add_argument('--ate-esvaziar', action='store_true', help='Termina quando não houver tarefas prontas')
+
+    def handle(self, *args, **options):
+        processos = max(1, options['processos'])
+        if processos > 1 and connections['default'].vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING('⚠️  SQLite serializa as escritas; processos extras pouco ajudam'))
+        argumentos = (options['threads'], options['intervalo'], options['ate_esvaziar'])
+        self.stdout.write(f'👷 Worker iniciado: {processos} processo(s) x {options["threads"]} thread(s)')
+
+        if processos == 1:
+            _rodar_processo(*argumentos)
+        else:
+            # Os filhos (fork) abrem suas próprias conexões.
+            connections.close_all()
+            contexto = multiprocessing.get_context('fork')
+            filhos = [contexto.Process(target=_rodar_processo, args=argumentos) for _ in range(processos)]
+            for filho in filhos:
+                filho.start()
+            # SIGTERM/SIGINT no pai é repassado aos filhos, que terminam as tarefas em andamento.
+            signal.signal(signal.SIGTERM, lambda *args: [filho.terminate() for filho in filhos])
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            for filho in filhos:
+                filho.join()
+        self.stdout.write(self.style.SUCCESS('✅ Worker encerrado'))
@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from core.loadgen import GeradorCarga, TAMANHO_LOTE
+import time
+
+ETAPAS = {
+    'gerar_profissionais': 'profissionais',
+    'gerar_pacientes': 'pacientes',
+    'gerar_agendamentos': 'agendamentos',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Gera dados sintéticos determinísticos (pacientes, agendas sem colisão e consultas) '
+        'em volume de produção para testes de carga'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42, help='Semente; a mesma seed gera os mesmos dados')
+        parser.add_argument('--prefixo', default='carga', help='Prefixo dos usuários/CRMs gerados')
+        parser.add_argument('--profissionais', type=int, default=20, help='Profissionais a criar')
+        parser.add_argument('--pacientes', type=int, default=100000, help='Pacientes a criar')
+        parser.add_argument('--agendamentos', type=int, default=500000, help='Agendamentos a criar')
+        parser.add_argument('--ocupacao', type=float, default=0.75, help='Fração dos horários da jornada ocupada (0-1]')
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help='Registros por lote/transação')
+        parser.add_argument(
+            '--processos', type=int, default=1,
+            help='Processos em paralelo (só no PostgreSQL; o SQLite serializa as escritas)'
+        )
+
+    def handle(self, *args, **options):
+        processos = options['processos']
+        if processos > 1 and connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING('⚠️  SQLite não aceita escritas paralelas; usando 1 processo'))
+            processos = 1
+
+        try:
+            gerador = GeradorCarga(
+                seed=options['seed'], prefixo=options['prefixo'],
+                profissionais=options['profissionais'], pacientes=options['pacientes'],
+                agendamentos=options['agendamentos'], ocupacao=options['ocupacao'],
+                tamanho_lote=options['lote'],
+            )
+        except ValueError as erro:
+            raise CommandError(str(erro))
+
+        totais = dict.fromkeys(ETAPAS.values(), 0)
+        inicio = time.perf_counter()
+
+        def progresso(etapa, quantidade):
+            nome = ETAPAS[etapa]
+            totais[nome] += quantidade
+            alvo = options[nome]
+            self.stdout.write(f'  {nome}: {totais[nome]}/{alvo} ({time.perf_counter() - inicio:.1f}s)')
+
+        self.stdout.write(f'🌱 Gerando dados (seed {options["seed"]}, {processos} processo(s))...')
+        try:
+            gerador.gerar(processos=processos, progresso=progresso)
+        except ValueError as erro:
+            raise CommandError(str(erro))
+
+        duracao = time.perf_counter() - inicio
+        total = sum(totais.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {total} registros principais em {duracao:.1f}s ({total / duracao:.0f}/s)'
+        ))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.jobs import agendar_lembretes
+from core.reminders import enviar_lembretes, TAMANHO_LOTE
+from django.utils import timezone
+from datetime import date
+import time
+
+
+class Command(BaseCommand):
+    help = (
+        'Envia por e-mail os lembretes dos agendamentos de amanhã (ou de --dia) em lotes, '
+        'sem repetir lembretes já enviados'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dia', help='Dia dos agendamentos (AAAA-MM-DD; padrão: amanhã)')
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help='Lembretes reservados por lote')
+        parser.add_argument(
+            '--agendar', action='store_true',
+            help='Em vez de enviar agora, agenda o envio diário recorrente na fila do run_worker'
+        )
+
+    def handle(self, *args, **options):
+        if options['agendar']:
+            tarefa = agendar_lembretes()
+            quando = timezone.localtime(tarefa.executar_apos).strftime('%d/%m/%Y %H:%M')
+            self.stdout.write(self.style.SUCCESS(f'✅ Envio diário agendado: tarefa #{tarefa.pk} ({quando})'))
+            return
+
+        try:
+            dia = date.fromisoformat(options['dia']) if options['dia'] else None
+        except ValueError:
+            raise CommandError('Use --dia no formato AAAA-MM-DD')
+
+        inicio = time.perf_counter()
+        resultado = enviar_lembretes(dia, tamanho_lote=options['lote'])
+        estilo = self.style.WARNING if resultado.falhas else self.style.SUCCESS
+        self.stdout.write(estilo(
+            f'✅ {resultado.enviados} lembrete(s) enviados, {resultado.falhas} falha(s), '
+            f'{resultado.ja_reservados} já em envio por outro processo '
+            f'({time.perf_counter() - inicio:.1f}s)'
+        ))
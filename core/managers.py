@@ -0,0 +1,70 @@
+"""
+QuerySets dos modelos do consultório.
+
+Centralizam as políticas de carregamento usadas pelas views e pelo admin:
+``with_related()`` faz o ``select_related`` das FKs exibidas nas listas
+(inclusive pelos ``__str__``) e ``para_lista()`` limita as colunas
+carregadas ao que os templates de listagem realmente mostram.
+"""
+from django.db import models
+from django.db.models import Case, Value, When
+from django.db.models.functions import ExtractYear
+from django.utils import timezone
+
+from .dateranges import intervalo_dias, no_intervalo
+
+STATUS_ATIVOS = ['agendado', 'confirmado']
+STATUS_LIBERADOS = ['cancelado', 'faltou']  # Não ocupam o horário na agenda
+
+
+class PacienteQuerySet(models.QuerySet):
+    CAMPOS_LISTA = [
+        'nome', 'cpf', 'telefone', 'email', 'data_nascimento', 'ativo', 'criado_em', 'atualizado_em',
+    ]
+
+    def ativos(self):
+        return self.filter(ativo=True)
+
+    def para_lista(self):
+        return self.only(*self.CAMPOS_LISTA)
+
+    def com_idade(self, hoje=None):
+        """Anota ``idade_anos`` calculada no banco (usa a coluna ``aniversario``)"""
+        hoje = hoje or timezone.localdate()
+        antes_do_aniversario = Case(
+            When(aniversario__gt=hoje.month * 100 + hoje.day, then=Value(1)),
+            default=Value(0),
+        )
+        return self.annotate(idade_anos=hoje.year - ExtractYear('data_nascimento') - antes_do_aniversario)
+
+
+class AgendamentoQuerySet(models.QuerySet):
+    CAMPOS_LISTA = [
+        'data_hora', 'status', 'observacoes', 'atualizado_em',
+        'paciente__nome', 'paciente__telefone', 'paciente__atualizado_em',
+        'profissional__nome', 'profissional__especialidade',
+    ]
+
+    def with_related(self):
+        return self.select_related('paciente', 'profissional')
+
+    def para_lista(self):
+        return self.with_related().only(*self.CAMPOS_LISTA)
+
+    def ativos(self):
+        """Agendamentos que ainda vão acontecer (agendado/confirmado)"""
+        return self.filter(status__in=STATUS_ATIVOS)
+
+    def ocupando_agenda(self):
+        """Agendamentos que bloqueiam o horário do profissional"""
+        return self.exclude(status__in=STATUS_LIBERADOS)
+
+    def do_dia(self, dia):
+        return self.filter(no_intervalo('data_hora', intervalo_dias(dia)))
+
+
+class ConsultaQuerySet(models.QuerySet):
+    def with_related(self):
+        return self.select_related(
+            'agendamento__paciente', 'agendamento__profissional'
+        )
@@ -0,0 +1,183 @@
+"""
+Middlewares do Pulse.
+
+``InstrumentacaoMiddleware`` — instrumentação de desempenho.
+
+Mede cada requisição (tempo total, queries e tempo de SQL, hits/misses do
+cache de KPIs e tempo de renderização de templates), devolve as medidas no
+cabeçalho ``Server-Timing`` (visível nas ferramentas de desenvolvedor do
+navegador), registra no logger ``core.performance`` as requisições acima
+de ``PULSE_REQUISICAO_LENTA_MS`` com suas queries mais lentas e alimenta
+os histogramas de ``/consultorio/metricas/desempenho/``.
+
+Configuração (``settings``):
+
+* ``PULSE_SERVER_TIMING``: envia o cabeçalho (padrão ``True``);
+* ``PULSE_REQUISICAO_LENTA_MS``: limite para o log (padrão 500);
+* ``PULSE_REQUISICAO_LENTA_TOP_QUERIES``: queries no log (padrão 5).
+
+``ArquivosEstaticosMiddleware`` — serve o ``STATIC_ROOT`` gerado pelo
+``collectstatic`` quando ``PULSE_SERVIR_ESTATICOS`` é verdadeiro (ver
+``core.assets``).
+
+``RoteamentoBancoMiddleware`` — escopo de roteamento de cada requisição
+para ``core.routers.RoteadorReplicas``: views ``@usar_replica`` leem das
+réplicas; depois de uma escrita, o navegador fica no primário por
+``PULSE_REPLICA_ATRASO`` segundos (padrão 5).
+"""
+import logging
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .assets import resposta_estatico
+from .routers import iniciar_roteamento, encerrar_roteamento, estado_atual, replicas
+
+from .instrumentation import iniciar_medicao, encerrar_medicao, agregador, TAMANHO_SQL_LOG
+
+logger = logging.getLogger('core.performance')
+
+
+class InstrumentacaoMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.assincrono = iscoroutinefunction(get_response)
+        if self.assincrono:
+            markcoroutinefunction(self)
+        self.server_timing = getattr(settings, 'PULSE_SERVER_TIMING', True)
+        self.limite_lenta_ms = getattr(settings, 'PULSE_REQUISICAO_LENTA_MS', 500)
+
+    def __call__(self, request):
+        if self.assincrono:
+            return self.__acall__(request)
+        medicao, token = iniciar_medicao()
+        try:
+            response = self.get_response(request)
+        finally:
+            encerrar_medicao(token)
+        return self.concluir(request, response, medicao)
+
+    async def __acall__(self, request):
+        medicao, token = iniciar_medicao()
+        try:
+            response = await self.get_response(request)
+        finally:
+            encerrar_medicao(token)
+        return self.concluir(request, response, medicao)
+
+    def concluir(self, request, response, medicao):
+        # Em respostas em streaming mede-se até o início da transmissão.
+        duracao_ms = medicao.decorrido * 1000
+        match = getattr(request, 'resolver_match', None)
+        rota = match.view_name if match else 'nao_encontrada'
+
+        if self.server_timing:
+            metricas = [
+                f'total;dur={duracao_ms:.1f}',
+                f'db;dur={medicao.tempo_sql * 1000:.1f};desc="{medicao.queries} queries"',
+                f'tpl;dur={medicao.tempo_template * 1000:.1f}',
+                f'cache;desc="hits={medicao.cache_hits} misses={medicao.cache_misses}"',
+            ]
+            if response.has_header('Server-Timing'):  # métricas da própria view
+                metricas.append(response['Server-Timing'])
+            response['Server-Timing'] = ', '.join(metricas)
+
+        agregador.registrar(rota, medicao, duracao_ms)
+
+        if duracao_ms >= self.limite_lenta_ms:
+            queries = '\n'.join(
+                f'    {duracao * 1000:.1f} ms  {sql[:TAMANHO_SQL_LOG]}'
+                for duracao, sql in medicao.queries_mais_lentas()
+            )
+            logger.warning(
+                'Requisição lenta: %s %s -> %s em %.1f ms (%d queries, %.1f ms de SQL, %.1f ms de template)\n%s',
+                request.method, request.get_full_path(), response.status_code, duracao_ms,
+                medicao.queries, medicao.tempo_sql * 1000, medicao.tempo_template * 1000, queries,
+            )
+        return response
+
+
+class ArquivosEstaticosMiddleware:
+    """
+    Serve os arquivos estáticos antes do resto da pilha, com a versão
+    ``.br``/``.gz`` pré-comprimida quando o cliente aceita e cache de um ano
+    (``immutable``) para os nomes com hash. Sem servidor web na frente, evita
+    que cada arquivo passe por sessão, autenticação e instrumentação.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.assincrono = iscoroutinefunction(get_response)
+        if self.assincrono:
+            markcoroutinefunction(self)
+        self.ativo = getattr(settings, 'PULSE_SERVIR_ESTATICOS', False) and bool(settings.STATIC_ROOT)
+        self.prefixo = '/' + settings.STATIC_URL.lstrip('/')
+        self.raiz = Path(settings.STATIC_ROOT or '.')
+
+    def servir(self, request):
+        if not self.ativo or request.method not in ('GET', 'HEAD') or not request.path.startswith(self.prefixo):
+            return None
+        return resposta_estatico(request, request.path[len(self.prefixo):], self.raiz)
+
+    def __call__(self, request):
+        if self.assincrono:
+            return self.__acall__(request)
+        response = self.servir(request)
+        return self.get_response(request) if response is None else response
+
+    async def __acall__(self, request):
+        response = self.servir(request)
+        return await self.get_response(request) if response is None else response
+
+
+class RoteamentoBancoMiddleware:
+    sync_capable = True
+    async_capable = True
+    COOKIE = 'pulse_primario'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.assincrono = iscoroutinefunction(get_response)
+        if self.assincrono:
+            markcoroutinefunction(self)
+        self.atraso = getattr(settings, 'PULSE_REPLICA_ATRASO', 5)
+
+    def __call__(self, request):
+        if self.assincrono:
+            return self.__acall__(request)
+        estado, token = iniciar_roteamento()
+        try:
+            response = self.get_response(request)
+        finally:
+            encerrar_roteamento(token)
+        return self.concluir(estado, response)
+
+    async def __acall__(self, request):
+        estado, token = iniciar_roteamento()
+        try:
+            response = await self.get_response(request)
+        finally:
+            encerrar_roteamento(token)
+        return self.concluir(estado, response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        estado = estado_atual()
+        if (
+            estado is not None and getattr(view_func, 'usar_replica', False)
+            and request.method in ('GET', 'HEAD') and self.COOKIE not in request.COOKIES
+        ):
+            estado.replica = True
+        return None
+
+    def concluir(self, estado, response):
+        # A réplica pode ainda não ter a escrita: as próximas requisições
+        # (p.ex. o redirect depois de um POST) leem do primário.
+        if estado.escreveu and replicas():
+            response.set_cookie(self.COOKIE, '1', max_age=self.atraso, httponly=True, samesite='Lax')
+        return response
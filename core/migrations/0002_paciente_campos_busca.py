@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:47
+
+from django.db import migrations, models
+
+from core.search import normalizar_texto, apenas_digitos
+
+
+def preencher_campos_busca(apps, schema_editor):
+    Paciente = apps.get_model('core', 'Paciente')
+    pacientes = []
+    for paciente in Paciente.objects.only('nome', 'cpf', 'telefone').iterator(chunk_size=2000):
+        paciente.nome_busca = normalizar_texto(paciente.nome)
+        paciente.cpf_digitos = apenas_digitos(paciente.cpf)
+        paciente.telefone_digitos = apenas_digitos(paciente.telefone)
+        pacientes.append(paciente)
+        if len(pacientes) >= 2000:
+            Paciente.objects.bulk_update(pacientes, ['nome_busca', 'cpf_digitos', 'telefone_digitos'])
+            pacientes = []
+    if pacientes:
+        Paciente.objects.bulk_update(pacientes, ['nome_busca', 'cpf_digitos', 'telefone_digitos'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paciente',
+            name='cpf_digitos',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=11),
+        ),
+        migrations.AddField(
+            model_name='paciente',
+            name='nome_busca',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='paciente',
+            name='telefone_digitos',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=20),
+        ),
+        migrations.RunPython(preencher_campos_busca, migrations.RunPython.noop),
+    ]
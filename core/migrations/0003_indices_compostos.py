@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:51
+
+from django.db import migrations, models
+import django.db.models.functions.datetime
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_paciente_campos_busca'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='agendamento',
+            index=models.Index(fields=['data_hora', 'status'], name='agend_data_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='agendamento',
+            index=models.Index(condition=models.Q(('status__in', ['agendado', 'confirmado'])), fields=['data_hora'], name='agend_ativos_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='consulta',
+            index=models.Index(fields=['criado_em', 'pago'], name='consulta_criado_pago_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='consulta',
+            index=models.Index(condition=models.Q(('pago', True)), fields=['criado_em'], name='consulta_pagas_criado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='paciente',
+            index=models.Index(condition=models.Q(('ativo', True)), fields=['nome', 'id'], name='paciente_ativos_nome_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='paciente',
+            index=models.Index(fields=['ativo', 'criado_em', 'data_nascimento'], name='paciente_ativo_criado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='paciente',
+            index=models.Index(django.db.models.functions.datetime.ExtractMonth('data_nascimento'), django.db.models.functions.datetime.ExtractDay('data_nascimento'), condition=models.Q(('ativo', True)), name='paciente_aniversario_idx'),
+        ),
+    ]
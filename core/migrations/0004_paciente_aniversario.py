@@ -0,0 +1,43 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:52
+
+from django.db import migrations, models
+from django.db.models.functions import ExtractMonth, ExtractDay
+
+
+def preencher_aniversario(apps, schema_editor):
+    Paciente = apps.get_model('core', 'Paciente')
+    Paciente.objects.update(
+        aniversario=ExtractMonth('data_nascimento') * 100 + ExtractDay('data_nascimento')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_indices_compostos'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='paciente',
+            name='paciente_ativo_criado_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='paciente',
+            name='paciente_aniversario_idx',
+        ),
+        migrations.AddField(
+            model_name='paciente',
+            name='aniversario',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(preencher_aniversario, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='paciente',
+            index=models.Index(fields=['ativo', 'criado_em', 'aniversario'], name='paciente_ativo_kpi_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='paciente',
+            index=models.Index(condition=models.Q(('ativo', True)), fields=['aniversario', 'nome'], name='paciente_ativos_aniv_idx'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:58
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_paciente_aniversario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JornadaTrabalho',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia_semana', models.PositiveSmallIntegerField(choices=[(0, 'Segunda-feira'), (1, 'Terça-feira'), (2, 'Quarta-feira'), (3, 'Quinta-feira'), (4, 'Sexta-feira'), (5, 'Sábado'), (6, 'Domingo')], verbose_name='Dia da Semana')),
+                ('hora_inicio', models.TimeField(verbose_name='Início')),
+                ('hora_fim', models.TimeField(verbose_name='Fim')),
+            ],
+            options={
+                'verbose_name': 'Jornada de Trabalho',
+                'verbose_name_plural': 'Jornadas de Trabalho',
+                'ordering': ['profissional', 'dia_semana', 'hora_inicio'],
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='agendamento',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='agendamento',
+            name='duracao',
+            field=models.PositiveSmallIntegerField(default=30, validators=[django.core.validators.MinValueValidator(5), django.core.validators.MaxValueValidator(480)], verbose_name='Duração (min)'),
+        ),
+        migrations.AddField(
+            model_name='profissional',
+            name='duracao_consulta',
+            field=models.PositiveSmallIntegerField(default=30, validators=[django.core.validators.MinValueValidator(5), django.core.validators.MaxValueValidator(480)], verbose_name='Duração da Consulta (min)'),
+        ),
+        migrations.AddIndex(
+            model_name='agendamento',
+            index=models.Index(fields=['profissional', 'data_hora'], name='agend_prof_data_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='agendamento',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['cancelado', 'faltou']), _negated=True), fields=('profissional', 'data_hora'), name='agend_profissional_horario_uniq'),
+        ),
+        migrations.AddField(
+            model_name='jornadatrabalho',
+            name='profissional',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='jornadas', to='core.profissional', verbose_name='Profissional'),
+        ),
+        migrations.AddConstraint(
+            model_name='jornadatrabalho',
+            constraint=models.CheckConstraint(check=models.Q(('hora_fim__gt', models.F('hora_inicio'))), name='jornada_fim_apos_inicio'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def preencher_resumos(apps, schema_editor):
+    from core.finance import reconstruir_resumos
+    reconstruir_resumos(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_agenda_jornadas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoFinanceiroMensal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('consultas', models.IntegerField(default=0, verbose_name='Consultas')),
+                ('consultas_pagas', models.IntegerField(default=0, verbose_name='Consultas Pagas')),
+                ('valor_total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Valor Total')),
+                ('valor_pago', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Valor Recebido')),
+                ('mes', models.DateField(verbose_name='Mês')),
+                ('profissional', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.profissional', verbose_name='Profissional')),
+            ],
+            options={
+                'verbose_name': 'Resumo Financeiro Mensal',
+                'verbose_name_plural': 'Resumos Financeiros Mensais',
+                'ordering': ['mes'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumoFinanceiroDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('consultas', models.IntegerField(default=0, verbose_name='Consultas')),
+                ('consultas_pagas', models.IntegerField(default=0, verbose_name='Consultas Pagas')),
+                ('valor_total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Valor Total')),
+                ('valor_pago', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Valor Recebido')),
+                ('dia', models.DateField(verbose_name='Dia')),
+                ('profissional', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.profissional', verbose_name='Profissional')),
+            ],
+            options={
+                'verbose_name': 'Resumo Financeiro Diário',
+                'verbose_name_plural': 'Resumos Financeiros Diários',
+                'ordering': ['dia'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='resumofinanceiromensal',
+            constraint=models.UniqueConstraint(fields=('mes', 'profissional'), name='resumo_mensal_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='resumofinanceirodiario',
+            constraint=models.UniqueConstraint(fields=('dia', 'profissional'), name='resumo_diario_uniq'),
+        ),
+        migrations.RunPython(preencher_resumos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_tarefas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LembreteAgendamento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data_hora', models.DateTimeField(verbose_name='Horário Lembrado')),
+                ('email', models.EmailField(max_length=254, verbose_name='Enviado para')),
+                ('status', models.CharField(choices=[('enviando', 'Enviando'), ('enviado', 'Enviado'), ('falhou', 'Falhou')], default='enviando', max_length=20, verbose_name='Status')),
+                ('lote', models.CharField(db_index=True, editable=False, max_length=32, verbose_name='Lote')),
+                ('erro', models.TextField(blank=True, verbose_name='Erro')),
+                ('criado_em', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('enviado_em', models.DateTimeField(blank=True, null=True, verbose_name='Enviado em')),
+                ('agendamento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lembretes', to='core.agendamento', verbose_name='Agendamento')),
+            ],
+            options={
+                'verbose_name': 'Lembrete de Agendamento',
+                'verbose_name_plural': 'Lembretes de Agendamento',
+                'ordering': ['-criado_em'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='lembreteagendamento',
+            constraint=models.UniqueConstraint(fields=('agendamento', 'data_hora'), name='lembrete_horario_uniq'),
+        ),
+    ]
@@ -1,8 +1,17 @@
-from django.db import models
+from datetime import timedelta
+
+from django.db import models, router, transaction, DatabaseError
+from django.db.models import Q
 from django.contrib.auth.models import User
-from django.core.validators import RegexValidator
+from django.core.validators import RegexValidator, MinValueValidator, MaxValueValidator
 from django.utils import timezone
 
+from .search import normalizar_texto, apenas_digitos
+from .birthdays import chave_aniversario
+from .managers import PacienteQuerySet, AgendamentoQuerySet, ConsultaQuerySet, STATUS_LIBERADOS
+
+DURACAO_MAXIMA = 8 * 60  # minutos; limita a janela de busca de conflitos
+
 class Paciente(models.Model):
     """Modelo para pacientes do consultório"""
     SEXO_CHOICES = [
@@ -29,23 +38,56 @@ class Paciente(models.Model):
     endereco = models.TextField(blank=True, verbose_name="Endereço")
     observacoes = models.TextField(blank=True, verbose_name="Observações")
     
+    # Campos de busca (desnormalizados em save(), ver core.search)
+    nome_busca = models.CharField(max_length=200, blank=True, editable=False, db_index=True)
+    cpf_digitos = models.CharField(max_length=11, blank=True, editable=False, db_index=True)
+    telefone_digitos = models.CharField(max_length=20, blank=True, editable=False, db_index=True)
+    # Mês * 100 + dia do nascimento (desnormalizado em save(), ver core.birthdays)
+    aniversario = models.PositiveSmallIntegerField(default=0, editable=False)
+    
     # Campos de controle
     ativo = models.BooleanField(default=True, verbose_name="Ativo")
     criado_em = models.DateTimeField(auto_now_add=True, verbose_name="Criado em")
     atualizado_em = models.DateTimeField(auto_now=True, verbose_name="Atualizado em")
     
+    objects = PacienteQuerySet.as_manager()
+    
+    CAMPOS_DERIVADOS = ['nome_busca', 'cpf_digitos', 'telefone_digitos', 'aniversario']
+    
     class Meta:
         verbose_name = "Paciente"
         verbose_name_plural = "Pacientes"
         ordering = ['nome']
+        # ativo=True é o filtro de todas as telas. Os índices parciais só são
+        # usados pelo SQLite quando a condição é idêntica ("WHERE ativo"); o
+        # índice dos KPIs inclui as colunas agregadas para ser coberto.
+        indexes = [
+            models.Index(fields=['nome', 'id'], condition=Q(ativo=True), name='paciente_ativos_nome_idx'),
+            models.Index(fields=['ativo', 'criado_em', 'aniversario'], name='paciente_ativo_kpi_idx'),
+            models.Index(fields=['aniversario', 'nome'], condition=Q(ativo=True), name='paciente_ativos_aniv_idx'),
+        ]
     
     def __str__(self):
         return self.nome
     
+    def atualizar_campos_derivados(self):
+        """Recalcula as colunas desnormalizadas; chame antes de bulk_create/bulk_update"""
+        self.nome_busca = normalizar_texto(self.nome)
+        self.cpf_digitos = apenas_digitos(self.cpf)
+        self.telefone_digitos = apenas_digitos(self.telefone)
+        self.aniversario = chave_aniversario(self.data_nascimento) if self.data_nascimento else 0
+    
+    def save(self, *args, **kwargs):
+        self.atualizar_campos_derivados()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | set(self.CAMPOS_DERIVADOS)
+        super().save(*args, **kwargs)
+    
     @property
     def idade(self):
         """Calcula a idade do paciente"""
-        hoje = timezone.now().date()
+        hoje = timezone.localdate()
         return hoje.year - self.data_nascimento.year - ((hoje.month, hoje.day) < (self.data_nascimento.month, self.data_nascimento.day))
 
 class Profissional(models.Model):
@@ -56,6 +98,11 @@ class Profissional(models.Model):
     crm = models.CharField(max_length=20, unique=True, verbose_name="CRM")
     telefone = models.CharField(max_length=20, verbose_name="Telefone")
     email = models.EmailField(verbose_name="E-mail")
+    duracao_consulta = models.PositiveSmallIntegerField(
+        default=30,
+        validators=[MinValueValidator(5), MaxValueValidator(DURACAO_MAXIMA)],
+        verbose_name="Duração da Consulta (min)"
+    )
     
     ativo = models.BooleanField(default=True, verbose_name="Ativo")
     criado_em = models.DateTimeField(auto_now_add=True, verbose_name="Criado em")
@@ -68,7 +115,51 @@ class Meta:
     def __str__(self):
         return f"Dr(a). {self.nome}"
 
-class Agendamento(models.Model):
+class JornadaTrabalho(models.Model):
+    """Faixa de atendimento semanal de um profissional (ver core.scheduling)"""
+    DIA_SEMANA_CHOICES = [
+        (0, 'Segunda-feira'),
+        (1, 'Terça-feira'),
+        (2, 'Quarta-feira'),
+        (3, 'Quinta-feira'),
+        (4, 'Sexta-feira'),
+        (5, 'Sábado'),
+        (6, 'Domingo'),
+    ]
+    
+    profissional = models.ForeignKey(
+        Profissional, on_delete=models.CASCADE, related_name='jornadas', verbose_name="Profissional"
+    )
+    dia_semana = models.PositiveSmallIntegerField(choices=DIA_SEMANA_CHOICES, verbose_name="Dia da Semana")
+    hora_inicio = models.TimeField(verbose_name="Início")
+    hora_fim = models.TimeField(verbose_name="Fim")
+    
+    class Meta:
+        verbose_name = "Jornada de Trabalho"
+        verbose_name_plural = "Jornadas de Trabalho"
+        ordering = ['profissional', 'dia_semana', 'hora_inicio']
+        constraints = [
+            models.CheckConstraint(check=Q(hora_fim__gt=models.F('hora_inicio')), name='jornada_fim_apos_inicio'),
+        ]
+    
+    def __str__(self):
+        return f"{self.profissional.nome} - {self.get_dia_semana_display()} {self.hora_inicio:%H:%M}-{self.hora_fim:%H:%M}"
+
+class GravacaoAtomica(models.Model):
+    """
+    ``save()`` e os receptores de ``post_save`` na mesma transação: os
+    resumos financeiros (core.finance) são ajustados junto com a gravação.
+    """
+    
+    class Meta:
+        abstract = True
+    
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+
+class Agendamento(GravacaoAtomica):
     """Modelo para agendamentos de consultas"""
     STATUS_CHOICES = [
         ('agendado', 'Agendado'),
@@ -81,22 +172,60 @@ class Agendamento(models.Model):
     paciente = models.ForeignKey(Paciente, on_delete=models.CASCADE, verbose_name="Paciente")
     profissional = models.ForeignKey(Profissional, on_delete=models.CASCADE, verbose_name="Profissional")
     data_hora = models.DateTimeField(verbose_name="Data e Hora")
+    duracao = models.PositiveSmallIntegerField(
+        default=30,
+        validators=[MinValueValidator(5), MaxValueValidator(DURACAO_MAXIMA)],
+        verbose_name="Duração (min)"
+    )
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='agendado', verbose_name="Status")
     observacoes = models.TextField(blank=True, verbose_name="Observações")
     
     criado_em = models.DateTimeField(auto_now_add=True, verbose_name="Criado em")
     atualizado_em = models.DateTimeField(auto_now=True, verbose_name="Atualizado em")
     
+    objects = AgendamentoQuerySet.as_manager()
+    
     class Meta:
         verbose_name = "Agendamento"
         verbose_name_plural = "Agendamentos"
         ordering = ['data_hora']
-        unique_together = ['profissional', 'data_hora']  # Evita duplo agendamento
+        constraints = [
+            # Rede de segurança para horários idênticos; sobreposições são
+            # barradas por core.scheduling.reservar_horario. Cancelados e
+            # faltas liberam o horário para um novo agendamento.
+            models.UniqueConstraint(
+                fields=['profissional', 'data_hora'],
+                condition=~Q(status__in=STATUS_LIBERADOS),
+                name='agend_profissional_horario_uniq'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['profissional', 'data_hora'], name='agend_prof_data_idx'),
+            models.Index(fields=['data_hora', 'status'], name='agend_data_status_idx'),
+            # Parcial: só agendamentos ainda por acontecer (dashboard/agenda)
+            models.Index(
+                fields=['data_hora'],
+                condition=Q(status__in=['agendado', 'confirmado']),
+                name='agend_ativos_data_idx'
+            ),
+        ]
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Guarda o status carregado para detectar transições no post_save
+        instance._status_original = instance.__dict__.get('status')
+        instance._profissional_original = instance.__dict__.get('profissional_id')
+        return instance
+    
+    @property
+    def data_hora_fim(self):
+        return self.data_hora + timedelta(minutes=self.duracao)
     
     def __str__(self):
         return f"{self.paciente.nome} - {self.data_hora.strftime('%d/%m/%Y %H:%M')}"
 
-class Consulta(models.Model):
+class Consulta(GravacaoAtomica):
     """Modelo para consultas realizadas"""
     agendamento = models.OneToOneField(Agendamento, on_delete=models.CASCADE, verbose_name="Agendamento")
     sintomas = models.TextField(verbose_name="Sintomas Relatados")
@@ -110,14 +239,72 @@ class Consulta(models.Model):
     
     criado_em = models.DateTimeField(auto_now_add=True, verbose_name="Criado em")
     
+    objects = ConsultaQuerySet.as_manager()
+    
     class Meta:
         verbose_name = "Consulta"
         verbose_name_plural = "Consultas"
         ordering = ['-criado_em']
+        indexes = [
+            models.Index(fields=['criado_em', 'pago'], name='consulta_criado_pago_idx'),
+            # Parcial: faturamento considera apenas consultas pagas
+            models.Index(fields=['criado_em'], condition=Q(pago=True), name='consulta_pagas_criado_idx'),
+        ]
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Estado carregado, para aplicar só a diferença nos resumos financeiros
+        instance._financeiro_original = (
+            instance.__dict__.get('agendamento_id'),
+            instance.__dict__.get('criado_em'),
+            instance.__dict__.get('valor'),
+            instance.__dict__.get('pago'),
+        )
+        return instance
     
     def __str__(self):
         return f"Consulta: {self.agendamento.paciente.nome} - {self.criado_em.strftime('%d/%m/%Y')}"
 
+class ResumoFinanceiro(models.Model):
+    """Totais materializados de consultas (mantidos por core.finance)"""
+    profissional = models.ForeignKey(
+        Profissional, on_delete=models.CASCADE, related_name='+', verbose_name="Profissional"
+    )
+    consultas = models.IntegerField(default=0, verbose_name="Consultas")
+    consultas_pagas = models.IntegerField(default=0, verbose_name="Consultas Pagas")
+    valor_total = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Valor Total")
+    valor_pago = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Valor Recebido")
+    
+    class Meta:
+        abstract = True
+    
+    @property
+    def valor_pendente(self):
+        return self.valor_total - self.valor_pago
+
+class ResumoFinanceiroDiario(ResumoFinanceiro):
+    dia = models.DateField(verbose_name="Dia")
+    
+    class Meta:
+        verbose_name = "Resumo Financeiro Diário"
+        verbose_name_plural = "Resumos Financeiros Diários"
+        ordering = ['dia']
+        constraints = [
+            models.UniqueConstraint(fields=['dia', 'profissional'], name='resumo_diario_uniq'),
+        ]
+
+class ResumoFinanceiroMensal(ResumoFinanceiro):
+    mes = models.DateField(verbose_name="Mês")  # Sempre o dia 1
+    
+    class Meta:
+        verbose_name = "Resumo Financeiro Mensal"
+        verbose_name_plural = "Resumos Financeiros Mensais"
+        ordering = ['mes']
+        constraints = [
+            models.UniqueConstraint(fields=['mes', 'profissional'], name='resumo_mensal_uniq'),
+        ]
+
 class Servico(models.Model):
     """Modelo para serviços oferecidos"""
     nome = models.CharField(max_length=200, verbose_name="Nome do Serviço")
@@ -133,4 +320,87 @@ class Meta:
         ordering = ['nome']
     
     def __str__(self):
-        return self.nome
\ No newline at end of file
+        return self.nome
+
+class Tarefa(models.Model):
+    """Tarefa em segundo plano (ver core.tasks)"""
+    STATUS_CHOICES = [
+        ('pendente', 'Pendente'),
+        ('executando', 'Executando'),
+        ('concluida', 'Concluída'),
+        ('falhou', 'Falhou'),
+    ]
+    
+    nome = models.CharField(max_length=100, verbose_name="Tarefa")
+    argumentos = models.JSONField(default=dict, blank=True, verbose_name="Argumentos")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pendente', verbose_name="Status")
+    tentativas = models.PositiveSmallIntegerField(default=0, verbose_name="Tentativas")
+    max_tentativas = models.PositiveSmallIntegerField(default=3, verbose_name="Máximo de Tentativas")
+    executar_apos = models.DateTimeField(default=timezone.now, verbose_name="Executar Após")
+    progresso = models.PositiveSmallIntegerField(default=0, verbose_name="Progresso (%)")
+    mensagem = models.CharField(max_length=255, blank=True, verbose_name="Mensagem")
+    resultado = models.JSONField(null=True, blank=True, verbose_name="Resultado")
+    erro = models.TextField(blank=True, verbose_name="Erro")
+    worker = models.CharField(max_length=100, blank=True, verbose_name="Worker")
+    
+    criado_em = models.DateTimeField(auto_now_add=True, verbose_name="Criado em")
+    iniciado_em = models.DateTimeField(null=True, blank=True, verbose_name="Iniciado em")
+    concluido_em = models.DateTimeField(null=True, blank=True, verbose_name="Concluído em")
+    
+    class Meta:
+        verbose_name = "Tarefa"
+        verbose_name_plural = "Tarefas"
+        ordering = ['-criado_em']
+        indexes = [
+            # Parciais: o worker só procura prontas e travadas
+            models.Index(fields=['executar_apos'], condition=Q(status='pendente'), name='tarefa_pendentes_idx'),
+            models.Index(fields=['iniciado_em'], condition=Q(status='executando'), name='tarefa_executando_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.nome} #{self.pk} ({self.get_status_display()})"
+    
+    def atualizar_progresso(self, percentual, mensagem=''):
+        """Grava o progresso sem tocar nos demais campos (visível no admin)"""
+        self.progresso = max(0, min(100, int(percentual)))
+        self.mensagem = mensagem[:255]
+        try:
+            with transaction.atomic():
+                Tarefa.objects.filter(pk=self.pk).update(progresso=self.progresso, mensagem=self.mensagem)
+        except DatabaseError:
+            # Só informativo: não derruba a tarefa se o banco estiver ocupado
+            # (no SQLite, p.ex., durante a leitura de um cursor aberto).
+            pass
+
+class LembreteAgendamento(models.Model):
+    """Lembrete enviado (ou em envio) para um horário de agendamento (ver core.reminders)"""
+    STATUS_CHOICES = [
+        ('enviando', 'Enviando'),
+        ('enviado', 'Enviado'),
+        ('falhou', 'Falhou'),
+    ]
+    
+    agendamento = models.ForeignKey(
+        Agendamento, on_delete=models.CASCADE, related_name='lembretes', verbose_name="Agendamento"
+    )
+    # Horário lembrado: se o agendamento for remarcado, o novo horário gera outro lembrete
+    data_hora = models.DateTimeField(verbose_name="Horário Lembrado")
+    email = models.EmailField(verbose_name="Enviado para")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='enviando', verbose_name="Status")
+    lote = models.CharField(max_length=32, db_index=True, editable=False, verbose_name="Lote")
+    erro = models.TextField(blank=True, verbose_name="Erro")
+    
+    criado_em = models.DateTimeField(auto_now_add=True, verbose_name="Criado em")
+    enviado_em = models.DateTimeField(null=True, blank=True, verbose_name="Enviado em")
+    
+    class Meta:
+        verbose_name = "Lembrete de Agendamento"
+        verbose_name_plural = "Lembretes de Agendamento"
+        ordering = ['-criado_em']
+        constraints = [
+            # Garante no máximo um lembrete por horário, mesmo com envios concorrentes
+            models.UniqueConstraint(fields=['agendamento', 'data_hora'], name='lembrete_horario_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"Lembrete de {self.agendamento} ({self.get_status_display()})"
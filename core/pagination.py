@@ -0,0 +1,142 @@
+"""
+Paginação por cursor (keyset) e contagem estimada.
+
+Em vez de ``OFFSET``, cada página continua a partir dos valores da última
+linha da página anterior (ex.: ``(nome, id) > ('Ana', 42)``). O custo de
+qualquer página é proporcional ao tamanho da página e inserções
+concorrentes não fazem linhas pularem ou se repetirem entre páginas.
+
+``PaginadorEstimado`` (usado pelo admin) troca o ``COUNT(*)`` de tabelas
+grandes sem filtro pela estimativa que o banco já mantém.
+"""
+import base64
+import json
+from dataclasses import dataclass, field
+
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Max, Q
+from django.utils.functional import cached_property
+
+LIMITE_CONTAGEM_EXATA = 10000
+
+
+@dataclass
+class PaginaCursor:
+    """Uma página de resultados e o cursor para a seguinte"""
+    itens: list = field(default_factory=list)
+    proximo_cursor: str = ''
+
+    @property
+    def tem_proxima(self):
+        return bool(self.proximo_cursor)
+
+    def __iter__(self):
+        return iter(self.itens)
+
+    def __len__(self):
+        return len(self.itens)
+
+
+class KeysetPaginator:
+    """
+    Pagina ``queryset`` em ordem crescente de ``campos``; o último campo
+    precisa ser único (normalmente ``id``) para desempatar.
+    """
+
+    def __init__(self, queryset, campos=('id',), tamanho=50):
+        self.queryset = queryset
+        self.campos = tuple(campos)
+        self.tamanho = tamanho
+        self._fields = [queryset.model._meta.get_field(nome) for nome in self.campos]
+
+    def codificar(self, obj):
+        valores = [
+            model_field.value_to_string(obj) for model_field in self._fields
+        ]
+        bruto = json.dumps(valores, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(bruto).decode().rstrip('=')
+
+    def decodificar(self, cursor):
+        """Retorna os valores do cursor, ou ``None`` se for inválido"""
+        if not cursor:
+            return None
+        try:
+            bruto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            valores = json.loads(bruto)
+            if len(valores) != len(self._fields):
+                return None
+            return [
+                model_field.to_python(valor)
+                for model_field, valor in zip(self._fields, valores)
+            ]
+        except (ValueError, TypeError):
+            return None
+
+    def _filtro_apos(self, valores):
+        # (a, b, c) > (x, y, z)  ==  a > x OR (a = x AND b > y) OR ...
+        filtro = Q()
+        for i, nome in enumerate(self.campos):
+            iguais = {campo: valor for campo, valor in zip(self.campos[:i], valores[:i])}
+            filtro |= Q(**iguais, **{f'{nome}__gt': valores[i]})
+        return filtro
+
+    def pagina(self, cursor=None):
+        queryset = self.queryset.order_by(*self.campos)
+        valores = self.decodificar(cursor)
+        if valores is not None:
+            queryset = queryset.filter(self._filtro_apos(valores))
+
+        itens = list(queryset[:self.tamanho + 1])
+        proximo_cursor = ''
+        if len(itens) > self.tamanho:
+            itens = itens[:self.tamanho]
+            proximo_cursor = self.codificar(itens[-1])
+        return PaginaCursor(itens=itens, proximo_cursor=proximo_cursor)
+
+
+def contagem_estimada(modelo, using='default'):
+    """
+    Número aproximado de linhas da tabela de ``modelo``, sem varrê-la:
+    ``pg_class.reltuples`` no PostgreSQL; no SQLite, as estatísticas do
+    ``ANALYZE`` ou, sem elas, o maior id. ``None`` se não houver estimativa.
+    """
+    conexao = connections[using]
+    tabela = modelo._meta.db_table
+    with conexao.cursor() as cursor:
+        if conexao.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [tabela])
+            linha = cursor.fetchone()
+            return linha[0] if linha and linha[0] >= 0 else None
+        if conexao.vendor == 'sqlite':
+            try:
+                cursor.execute('SELECT idx, stat FROM sqlite_stat1 WHERE tbl = %s', [tabela])
+                linhas = cursor.fetchall()
+            except DatabaseError:
+                linhas = []  # sqlite_stat1 só existe depois do primeiro ANALYZE
+            if linhas:
+                # Uma linha por índice; a de um índice parcial conta só as
+                # linhas cobertas por ele e não serve como total da tabela.
+                cursor.execute(f'PRAGMA index_list({conexao.ops.quote_name(tabela)})')
+                parciais = {indice[1] for indice in cursor.fetchall() if indice[4]}
+                totais = [int(stat.split()[0]) for idx, stat in linhas if idx not in parciais]
+                if totais:
+                    return max(totais)
+    return modelo._default_manager.using(using).aggregate(maior=Max('pk'))['maior'] or 0
+
+
+class PaginadorEstimado(Paginator):
+    """
+    Paginator cujo ``count`` é estimado quando o queryset não tem filtros e
+    a tabela passa de ``LIMITE_CONTAGEM_EXATA`` linhas. Com filtros (busca,
+    list_filter) a contagem continua exata.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if getattr(queryset, 'query', None) is not None and not queryset.query.where:
+            estimativa = contagem_estimada(queryset.model, queryset.db)
+            if estimativa is not None and estimativa > LIMITE_CONTAGEM_EXATA:
+                return estimativa
+        return super().count
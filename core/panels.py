@@ -0,0 +1,216 @@
+"""
+Painéis do dashboard calculados em paralelo.
+
+O dashboard assíncrono (``core.views.dashboard_assincrono``) é dividido em
+painéis independentes (``PAINEIS_DASHBOARD``): um por grupo de KPIs, com
+cache versionado próprio, e um por lista do sidebar. Cada painel roda numa
+thread de um pool limitado (``PULSE_PAINEIS_THREADS``) e usa a conexão com
+o banco daquela thread, então as queries dos painéis correm ao mesmo tempo.
+O ORM assíncrono do Django 4.2 não serviria: ele só repassa as queries
+para uma única thread (``sync_to_async`` com ``thread_sensitive``), em fila.
+
+Cada painel tem um tempo limite (``PULSE_PAINEL_TIMEOUT``, em segundos).
+Estourado o limite — ou se o painel falhar —, a página sai sem ele: os
+KPIs mostram o último valor calculado (ou ficam vazios) e as listas
+aparecem como indisponíveis. A query lenta também é interrompida no banco
+(``statement_timeout`` no PostgreSQL, handler de progresso no SQLite) para
+devolver a thread ao pool.
+"""
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connections, router, transaction
+from django.utils import timezone
+
+from .birthdays import aniversariantes_hoje
+from .caching import PREFIXO, obter_ou_calcular
+from .dateranges import intervalo_mes
+from .instrumentation import encerrar_medicao, iniciar_medicao, medicao_atual
+from .models import Agendamento, Consulta, Paciente
+from .stats import kpis_agendamentos, kpis_consultas, kpis_pacientes
+
+logger = logging.getLogger(__name__)
+
+TIMEOUT_ULTIMO_VALOR = 7 * 24 * 60 * 60
+
+_pool = None
+_pool_lock = threading.Lock()
+_prazo = threading.local()
+
+
+@dataclass(frozen=True)
+class Painel:
+    """Parte independente do dashboard: ``calcular(hoje)`` devolve o contexto"""
+    nome: str
+    calcular: Callable
+    vazio: dict
+    ultimo_valor: bool = False  # reaproveita o último resultado quando atrasar
+
+
+@dataclass
+class ResultadoPainel:
+    nome: str
+    contexto: dict
+    atrasado: bool = False
+    duracao_ms: float = 0.0
+
+
+def tempo_limite():
+    return getattr(settings, 'PULSE_PAINEL_TIMEOUT', 2.0)
+
+
+def obter_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'PULSE_PAINEIS_THREADS', 4),
+                thread_name_prefix='pulse-painel',
+            )
+    return _pool
+
+
+@contextmanager
+def limite_no_banco(modelo):
+    """Interrompe as queries de ``modelo`` no bloco que passarem do prazo do painel"""
+    prazo = getattr(_prazo, 'valor', None)
+    if prazo is None:
+        yield
+        return
+    alias = router.db_for_read(modelo)
+    connection = connections[alias]
+    restante = max(prazo - time.monotonic(), 0.001)
+    if connection.vendor == 'postgresql':
+        with transaction.atomic(using=alias):
+            with connection.cursor() as cursor:
+                cursor.execute(f'SET LOCAL statement_timeout = {int(restante * 1000)}')
+            yield
+    elif connection.vendor == 'sqlite':
+        connection.ensure_connection()
+        connection.connection.set_progress_handler(lambda: time.monotonic() > prazo, 10000)
+        try:
+            yield
+        finally:
+            connection.connection.set_progress_handler(None, 0)
+    else:
+        yield
+
+
+def _chave_ultimo_valor(nome):
+    return f'{PREFIXO}:painel:{nome}'
+
+
+def _kpis(nome, escopo, modelo, calcular):
+    """KPIs com cache versionado; cada recálculo vira o "último valor" do painel"""
+    def recalcular():
+        with limite_no_banco(modelo):
+            valores = calcular()
+        cache.set(_chave_ultimo_valor(nome), valores, TIMEOUT_ULTIMO_VALOR)
+        return valores
+    return obter_ou_calcular(f'painel_{nome}', escopo, (modelo._meta.model_name,), recalcular)
+
+
+def _painel_pacientes(hoje):
+    return _kpis('pacientes', hoje.isoformat(), Paciente, lambda: kpis_pacientes(hoje, intervalo_mes(hoje)))
+
+
+def _painel_agendamentos(hoje):
+    return _kpis('agendamentos', hoje.isoformat(), Agendamento, lambda: kpis_agendamentos(hoje))
+
+
+def _painel_consultas(hoje):
+    return _kpis('consultas', hoje.strftime('%Y-%m'), Consulta, lambda: kpis_consultas(intervalo_mes(hoje)))
+
+
+def _painel_agendamentos_hoje(hoje):
+    with limite_no_banco(Agendamento):
+        return {'agendamentos_hoje_lista': list(
+            Agendamento.objects.do_dia(hoje).ativos().para_lista().order_by('data_hora')[:10]
+        )}
+
+
+def _painel_aniversariantes(hoje):
+    with limite_no_banco(Paciente):
+        return {'aniversariantes_lista': list(
+            aniversariantes_hoje(Paciente.objects.ativos().para_lista(), hoje)[:5]
+        )}
+
+
+PAINEIS_DASHBOARD = (
+    Painel('pacientes', _painel_pacientes, ultimo_valor=True, vazio={
+        'total_pacientes': None, 'pacientes_novos_mes': None, 'aniversariantes_hoje': None,
+    }),
+    Painel('agendamentos', _painel_agendamentos, ultimo_valor=True, vazio={
+        'agendamentos_hoje': None, 'agendamentos_confirmados': None,
+    }),
+    Painel('consultas', _painel_consultas, ultimo_valor=True, vazio={
+        'consultas_mes': None, 'consultas_pagas': None, 'faturamento_mes': None,
+    }),
+    Painel('agendamentos_hoje_lista', _painel_agendamentos_hoje, vazio={'agendamentos_hoje_lista': []}),
+    Painel('aniversariantes_lista', _painel_aniversariantes, vazio={'aniversariantes_lista': []}),
+)
+
+
+def _executar(painel, hoje, prazo):
+    """
+    Roda ``painel`` numa thread do pool, com a conexão própria da thread;
+    devolve o contexto e a medição do painel.
+    """
+    close_old_connections()
+    _prazo.valor = prazo
+    # A medição da requisição não pode ser alterada por vários painéis ao
+    # mesmo tempo: cada um mede à parte e ``_calcular_painel`` soma.
+    medicao, token = iniciar_medicao()
+    try:
+        return painel.calcular(hoje), medicao
+    finally:
+        encerrar_medicao(token)
+        _prazo.valor = None
+        close_old_connections()
+
+
+def _substituto(painel):
+    contexto = dict(painel.vazio)
+    if painel.ultimo_valor:
+        contexto.update(cache.get(_chave_ultimo_valor(painel.nome)) or {})
+    return contexto
+
+
+async def _calcular_painel(painel, hoje, limite):
+    loop = asyncio.get_running_loop()
+    inicio = time.monotonic()
+    # ``copy_context`` leva o roteamento do banco (core.routers) para a thread.
+    futuro = loop.run_in_executor(
+        obter_pool(), contextvars.copy_context().run, _executar, painel, hoje, inicio + limite
+    )
+    try:
+        contexto, medicao = await asyncio.wait_for(futuro, limite)
+    except Exception as erro:
+        # O banco pode interromper a query um pouco antes do ``wait_for``.
+        if isinstance(erro, asyncio.TimeoutError) or time.monotonic() - inicio >= limite:
+            logger.warning('Painel %s excedeu %d ms', painel.nome, limite * 1000)
+        else:
+            logger.exception('Falha no painel %s', painel.nome)
+        contexto, atrasado = await asyncio.to_thread(_substituto, painel), True
+    else:
+        atrasado = False
+        # Somada no event loop, um painel por vez; a de um painel atrasado se perde.
+        if medicao_atual() is not None:
+            medicao_atual().somar(medicao)
+    return ResultadoPainel(painel.nome, contexto, atrasado, (time.monotonic() - inicio) * 1000)
+
+
+async def calcular_paineis(paineis=PAINEIS_DASHBOARD, hoje=None, limite=None):
+    """Calcula ``paineis`` ao mesmo tempo; devolve um ``ResultadoPainel`` por painel"""
+    hoje = hoje or timezone.localdate()
+    limite = tempo_limite() if limite is None else limite
+    return await asyncio.gather(*(_calcular_painel(painel, hoje, limite) for painel in paineis))
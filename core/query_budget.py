@@ -0,0 +1,38 @@
+"""
+Orçamento de queries por view.
+
+Cada view declara quantas queries pode executar com
+``@orcamento_queries(n)``; ``verificar_orcamento`` mede uma execução e
+falha quando o limite é ultrapassado (por exemplo, por um N+1 introduzido
+num template). ``OrcamentoQueriesTests`` (core/tests.py) renderiza toda
+view com orçamento de ``core.urls`` na suíte de testes; o comando
+``explain_queries`` aplica a mesma verificação às rotas que ele exercita.
+"""
+from contextlib import contextmanager
+
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.test.utils import CaptureQueriesContext
+
+
+class OrcamentoExcedido(AssertionError):
+    """A view executou mais queries do que o declarado"""
+
+
+def orcamento_queries(limite):
+    """Declara o número máximo de queries da view decorada (sem cache)"""
+    def decorator(view):
+        view.orcamento_queries = limite
+        return view
+    return decorator
+
+
+@contextmanager
+def verificar_orcamento(limite, descricao='bloco', using=DEFAULT_DB_ALIAS):
+    """Executa o bloco capturando as queries e falha se passar de ``limite``"""
+    with CaptureQueriesContext(connections[using]) as contexto:
+        yield contexto
+    if len(contexto) > limite:
+        queries = '\n'.join(q['sql'] for q in contexto.captured_queries)
+        raise OrcamentoExcedido(
+            f'{descricao}: {len(contexto)} queries (orçamento: {limite})\n{queries}'
+        )
@@ -0,0 +1,132 @@
+"""
+Lembretes por e-mail dos agendamentos do dia seguinte.
+
+Os agendamentos a lembrar (agendado/confirmado no dia, paciente com
+e-mail e ainda sem lembrete para aquele horário) vêm de uma query pelo
+índice parcial ``agend_ativos_data_idx``. Os templates são compilados
+uma vez por execução e todas as mensagens saem pela mesma conexão SMTP,
+aberta uma única vez.
+
+Idempotência: antes de enviar um lote, cada agendamento é reservado
+com uma linha ``LembreteAgendamento`` (única por agendamento e horário,
+``bulk_create`` com ``ignore_conflicts``) marcada com o identificador do
+lote; só as linhas do próprio lote são enviadas. Reexecuções e envios
+concorrentes, portanto, nunca mandam dois e-mails para o mesmo horário.
+Falhas de envio ficam como ``falhou`` e são tentadas de novo na próxima
+execução; um lembrete que ficou em ``enviando`` (processo interrompido no
+meio do envio) não é reenviado — na dúvida, o paciente recebe no máximo
+um e-mail.
+"""
+import uuid
+from contextlib import nullcontext
+from dataclasses import dataclass
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Exists, OuterRef
+from django.template.loader import get_template
+from django.utils import timezone
+
+from .models import Agendamento, LembreteAgendamento
+
+TAMANHO_LOTE = 100
+TEMPLATE_ASSUNTO = 'core/emails/lembrete_assunto.txt'
+TEMPLATE_CORPO = 'core/emails/lembrete.txt'
+
+
+@dataclass
+class ResultadoLembretes:
+    enviados: int = 0
+    falhas: int = 0
+    ja_reservados: int = 0
+
+
+def agendamentos_para_lembrar(dia):
+    """Agendamentos ativos de ``dia`` cujo horário ainda não foi lembrado"""
+    lembrados = LembreteAgendamento.objects.filter(
+        agendamento=OuterRef('pk'), data_hora=OuterRef('data_hora'), status__in=['enviando', 'enviado']
+    )
+    return Agendamento.objects.do_dia(dia).ativos().exclude(paciente__email='').exclude(
+        Exists(lembrados)
+    ).select_related('paciente', 'profissional').only(
+        'data_hora', 'duracao', 'status',
+        'paciente__nome', 'paciente__email',
+        'profissional__nome', 'profissional__especialidade',
+    ).order_by('data_hora')
+
+
+def _reservar(agendamentos):
+    """Reserva os lembretes do lote; devolve os agendamentos que couberam a este lote"""
+    lote = uuid.uuid4().hex
+    # Falhas anteriores são liberadas para nova tentativa.
+    LembreteAgendamento.objects.filter(
+        agendamento__in=[agendamento.pk for agendamento in agendamentos], status='falhou'
+    ).delete()
+    LembreteAgendamento.objects.bulk_create([
+        LembreteAgendamento(
+            agendamento=agendamento, data_hora=agendamento.data_hora,
+            email=agendamento.paciente.email, lote=lote,
+        )
+        for agendamento in agendamentos
+    ], ignore_conflicts=True)
+    reservados = set(LembreteAgendamento.objects.filter(lote=lote).values_list('agendamento_id', flat=True))
+    return lote, [agendamento for agendamento in agendamentos if agendamento.pk in reservados]
+
+
+def _mensagem(agendamento, assunto, corpo):
+    contexto = {
+        'agendamento': agendamento,
+        'paciente': agendamento.paciente,
+        'profissional': agendamento.profissional,
+        'data_hora': timezone.localtime(agendamento.data_hora),
+    }
+    return EmailMessage(
+        subject=' '.join(assunto.render(contexto).split()),
+        body=corpo.render(contexto),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[agendamento.paciente.email],
+    )
+
+
+def enviar_lembretes(dia=None, tamanho_lote=TAMANHO_LOTE, conexao=None):
+    """
+    Envia os lembretes de ``dia`` (padrão: amanhã) em lotes pela mesma
+    conexão. Uma ``conexao`` recebida continua aberta ao final; fechá-la é
+    de quem a abriu.
+    """
+    dia = dia or timezone.localdate() + timedelta(days=1)
+    assunto, corpo = get_template(TEMPLATE_ASSUNTO), get_template(TEMPLATE_CORPO)
+    resultado = ResultadoLembretes()
+    # Um dia de agenda cabe na memória; ler tudo antes evita manter um
+    # cursor aberto enquanto os lembretes são gravados.
+    candidatos = iter(list(agendamentos_para_lembrar(dia)))
+
+    with nullcontext(conexao) if conexao is not None else get_connection() as conexao:
+        while agendamentos := list(islice(candidatos, tamanho_lote)):
+            lote, reservados = _reservar(agendamentos)
+            resultado.ja_reservados += len(agendamentos) - len(reservados)
+
+            enviados, erros = [], {}
+            for agendamento in reservados:
+                try:
+                    # Uma mensagem por chamada: o resultado de cada envio é
+                    # registrado mesmo se outra do lote falhar.
+                    if conexao.send_messages([_mensagem(agendamento, assunto, corpo)]):
+                        enviados.append(agendamento.pk)
+                    else:
+                        erros[agendamento.pk] = 'Mensagem não aceita pelo servidor'
+                except Exception as erro:
+                    erros[agendamento.pk] = str(erro) or erro.__class__.__name__
+
+            LembreteAgendamento.objects.filter(lote=lote, agendamento__in=enviados).update(
+                status='enviado', enviado_em=timezone.now()
+            )
+            for agendamento_id, erro in erros.items():
+                LembreteAgendamento.objects.filter(lote=lote, agendamento_id=agendamento_id).update(
+                    status='falhou', erro=erro
+                )
+            resultado.enviados += len(enviados)
+            resultado.falhas += len(erros)
+    return resultado
@@ -0,0 +1,212 @@
+"""
+Relatórios financeiros de consultas em CSV e XLSX, por streaming.
+
+As linhas vêm de uma única query com as colunas de paciente e
+profissional trazidas por join (``values_list`` sobre as relações, sem
+instanciar modelos) e lidas com ``iterator(chunk_size=...)`` — cursor no
+servidor no PostgreSQL — então a memória usada não depende do tamanho do
+período.
+
+O XLSX é montado sem dependências: um zip escrito sequencialmente (com
+descritores de dados, dispensando ``seek``) cuja planilha é gerada linha a
+linha com strings inline. A cada lote de linhas os bytes já comprimidos
+são entregues e o buffer é esvaziado.
+"""
+import zipfile
+from datetime import datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .csvio import linhas_csv, formatar_valor
+from .dateranges import intervalo_dias
+from .models import Consulta
+
+COLUNAS_CONSULTAS = [
+    'data', 'paciente', 'paciente_cpf', 'profissional', 'profissional_crm',
+    'especialidade', 'valor', 'pago',
+]
+CAMPOS_CONSULTAS = (
+    'criado_em', 'agendamento__paciente__nome', 'agendamento__paciente__cpf',
+    'agendamento__profissional__nome', 'agendamento__profissional__crm',
+    'agendamento__profissional__especialidade', 'valor', 'pago',
+)
+TAMANHO_LOTE = 2000
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def consultas_do_periodo(inicio, fim):
+    """Consultas registradas entre as datas locais ``inicio`` e ``fim`` (inclusive)"""
+    desde, ate = intervalo_dias(inicio, fim)
+    return Consulta.objects.filter(criado_em__gte=desde, criado_em__lt=ate)
+
+
+def registros_consultas(queryset, tamanho_lote=TAMANHO_LOTE):
+    """Tuplas na ordem de ``COLUNAS_CONSULTAS``, lidas em lotes"""
+    return queryset.order_by('criado_em', 'pk').values_list(*CAMPOS_CONSULTAS).iterator(chunk_size=tamanho_lote)
+
+
+def _em_blocos(partes, tamanho=TAMANHO_LOTE):
+    """Junta as partes geradas em blocos maiores (menos escritas no socket)"""
+    bloco = []
+    for parte in partes:
+        bloco.append(parte)
+        if len(bloco) >= tamanho:
+            yield ''.join(bloco)
+            bloco = []
+    if bloco:
+        yield ''.join(bloco)
+
+
+def csv_consultas(queryset, tamanho_lote=TAMANHO_LOTE):
+    registros = (map(formatar_valor, registro) for registro in registros_consultas(queryset, tamanho_lote))
+    return _em_blocos(linhas_csv(COLUNAS_CONSULTAS, registros), tamanho_lote)
+
+
+# --- XLSX --------------------------------------------------------------------
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{nome}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+# Estilos: 0 padrão, 1 data/hora (dd/mm/aaaa hh:mm), 2 moeda (#,##0.00).
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<numFmts count="1"><numFmt numFmtId="164" formatCode="dd/mm/yyyy hh:mm"/></numFmts>'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border/></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="3">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="4" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '</cellXfs>'
+    '</styleSheet>'
+)
+_INICIO_PLANILHA = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_FIM_PLANILHA = '</sheetData></worksheet>'
+_EPOCA_EXCEL = datetime(1899, 12, 30)
+
+
+class _Buffer:
+    """Destino do zip que acumula os bytes até serem entregues"""
+
+    def __init__(self):
+        self.partes = []
+        self.posicao = 0
+
+    def write(self, dados):
+        self.partes.append(bytes(dados))
+        self.posicao += len(dados)
+        return len(dados)
+
+    def tell(self):
+        return self.posicao
+
+    def flush(self):
+        pass
+
+    def esvaziar(self):
+        dados, self.partes = b''.join(self.partes), []
+        return dados
+
+
+def _celula(valor):
+    if valor is None:
+        return '<c/>'
+    if isinstance(valor, bool):
+        return f'<c t="b"><v>{int(valor)}</v></c>'
+    if isinstance(valor, datetime):
+        local = timezone.localtime(valor).replace(tzinfo=None) if timezone.is_aware(valor) else valor
+        serial = (local - _EPOCA_EXCEL).total_seconds() / 86400
+        return f'<c s="1"><v>{serial:.8f}</v></c>'
+    if isinstance(valor, Decimal):
+        return f'<c s="2"><v>{valor}</v></c>'
+    if isinstance(valor, (int, float)):
+        return f'<c><v>{valor}</v></c>'
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(str(valor))}</t></is></c>'
+
+
+def _linha_xml(valores):
+    return '<row>' + ''.join(_celula(valor) for valor in valores) + '</row>'
+
+
+def linhas_xlsx(cabecalho, registros, nome_planilha='Relatorio', tamanho_lote=TAMANHO_LOTE):
+    """Gera os bytes de um XLSX com ``cabecalho`` e ``registros``, lote a lote"""
+    buffer = _Buffer()
+    # Sem seek, o zipfile grava tamanhos e CRC em descritores após cada arquivo.
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as pacote:
+        pacote.writestr('[Content_Types].xml', _CONTENT_TYPES)
+        pacote.writestr('_rels/.rels', _RELS)
+        pacote.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS)
+        pacote.writestr('xl/workbook.xml', _WORKBOOK.format(nome=escape(nome_planilha)))
+        pacote.writestr('xl/styles.xml', _STYLES)
+        with pacote.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as planilha:
+            planilha.write((_INICIO_PLANILHA + _linha_xml(cabecalho)).encode())
+            for bloco in _em_blocos((_linha_xml(registro) for registro in registros), tamanho_lote):
+                planilha.write(bloco.encode())
+                yield buffer.esvaziar()
+            planilha.write(_FIM_PLANILHA.encode())
+    yield buffer.esvaziar()
+
+
+def xlsx_consultas(queryset, tamanho_lote=TAMANHO_LOTE):
+    return linhas_xlsx(
+        COLUNAS_CONSULTAS, registros_consultas(queryset, tamanho_lote),
+        nome_planilha='Consultas', tamanho_lote=tamanho_lote,
+    )
+
+
+EXPORTADORES = {'csv': csv_consultas, 'xlsx': xlsx_consultas}
+
+
+def resposta_relatorio(partes, formato, nome_arquivo):
+    response = StreamingHttpResponse(partes, content_type=FORMATOS[formato])
+    response['Content-Disposition'] = f'attachment; filename="{nome_arquivo}.{formato}"'
+    return response
@@ -0,0 +1,116 @@
+"""
+Leituras em réplicas do banco (``DATABASE_ROUTERS``).
+
+``RoteadorReplicas`` só manda leituras para as réplicas de
+``PULSE_REPLICAS`` quando o código declarou que tolera o atraso da
+replicação:
+
+* views marcadas com ``@usar_replica`` (dashboard, agenda, relatórios,
+  exportações), em requisições GET/HEAD — o estado da requisição é criado
+  por ``core.middleware.RoteamentoBancoMiddleware``;
+* blocos ``with leitura_em_replica():`` fora de requisições (p.ex. a
+  tarefa de relatório).
+
+Todo o resto — escritas, admin, comandos — usa o primário, assim como
+sessão e usuário (``APPS_NO_PRIMARIO``): um login recém-feito pode ainda
+não ter chegado à réplica. Numa requisição, a primeira escrita fixa as
+leituras seguintes no primário (read-after-write), assim como as leituras
+dentro de ``transaction.atomic()``; a resposta leva um cookie que mantém o
+navegador no primário por ``PULSE_REPLICA_ATRASO`` segundos, cobrindo o
+redirect que segue um POST.
+
+O estado fica numa ``ContextVar`` (como em ``core.instrumentation``) e
+acompanha a requisição nas threads do ``sync_to_async`` e dos painéis do
+dashboard. Respostas em streaming são consumidas depois que a requisição
+sai do middleware; por isso as exportações fixam o banco no queryset com
+``.using(router.db_for_read(...))``.
+
+Sem réplicas configuradas o roteador não interfere.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+APPS_NO_PRIMARIO = frozenset({'auth', 'sessions', 'contenttypes'})
+
+_estado = ContextVar('pulse_banco', default=None)
+
+
+class EstadoBanco:
+    """Roteamento de uma requisição (ou bloco ``leitura_em_replica``)"""
+    __slots__ = ('replica', 'fixar_apos_escrita', 'escreveu', 'alias')
+
+    def __init__(self, replica=False, fixar_apos_escrita=True):
+        self.replica = replica
+        self.fixar_apos_escrita = fixar_apos_escrita
+        self.escreveu = False
+        self.alias = None  # réplica sorteada na primeira leitura
+
+
+def replicas():
+    return getattr(settings, 'PULSE_REPLICAS', [])
+
+
+def iniciar_roteamento(**opcoes):
+    """Começa um escopo de roteamento; devolve ``(estado, token)`` para ``encerrar_roteamento``"""
+    estado = EstadoBanco(**opcoes)
+    return estado, _estado.set(estado)
+
+
+def encerrar_roteamento(token):
+    _estado.reset(token)
+
+
+def estado_atual():
+    return _estado.get()
+
+
+@contextmanager
+def leitura_em_replica():
+    """Leituras do bloco vão para uma réplica; use só em blocos que apenas leem"""
+    # Escritas de controle (p.ex. o progresso de uma tarefa) não fixam o primário.
+    estado, token = iniciar_roteamento(replica=True, fixar_apos_escrita=False)
+    try:
+        yield estado
+    finally:
+        encerrar_roteamento(token)
+
+
+def usar_replica(view):
+    """Marca a view como só leitura: em GET/HEAD ela lê das réplicas"""
+    view.usar_replica = True
+    return view
+
+
+class RoteadorReplicas:
+
+    def db_for_read(self, model, **hints):
+        estado = _estado.get()
+        if estado is None or not estado.replica or estado.escreveu:
+            return None
+        if model._meta.app_label in APPS_NO_PRIMARIO:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        if estado.alias is None:
+            disponiveis = replicas()
+            if not disponiveis:
+                return None
+            estado.alias = random.choice(disponiveis)
+        return estado.alias
+
+    def db_for_write(self, model, **hints):
+        estado = _estado.get()
+        if estado is not None and estado.fixar_apos_escrita:
+            estado.escreveu = True
+        # Explícito: um objeto lido de uma réplica é salvo no primário.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        bancos = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in bancos and obj2._state.db in bancos:
+            return True
+        return None
@@ -0,0 +1,260 @@
+"""
+Motor de agendamento: horários livres e reserva sem conflitos.
+
+A disponibilidade de um profissional vem das suas ``JornadaTrabalho``
+(faixas semanais em horário local) menos os agendamentos que ocupam a
+agenda. Os intervalos ocupados de todo o período pedido são lidos em uma
+única query, fundidos e guardados em listas ordenadas
+(``IndiceDisponibilidade``); cada horário candidato é testado por busca
+binária, então meses de agenda são respondidos em poucos milissegundos.
+
+``reservar_horario`` serializa as reservas de um mesmo profissional antes
+de verificar conflitos: ``SELECT ... FOR UPDATE`` na linha do profissional
+onde o banco suporta, ou, no SQLite, um ``UPDATE`` sem efeito que adquire
+o lock de escrita logo no início da transação. Assim duas requisições
+simultâneas para o mesmo horário nunca criam dois agendamentos. Todo
+agendamento gravado um a um (formulário, admin) passa por
+``salvar_agendamento``; as gravações em lote (importação CSV, carga
+sintética) usam ``travar_agendas`` e ``conflitos_em_lote``.
+"""
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from django.core.exceptions import ValidationError
+from django.db import connections, router, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .dateranges import intervalo_dias
+from .managers import STATUS_LIBERADOS
+from .models import Agendamento, JornadaTrabalho, Profissional, DURACAO_MAXIMA
+
+
+class HorarioIndisponivel(ValidationError):
+    """Horário em conflito com outro agendamento ou fora da jornada"""
+
+
+@dataclass(frozen=True)
+class Horario:
+    inicio: datetime
+    fim: datetime
+
+
+class IndiceDisponibilidade:
+    """Intervalos ocupados ``[inicio, fim)``, fundidos e ordenados"""
+
+    def __init__(self, intervalos):
+        self.inicios = []
+        self.fins = []
+        for inicio, fim in sorted(intervalos):
+            if self.fins and inicio <= self.fins[-1]:
+                self.fins[-1] = max(self.fins[-1], fim)
+            else:
+                self.inicios.append(inicio)
+                self.fins.append(fim)
+
+    def __len__(self):
+        return len(self.inicios)
+
+    def livre(self, inicio, fim):
+        """``True`` se ``[inicio, fim)`` não sobrepõe nenhum intervalo ocupado"""
+        # Primeiro intervalo que termina depois de ``inicio``; como estão
+        # fundidos, os fins também são crescentes.
+        i = bisect_right(self.fins, inicio)
+        return i == len(self.fins) or self.inicios[i] >= fim
+
+    def ocupar(self, inicio, fim):
+        """Marca ``[inicio, fim)``, que deve estar livre, como ocupado"""
+        i = bisect_right(self.fins, inicio)
+        self.inicios.insert(i, inicio)
+        self.fins.insert(i, fim)
+
+
+def intervalos_ocupados(profissional, inicio, fim, using=None, excluir=None):
+    """Intervalos dos agendamentos de ``profissional`` que tocam ``[inicio, fim)``"""
+    # A duração é limitada a DURACAO_MAXIMA, então basta olhar os que
+    # começaram até esse tempo antes de ``inicio`` (índice profissional, data_hora).
+    agendamentos = Agendamento.objects.using(using).ocupando_agenda().filter(
+        profissional=profissional,
+        data_hora__gt=inicio - timedelta(minutes=DURACAO_MAXIMA),
+        data_hora__lt=fim,
+    ).exclude(pk=excluir).values_list('data_hora', 'duracao')
+    return [
+        (data_hora, data_hora + timedelta(minutes=duracao))
+        for data_hora, duracao in agendamentos
+    ]
+
+
+def jornadas_por_dia(profissional, using=None):
+    """``{dia_semana: [(hora_inicio, hora_fim), ...]}`` do profissional"""
+    jornadas = {}
+    faixas = JornadaTrabalho.objects.using(using).filter(
+        profissional=profissional
+    ).order_by('hora_inicio').values_list('dia_semana', 'hora_inicio', 'hora_fim')
+    for dia_semana, hora_inicio, hora_fim in faixas:
+        jornadas.setdefault(dia_semana, []).append((hora_inicio, hora_fim))
+    return jornadas
+
+
+def _faixas_do_dia(jornadas, dia, tz=None):
+    tz = tz or timezone.get_current_timezone()
+    for hora_inicio, hora_fim in jornadas.get(dia.weekday(), ()):
+        yield (
+            datetime.combine(dia, hora_inicio, tzinfo=tz),
+            datetime.combine(dia, hora_fim, tzinfo=tz),
+        )
+
+
+def horarios_livres(profissional, inicio, fim=None, duracao=None, agora=None):
+    """
+    Horários livres de ``profissional`` entre as datas locais ``inicio`` e
+    ``fim`` (inclusive), em passos de ``duracao`` minutos (padrão: a
+    duração de consulta do profissional) a partir do início de cada
+    jornada. Horários anteriores a ``agora`` são omitidos.
+    """
+    fim = fim or inicio
+    passo = timedelta(minutes=duracao or profissional.duracao_consulta)
+    agora = agora or timezone.now()
+
+    jornadas = jornadas_por_dia(profissional)
+    if not jornadas:
+        return []
+    indice = IndiceDisponibilidade(intervalos_ocupados(profissional, *intervalo_dias(inicio, fim)))
+
+    livres = []
+    dia = inicio
+    while dia <= fim:
+        for abre, fecha in _faixas_do_dia(jornadas, dia):
+            horario = abre
+            while horario + passo <= fecha:
+                if horario >= agora and indice.livre(horario, horario + passo):
+                    livres.append(Horario(horario, horario + passo))
+                horario += passo
+        dia += timedelta(days=1)
+    return livres
+
+
+def _travar_agenda(profissional, using):
+    """Serializa as reservas de ``profissional`` até o fim da transação"""
+    if connections[using].features.has_select_for_update:
+        list(Profissional.objects.using(using).select_for_update().filter(
+            pk=profissional.pk
+        ).values_list('pk', flat=True))
+    else:
+        # SQLite: a primeira instrução da transação é uma escrita, então o
+        # lock do banco é obtido antes de qualquer leitura (sem risco de
+        # ler um estado que outra reserva está prestes a mudar).
+        Profissional.objects.using(using).filter(pk=profissional.pk).update(ativo=F('ativo'))
+
+
+def _horario_mudou(agendamento, using):
+    if agendamento._state.adding:
+        return True
+    original = Agendamento.objects.using(using).filter(pk=agendamento.pk).values_list(
+        'profissional_id', 'data_hora', 'duracao'
+    ).first()
+    return original != (agendamento.profissional_id, agendamento.data_hora, agendamento.duracao)
+
+
+def verificar_horario(agendamento, using=None):
+    """
+    Levanta ``HorarioIndisponivel`` se ``agendamento`` (novo ou editado)
+    sobrepõe outro da agenda ou, quando o horário mudou e o profissional
+    tem jornadas cadastradas, se sai da jornada. Cancelados e faltas não
+    ocupam a agenda e passam sem verificação.
+    """
+    if agendamento.status in STATUS_LIBERADOS:
+        return
+    using = using or router.db_for_write(Agendamento)
+    profissional = agendamento.profissional
+    inicio = agendamento.data_hora
+    fim = inicio + timedelta(minutes=agendamento.duracao)
+
+    if _horario_mudou(agendamento, using):
+        jornadas = jornadas_por_dia(profissional, using=using)
+        if jornadas:
+            dia = timezone.localtime(inicio).date()
+            if not any(abre <= inicio and fim <= fecha for abre, fecha in _faixas_do_dia(jornadas, dia)):
+                raise HorarioIndisponivel(
+                    'Horário fora da jornada de trabalho do profissional.', code='fora_da_jornada'
+                )
+
+    indice = IndiceDisponibilidade(
+        intervalos_ocupados(profissional, inicio, fim, using=using, excluir=agendamento.pk)
+    )
+    if not indice.livre(inicio, fim):
+        raise HorarioIndisponivel('Horário já ocupado por outro agendamento.', code='conflito')
+
+
+def salvar_agendamento(agendamento):
+    """
+    Grava ``agendamento`` (novo ou editado) com a agenda do profissional
+    travada, depois de ``verificar_horario``. É o caminho de gravação do
+    formulário, do admin e de ``reservar_horario``.
+    """
+    using = router.db_for_write(Agendamento, instance=agendamento)
+    with transaction.atomic(using=using):
+        _travar_agenda(agendamento.profissional, using)
+        verificar_horario(agendamento, using=using)
+        agendamento.save(using=using)
+    return agendamento
+
+
+def reservar_horario(paciente, profissional, data_hora, duracao=None, **campos):
+    """
+    Cria o agendamento se ``[data_hora, data_hora + duracao)`` estiver livre
+    e dentro da jornada do profissional (quando houver jornadas
+    cadastradas). Levanta ``HorarioIndisponivel`` caso contrário.
+    """
+    return salvar_agendamento(Agendamento(
+        paciente=paciente, profissional=profissional, data_hora=data_hora,
+        duracao=duracao or profissional.duracao_consulta, **campos
+    ))
+
+
+def conflitos_em_lote(agendamentos, using=None):
+    """
+    Para gravações em lote (importação, carga sintética): ``{indice:
+    HorarioIndisponivel}`` dos ``agendamentos`` não salvos que sobrepõem a
+    agenda no banco ou um anterior da própria lista. Uma query para o lote
+    todo; chame dentro da transação do ``bulk_create`` depois de
+    ``travar_agendas``. A jornada não é verificada: importações trazem
+    histórico de jornadas que podem ter mudado.
+    """
+    ocupando = [
+        (indice, agendamento) for indice, agendamento in enumerate(agendamentos)
+        if agendamento.status not in STATUS_LIBERADOS
+    ]
+    if not ocupando:
+        return {}
+    inicio = min(agendamento.data_hora for _, agendamento in ocupando)
+    fim = max(agendamento.data_hora_fim for _, agendamento in ocupando)
+    ocupados = {}
+    for profissional_id, data_hora, duracao in Agendamento.objects.using(using).ocupando_agenda().filter(
+        profissional_id__in={agendamento.profissional_id for _, agendamento in ocupando},
+        data_hora__gt=inicio - timedelta(minutes=DURACAO_MAXIMA),
+        data_hora__lt=fim,
+    ).values_list('profissional_id', 'data_hora', 'duracao'):
+        ocupados.setdefault(profissional_id, []).append((data_hora, data_hora + timedelta(minutes=duracao)))
+
+    conflitos = {}
+    indices = {}
+    for indice, agendamento in ocupando:
+        profissional_id = agendamento.profissional_id
+        if profissional_id not in indices:
+            indices[profissional_id] = IndiceDisponibilidade(ocupados.get(profissional_id, ()))
+        if indices[profissional_id].livre(agendamento.data_hora, agendamento.data_hora_fim):
+            indices[profissional_id].ocupar(agendamento.data_hora, agendamento.data_hora_fim)
+        else:
+            conflitos[indice] = HorarioIndisponivel(
+                'Horário já ocupado por outro agendamento.', code='conflito'
+            )
+    return conflitos
+
+
+def travar_agendas(profissionais_ids, using=None):
+    """``_travar_agenda`` para vários profissionais, na ordem dos ids (sem deadlock)"""
+    using = using or router.db_for_write(Agendamento)
+    for profissional_id in sorted(set(profissionais_ids)):
+        _travar_agenda(Profissional(pk=profissional_id), using)
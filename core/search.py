@@ -0,0 +1,196 @@
+"""
+Busca de pacientes.
+
+O nome, CPF e telefone de cada paciente são desnormalizados em colunas
+indexadas (``nome_busca``, ``cpf_digitos`` e ``telefone_digitos``), mantidas
+por ``Paciente.save()``. Sobre elas, o backend de busca é escolhido
+conforme o banco:
+
+* SQLite com FTS5: tabela virtual ``core_paciente_fts`` sincronizada por
+  triggers, consultada com prefixos de palavra (``"ana"* "silva"*``);
+* PostgreSQL: índice GIN ``pg_trgm`` em ``nome_busca``, usado por
+  ``LIKE '%termo%'``;
+* demais bancos: busca por prefixo do nome usando o índice B-tree.
+
+Termos compostos só de dígitos (CPF/telefone) sempre usam busca por
+prefixo nas colunas de dígitos.
+"""
+import re
+import sqlite3
+import unicodedata
+from functools import lru_cache
+
+from django.apps import apps
+from django.db import connection as default_connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+TABELA_FTS = 'core_paciente_fts'
+MIN_DIGITOS = 3
+
+_NAO_ALFANUMERICO = re.compile(r'[^0-9a-z]+')
+
+
+def normalizar_texto(texto):
+    """Remove acentos, converte para minúsculas e colapsa pontuação em espaços"""
+    if not texto:
+        return ''
+    decomposto = unicodedata.normalize('NFKD', texto)
+    sem_acentos = ''.join(c for c in decomposto if not unicodedata.combining(c))
+    return _NAO_ALFANUMERICO.sub(' ', sem_acentos.lower()).strip()
+
+
+def apenas_digitos(texto):
+    """Mantém só os dígitos de ``texto`` (CPF, telefone)"""
+    return ''.join(filter(str.isdigit, texto or ''))
+
+
+def _intervalo_prefixo(campo, prefixo):
+    # Equivalente a ``campo LIKE 'prefixo%'``, mas sempre utilizável pelo
+    # índice B-tree (o LIKE do SQLite ignora índices por ser case-insensitive).
+    return Q(**{f'{campo}__gte': prefixo, f'{campo}__lt': prefixo + '\uffff'})
+
+
+class BuscaPrefixo:
+    """Backend genérico: prefixo do nome normalizado"""
+    nome = 'prefixo'
+
+    def filtrar(self, queryset, termo):
+        digitos = apenas_digitos(termo)
+        if digitos and not any(c.isalpha() for c in termo):
+            if len(digitos) < MIN_DIGITOS:
+                return queryset.none()
+            return queryset.filter(self.filtro_digitos(digitos))
+
+        normalizado = normalizar_texto(termo)
+        if not normalizado:
+            return queryset
+        return self.filtrar_nome(queryset, normalizado)
+
+    def filtro_digitos(self, digitos):
+        return (
+            _intervalo_prefixo('cpf_digitos', digitos) |
+            _intervalo_prefixo('telefone_digitos', digitos)
+        )
+
+    def filtrar_nome(self, queryset, normalizado):
+        return queryset.filter(_intervalo_prefixo('nome_busca', normalizado))
+
+
+class BuscaFTS5(BuscaPrefixo):
+    """SQLite: prefixo de cada palavra via índice FTS5"""
+    nome = 'fts5'
+
+    def filtrar_nome(self, queryset, normalizado):
+        expressao = ' '.join(f'"{palavra}"*' for palavra in normalizado.split())
+        return queryset.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {TABELA_FTS} WHERE {TABELA_FTS} MATCH %s',
+            [expressao],
+        ))
+
+
+class BuscaTrigram(BuscaPrefixo):
+    """PostgreSQL: substring de cada palavra via índice GIN pg_trgm"""
+    nome = 'trigram'
+
+    def filtro_digitos(self, digitos):
+        # No PostgreSQL o Django cria índices varchar_pattern_ops para
+        # CharField com db_index, que atendem LIKE 'prefixo%'.
+        return Q(cpf_digitos__startswith=digitos) | Q(telefone_digitos__startswith=digitos)
+
+    def filtrar_nome(self, queryset, normalizado):
+        for palavra in normalizado.split():
+            queryset = queryset.filter(nome_busca__contains=palavra)
+        return queryset
+
+
+@lru_cache(maxsize=None)
+def fts5_disponivel():
+    """Verifica se o SQLite deste processo foi compilado com FTS5"""
+    try:
+        conexao = sqlite3.connect(':memory:')
+        try:
+            conexao.execute('CREATE VIRTUAL TABLE t USING fts5(c)')
+        finally:
+            conexao.close()
+    except sqlite3.Error:
+        return False
+    return True
+
+
+def obter_backend(connection=None):
+    """Escolhe o backend de busca conforme o banco em uso"""
+    connection = connection or default_connection
+    if connection.vendor == 'sqlite' and fts5_disponivel():
+        return BuscaFTS5()
+    if connection.vendor == 'postgresql':
+        return BuscaTrigram()
+    return BuscaPrefixo()
+
+
+def buscar_pacientes(queryset, termo, connection=None):
+    """Aplica a busca de ``termo`` sobre um queryset de ``Paciente``"""
+    termo = (termo or '').strip()
+    if not termo:
+        return queryset
+    return obter_backend(connection).filtrar(queryset, termo)
+
+
+def _instalar_fts5(cursor, tabela):
+    cursor.execute(
+        "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger') AND name LIKE %s",
+        [f'{TABELA_FTS}%'],
+    )
+    existentes = {linha[0] for linha in cursor.fetchall()}
+
+    cursor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABELA_FTS} USING fts5("
+        f"nome_busca, content='{tabela}', content_rowid='id')"
+    )
+    cursor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {TABELA_FTS}_ai AFTER INSERT ON {tabela} BEGIN "
+        f"INSERT INTO {TABELA_FTS}(rowid, nome_busca) VALUES (new.id, new.nome_busca); END"
+    )
+    cursor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {TABELA_FTS}_ad AFTER DELETE ON {tabela} BEGIN "
+        f"INSERT INTO {TABELA_FTS}({TABELA_FTS}, rowid, nome_busca) "
+        f"VALUES ('delete', old.id, old.nome_busca); END"
+    )
+    cursor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {TABELA_FTS}_au AFTER UPDATE OF nome_busca ON {tabela} BEGIN "
+        f"INSERT INTO {TABELA_FTS}({TABELA_FTS}, rowid, nome_busca) "
+        f"VALUES ('delete', old.id, old.nome_busca); "
+        f"INSERT INTO {TABELA_FTS}(rowid, nome_busca) VALUES (new.id, new.nome_busca); END"
+    )
+
+    # Migrações que recriam a tabela de pacientes no SQLite descartam os
+    # triggers; nesse caso o índice é reconstruído a partir da tabela.
+    esperados = {TABELA_FTS, f'{TABELA_FTS}_ai', f'{TABELA_FTS}_ad', f'{TABELA_FTS}_au'}
+    if not esperados <= existentes:
+        cursor.execute(f"INSERT INTO {TABELA_FTS}({TABELA_FTS}) VALUES ('rebuild')")
+
+
+def _instalar_trigram(cursor, tabela):
+    cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    cursor.execute(
+        f'CREATE INDEX IF NOT EXISTS {tabela}_nome_busca_trgm '
+        f'ON {tabela} USING gin (nome_busca gin_trgm_ops)'
+    )
+
+
+def instalar_indices(connection=None):
+    """
+    Cria (idempotentemente) as estruturas específicas do backend de busca.
+    Executado após cada ``migrate`` pelo sinal ``post_migrate``.
+    """
+    connection = connection or default_connection
+    tabela = apps.get_model('core', 'Paciente')._meta.db_table
+    if tabela not in connection.introspection.table_names():
+        return
+
+    backend = obter_backend(connection)
+    with connection.cursor() as cursor:
+        if backend.nome == 'fts5':
+            _instalar_fts5(cursor, tabela)
+        elif backend.nome == 'trigram':
+            _instalar_trigram(cursor, tabela)
@@ -0,0 +1,87 @@
+from django.db import transaction, connections
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete, post_migrate
+from django.dispatch import receiver
+
+from .caching import incrementar_versao
+from . import finance
+from .events import publicar_evento_agenda
+from .instrumentation import instalar_wrapper_sql
+from .models import Paciente, Agendamento, Consulta, Profissional
+from .search import instalar_indices
+
+
+@receiver([post_save, post_delete], sender=Paciente)
+@receiver([post_save, post_delete], sender=Agendamento)
+@receiver([post_save, post_delete], sender=Consulta)
+@receiver([post_save, post_delete], sender=Profissional)
+def invalidar_kpis(sender, **kwargs):
+    """Incrementa a versão do modelo alterado assim que a transação confirmar"""
+    modelo = sender._meta.model_name
+    transaction.on_commit(lambda: incrementar_versao(modelo))
+
+
+def _dados_agendamento(agendamento):
+    return {
+        'id': agendamento.pk,
+        'status': agendamento.status,
+        'data_hora': agendamento.data_hora,
+        'profissional_id': agendamento.profissional_id,
+    }
+
+
+@receiver(post_save, sender=Agendamento)
+def publicar_agendamento_salvo(sender, instance, created, **kwargs):
+    """Notifica as telas abertas sobre novos agendamentos e mudanças de status"""
+    status_anterior = getattr(instance, '_status_original', None)
+    if created:
+        tipo = 'agendamento.criado'
+    elif status_anterior is not None and status_anterior != instance.status:
+        tipo = 'agendamento.status'
+    else:
+        tipo = 'agendamento.atualizado'
+    dados = _dados_agendamento(instance)
+    if tipo == 'agendamento.status':
+        dados['status_anterior'] = status_anterior
+    instance._status_original = instance.status
+    transaction.on_commit(lambda: publicar_evento_agenda(tipo, **dados))
+
+
+@receiver(post_delete, sender=Agendamento)
+def publicar_agendamento_removido(sender, instance, **kwargs):
+    dados = _dados_agendamento(instance)
+    transaction.on_commit(lambda: publicar_evento_agenda('agendamento.removido', **dados))
+
+
+@receiver(post_save, sender=Consulta)
+def atualizar_resumo_consulta(sender, instance, created, **kwargs):
+    """Aplica a diferença da consulta aos resumos financeiros (ver core.finance)"""
+    finance.registrar_consulta(instance, created)
+
+
+@receiver(post_delete, sender=Consulta)
+def remover_resumo_consulta(sender, instance, **kwargs):
+    finance.remover_consulta(instance)
+
+
+@receiver(post_save, sender=Agendamento)
+def transferir_resumo_agendamento(sender, instance, created, **kwargs):
+    """Move a consulta nos resumos quando o agendamento troca de profissional"""
+    anterior = getattr(instance, '_profissional_original', None)
+    if not created and anterior is not None and anterior != instance.profissional_id:
+        finance.transferir_profissional(instance, anterior)
+    instance._profissional_original = instance.profissional_id
+
+
+@receiver(post_migrate)
+def instalar_indices_busca(sender, using='default', **kwargs):
+    """Garante o índice FTS5/trigram após cada migrate (ver core.search)"""
+    if sender.name != 'core':
+        return
+    instalar_indices(connections[using])
+
+
+@receiver(connection_created)
+def instrumentar_conexao(sender, connection, **kwargs):
+    """Mede as queries de cada conexão (ver core.instrumentation)"""
+    instalar_wrapper_sql(connection)
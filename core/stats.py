@@ -0,0 +1,95 @@
+"""
+Estatísticas agregadas do dashboard.
+
+Cada modelo é consultado uma única vez com agregação condicional
+(``COUNT``/``SUM`` com ``FILTER``), de modo que o número de queries
+não cresce com a quantidade de indicadores exibidos. Os grupos
+(``kpis_pacientes``, ``kpis_agendamentos``, ``kpis_consultas``) são
+independentes entre si; o dashboard assíncrono (``core.panels``) calcula
+cada um em paralelo.
+"""
+from dataclasses import dataclass, asdict
+from decimal import Decimal
+
+from django.db.models import Count, Sum, Q
+from django.utils import timezone
+
+from .models import Paciente, Agendamento, Consulta
+from .managers import STATUS_ATIVOS
+from .birthdays import filtro_aniversario
+from .dateranges import intervalo_dias, intervalo_mes, no_intervalo
+
+
+@dataclass(frozen=True)
+class DashboardStats:
+    """Indicadores exibidos nos cards do dashboard"""
+    total_pacientes: int = 0
+    pacientes_novos_mes: int = 0
+    aniversariantes_hoje: int = 0
+    agendamentos_hoje: int = 0
+    agendamentos_confirmados: int = 0
+    consultas_mes: int = 0
+    consultas_pagas: int = 0
+    faturamento_mes: Decimal = Decimal('0')
+
+    def as_context(self):
+        """Retorna os indicadores como dicionário para o template"""
+        return asdict(self)
+
+
+def kpis_pacientes(hoje, mes):
+    return Paciente.objects.filter(ativo=True).aggregate(
+        total_pacientes=Count('id'),
+        pacientes_novos_mes=Count('id', filter=no_intervalo('criado_em', mes)),
+        aniversariantes_hoje=Count('id', filter=filtro_aniversario(hoje)),
+    )
+
+
+def kpis_agendamentos(hoje):
+    do_dia = no_intervalo('data_hora', intervalo_dias(hoje))
+    return Agendamento.objects.filter(do_dia).aggregate(
+        agendamentos_hoje=Count('id', filter=Q(status__in=STATUS_ATIVOS)),
+        agendamentos_confirmados=Count('id', filter=Q(status='confirmado')),
+    )
+
+
+def kpis_consultas(mes):
+    pago = Q(pago=True)
+    valores = Consulta.objects.filter(no_intervalo('criado_em', mes)).aggregate(
+        consultas_mes=Count('id'),
+        consultas_pagas=Count('id', filter=pago),
+        faturamento_mes=Sum('valor', filter=pago),
+    )
+    valores['faturamento_mes'] = valores['faturamento_mes'] or Decimal('0')
+    return valores
+
+
+def calcular_estatisticas_dashboard(hoje=None):
+    """
+    Calcula todos os indicadores do dashboard em três queries
+    (uma por modelo: Paciente, Agendamento e Consulta).
+    """
+    hoje = hoje or timezone.localdate()
+    mes = intervalo_mes(hoje)
+
+    valores = {}
+    valores.update(kpis_pacientes(hoje, mes))
+    valores.update(kpis_agendamentos(hoje))
+    valores.update(kpis_consultas(mes))
+    return DashboardStats(**valores)
+
+
+def calcular_contadores_pacientes(hoje=None):
+    """Contadores do cabeçalho da página de pacientes"""
+    hoje = hoje or timezone.localdate()
+    mes = intervalo_mes(hoje)
+
+    contadores = Paciente.objects.filter(ativo=True).aggregate(
+        total_pacientes=Count('id'),
+        pacientes_novos_mes=Count('id', filter=no_intervalo('criado_em', mes)),
+    )
+    contadores['faturamento_mes'] = Consulta.objects.filter(
+        no_intervalo('criado_em', mes),
+        pago=True
+    ).aggregate(total=Sum('valor'))['total'] or Decimal('0')
+    return contadores
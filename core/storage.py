@@ -0,0 +1,59 @@
+"""
+Storage de arquivos estáticos de produção.
+
+``ArmazenamentoEstatico`` faz do ``collectstatic`` o passo de build: monta
+os pacotes de ``core.assets.PACOTES`` a partir das fontes já copiadas, deixa
+o ``ManifestStaticFilesStorage`` acrescentar o hash do conteúdo aos nomes
+(reescrevendo ``url()``/``@import`` dos CSS) e grava as versões ``.gz`` e
+``.br`` de cada arquivo de texto.
+"""
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+from .assets import PACOTES, TAMANHO_MINIMO_COMPRESSAO, caminho_pacote, comprimir, comprimivel, montar_pacote
+
+
+class ArmazenamentoEstatico(ManifestStaticFilesStorage):
+
+    def _ler_texto(self, caminho):
+        with self.open(caminho) as arquivo:
+            return arquivo.read().decode('utf-8')
+
+    def _gravar(self, caminho, conteudo):
+        if self.exists(caminho):
+            self.delete(caminho)
+        self.save(caminho, ContentFile(conteudo))
+
+    def montar_pacotes(self):
+        """Grava os pacotes no destino; devolve os caminhos criados"""
+        criados = []
+        for nome, tipos in PACOTES.items():
+            for tipo, fontes in tipos.items():
+                destino = caminho_pacote(nome, tipo)
+                self._gravar(destino, montar_pacote(self._ler_texto, fontes, tipo).encode('utf-8'))
+                criados.append(destino)
+        return criados
+
+    def comprimir_arquivo(self, caminho):
+        with self.open(caminho) as arquivo:
+            conteudo = arquivo.read()
+        if len(conteudo) < TAMANHO_MINIMO_COMPRESSAO:
+            return
+        for sufixo, dados in comprimir(conteudo).items():
+            self._gravar(caminho + sufixo, dados)
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            for caminho in self.montar_pacotes():
+                paths[caminho] = (self, caminho)
+
+        gerados = set()
+        for nome, nome_hash, processado in super().post_process(paths, dry_run, **options):
+            if nome_hash and not isinstance(processado, Exception):
+                gerados.update((nome, nome_hash))
+            yield nome, nome_hash, processado
+
+        if not dry_run:
+            for caminho in sorted(gerados):
+                if comprimivel(caminho):
+                    self.comprimir_arquivo(caminho)
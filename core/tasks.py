@@ -0,0 +1,240 @@
+"""
+Fila de tarefas em segundo plano.
+
+Funções registradas com ``@tarefa()`` são enfileiradas com
+``enfileirar(nome, **argumentos)``: cada chamada vira uma linha de
+``Tarefa`` (argumentos em JSON), onde também ficam status, progresso,
+tentativas e o erro da última falha — tudo visível no admin.
+
+Backends (``settings.PULSE_TAREFAS_BACKEND``):
+
+* ``'banco'`` (padrão): as tarefas esperam na tabela até um
+  ``manage.py run_worker`` reservá-las;
+* ``'local'``: além de gravada, a tarefa é executada num pool de threads
+  do próprio processo após o commit. Serve para desenvolvimento ou
+  instalações sem worker; o que ficar pendente (processo reiniciado) é
+  pego por um ``run_worker`` se houver.
+
+A reserva é um ``UPDATE ... WHERE status = 'pendente'`` por tarefa:
+só um worker consegue mudar a linha, então vários workers (threads ou
+processos) podem disputar a mesma fila sem executar nada duas vezes.
+Falhas são repetidas até ``max_tentativas`` com espera exponencial; uma
+tarefa presa em ``executando`` além de ``PULSE_TAREFAS_TEMPO_LIMITE``
+(worker morto) volta para a fila.
+"""
+import logging
+import os
+import socket
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Tarefa
+from .routers import leitura_em_replica
+
+logger = logging.getLogger(__name__)
+
+REGISTRO = {}
+ESPERA_BASE = 30  # segundos; dobra a cada tentativa
+ESPERA_MAXIMA = 60 * 60
+TEMPO_LIMITE = 60 * 60  # segundos em execução antes de a tarefa ser considerada órfã
+
+
+def tarefa(nome=None, max_tentativas=3, usar_replica=False):
+    """
+    Registra a função decorada como tarefa; ela recebe ``(tarefa, **argumentos)``.
+    Com ``usar_replica`` as leituras da tarefa vão para as réplicas
+    (``core.routers.leitura_em_replica``).
+    """
+    def decorator(func):
+        chave = nome or func.__name__
+        REGISTRO[chave] = func
+        func.nome_tarefa = chave
+        func.max_tentativas = max_tentativas
+        func.usar_replica = usar_replica
+        return func
+    return decorator
+
+
+def backend():
+    return getattr(settings, 'PULSE_TAREFAS_BACKEND', 'banco')
+
+
+def enfileirar(nome, atraso=None, max_tentativas=None, **argumentos):
+    """Cria a ``Tarefa`` ``nome`` com ``argumentos`` (serializáveis em JSON)"""
+    func = REGISTRO.get(nome)
+    if func is None:
+        raise ValueError(f'Tarefa desconhecida: {nome}')
+    registro = Tarefa.objects.create(
+        nome=nome,
+        argumentos=argumentos,
+        max_tentativas=max_tentativas or func.max_tentativas,
+        executar_apos=timezone.now() + timedelta(seconds=atraso or 0),
+    )
+    if backend() == 'local':
+        transaction.on_commit(lambda: _agendar_local(registro.pk, atraso or 0))
+    return registro
+
+
+def espera(tentativas):
+    """Segundos até a próxima tentativa depois de ``tentativas`` falhas"""
+    return min(ESPERA_BASE * 2 ** (tentativas - 1), ESPERA_MAXIMA)
+
+
+def reservar(worker, limite=1):
+    """Marca até ``limite`` tarefas prontas como ``executando`` por ``worker``"""
+    agora = timezone.now()
+    candidatas = Tarefa.objects.filter(
+        status='pendente', executar_apos__lte=agora
+    ).order_by('executar_apos').values_list('pk', flat=True)[:limite * 2]
+    reservadas = []
+    for pk in candidatas:
+        # Outro worker pode ter reservado entre o SELECT e aqui.
+        if Tarefa.objects.filter(pk=pk, status='pendente').update(
+            status='executando', worker=worker, iniciado_em=agora, tentativas=F('tentativas') + 1
+        ):
+            reservadas.append(pk)
+            if len(reservadas) == limite:
+                break
+    return reservadas
+
+
+def executar(pk):
+    """Executa a tarefa já reservada ``pk`` e registra o resultado ou a falha"""
+    close_old_connections()
+    try:
+        registro = Tarefa.objects.get(pk=pk)
+        func = REGISTRO.get(registro.nome)
+        try:
+            if func is None:
+                raise LookupError(f'Tarefa não registrada neste processo: {registro.nome}')
+            with leitura_em_replica() if func.usar_replica else nullcontext():
+                resultado = func(registro, **registro.argumentos)
+        except Exception:
+            return _falhou(registro, traceback.format_exc())
+        Tarefa.objects.filter(pk=pk).update(
+            status='concluida', progresso=100, resultado=resultado, erro='', concluido_em=timezone.now()
+        )
+        return True
+    finally:
+        close_old_connections()
+
+
+def _falhou(registro, erro):
+    logger.warning('Tarefa %s #%s falhou (tentativa %s/%s): %s', registro.nome, registro.pk,
+                   registro.tentativas, registro.max_tentativas, erro.strip().splitlines()[-1])
+    if registro.tentativas < registro.max_tentativas:
+        atraso = espera(registro.tentativas)
+        Tarefa.objects.filter(pk=registro.pk).update(
+            status='pendente', erro=erro, executar_apos=timezone.now() + timedelta(seconds=atraso)
+        )
+        if backend() == 'local':
+            _agendar_local(registro.pk, atraso)
+    else:
+        Tarefa.objects.filter(pk=registro.pk).update(status='falhou', erro=erro, concluido_em=timezone.now())
+    return False
+
+
+def recuperar_orfas(tempo_limite=None):
+    """Devolve à fila as tarefas em execução há mais de ``tempo_limite`` segundos"""
+    tempo_limite = tempo_limite or getattr(settings, 'PULSE_TAREFAS_TEMPO_LIMITE', TEMPO_LIMITE)
+    presas = Tarefa.objects.filter(
+        status='executando', iniciado_em__lt=timezone.now() - timedelta(seconds=tempo_limite)
+    )
+    falhas = presas.filter(tentativas__gte=F('max_tentativas')).update(
+        status='falhou', erro='Tempo limite excedido', concluido_em=timezone.now()
+    )
+    return falhas + presas.update(status='pendente', erro='Tempo limite excedido; reenfileirada')
+
+
+def nome_worker():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+class Worker:
+    """Reserva e executa tarefas com um pool de ``threads`` até ``parar()``"""
+
+    def __init__(self, threads=4, intervalo=1.0):
+        self.threads = threads
+        self.intervalo = intervalo
+        self.nome = nome_worker()
+        self._parar = threading.Event()
+        self._em_execucao = set()
+        self._lock = threading.Lock()
+
+    def parar(self):
+        self._parar.set()
+
+    def _concluir(self, futuro):
+        with self._lock:
+            self._em_execucao.discard(futuro)
+
+    def executar_pendentes(self, pool):
+        """Reserva tarefas para as threads livres; devolve quantas foram iniciadas"""
+        with self._lock:
+            livres = self.threads - len(self._em_execucao)
+        if livres <= 0:
+            return 0
+        reservadas = reservar(self.nome, livres)
+        for pk in reservadas:
+            futuro = pool.submit(executar, pk)
+            with self._lock:
+                self._em_execucao.add(futuro)
+            futuro.add_done_callback(self._concluir)
+        return len(reservadas)
+
+    def rodar(self, ate_esvaziar=False):
+        """Laço principal; com ``ate_esvaziar`` termina quando não houver tarefas prontas"""
+        with ThreadPoolExecutor(self.threads, thread_name_prefix='pulse-worker') as pool:
+            ciclos = 0
+            while not self._parar.is_set():
+                if ciclos % 60 == 0:
+                    recuperar_orfas()
+                ciclos += 1
+                iniciadas = self.executar_pendentes(pool)
+                close_old_connections()
+                with self._lock:
+                    ocupado = bool(self._em_execucao)
+                if ate_esvaziar and not iniciadas and not ocupado:
+                    break
+                if not iniciadas:
+                    self._parar.wait(self.intervalo)
+        # O ``with`` espera as tarefas em andamento terminarem.
+
+
+_pool_local = None
+_pool_local_lock = threading.Lock()
+
+
+def _agendar_local(pk, atraso=0):
+    """Backend ``local``: reserva e executa ``pk`` numa thread deste processo"""
+    global _pool_local
+    with _pool_local_lock:
+        if _pool_local is None:
+            _pool_local = ThreadPoolExecutor(
+                getattr(settings, 'PULSE_TAREFAS_THREADS', 2), thread_name_prefix='pulse-tarefa'
+            )
+    if atraso:
+        temporizador = threading.Timer(atraso, _agendar_local, args=(pk,))
+        temporizador.daemon = True
+        temporizador.start()
+        return
+    _pool_local.submit(_executar_local, pk)
+
+
+def _executar_local(pk):
+    close_old_connections()
+    reservada = Tarefa.objects.filter(pk=pk, status='pendente').update(
+        status='executando', worker=nome_worker(), iniciado_em=timezone.now(), tentativas=F('tentativas') + 1
+    )
+    if reservada:
+        executar(pk)
+    else:
+        close_old_connections()
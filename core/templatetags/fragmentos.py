@@ -0,0 +1,29 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from core.caching import fragmentos_por_linha
+
+register = template.Library()
+
+
+def _lista(valor):
+    return tuple(item.strip() for item in valor.split(',') if item.strip())
+
+
+@register.simple_tag(takes_context=True)
+def linhas_em_cache(context, objetos, template_name, nome, *extras, campos='atualizado_em', modelos=''):
+    """
+    Renderiza ``template_name`` para cada item de ``objetos`` (visível como
+    ``nome``) com cache por linha; ver ``core.caching.fragmentos_por_linha``.
+    ``campos`` e ``modelos`` são listas separadas por vírgula.
+    """
+    parcial = context.template.engine.get_template(template_name)
+
+    def renderizar(objeto):
+        with context.push({nome: objeto}):
+            return parcial.render(context)
+
+    partes = fragmentos_por_linha(
+        template_name, objetos, renderizar, campos=_lista(campos), modelos=_lista(modelos), extras=extras,
+    )
+    return mark_safe(''.join(partes))
@@ -0,0 +1,23 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html_join
+
+from core.assets import arquivos_da_pagina
+
+register = template.Library()
+
+
+@register.simple_tag
+def pacote_css(nome):
+    """``<link>`` do CSS da página ``nome`` (ou das fontes, em desenvolvimento)"""
+    return format_html_join(
+        '\n', '<link rel="stylesheet" href="{}">', ((static(caminho),) for caminho in arquivos_da_pagina(nome, 'css'))
+    )
+
+
+@register.simple_tag
+def pacote_js(nome):
+    """``<script defer>`` do JS da página ``nome`` (ou das fontes, em desenvolvimento)"""
+    return format_html_join(
+        '\n', '<script src="{}" defer></script>', ((static(caminho),) for caminho in arquivos_da_pagina(nome, 'js'))
+    )
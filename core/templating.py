@@ -0,0 +1,29 @@
+"""
+Backend de templates do Django com medição do tempo de renderização.
+
+Idêntico ao ``django.template.backends.django.DjangoTemplates``, mas cada
+``render()`` de primeiro nível é somado à medição da requisição corrente
+(ver ``core.instrumentation``). Fora de uma requisição medida o custo é
+uma leitura de ``ContextVar``.
+"""
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as backend_django
+
+from .instrumentation import medir_template
+
+
+class Template(backend_django.Template):
+    def render(self, context=None, request=None):
+        with medir_template():
+            return super().render(context, request)
+
+
+class DjangoTemplates(backend_django.DjangoTemplates):
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            backend_django.reraise(exc, self)
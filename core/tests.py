@@ -0,0 +1,1098 @@
+import asyncio
+import io
+import json
+import tempfile
+import threading
+import time
+import unittest
+import zipfile
+from datetime import date, datetime, time as hora, timedelta
+from decimal import Decimal
+from unittest import mock
+from pathlib import Path
+from xml.etree import ElementTree
+from zoneinfo import ZoneInfo
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.template import Context, Template
+from django.db import connection, connections, transaction
+from django.db.models import QuerySet
+from django.http import HttpResponseNotFound, JsonResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import events, instrumentation, jobs, tasks
+from .assets import CACHE_IMUTAVEL, CACHE_SEM_HASH, minificar_css, minificar_js
+from .backends.sqlite3.base import DatabaseWrapper as SQLitePulse
+from .birthdays import aniversariantes_hoje, aniversariantes_mes, aniversariantes_semana
+from .csvio import ImportadorAgendamentos, ImportadorPacientes
+from .dateranges import intervalo_dias, intervalo_mes, no_intervalo
+from .finance import reconstruir_resumos
+from .forms import AgendamentoForm
+from .middleware import ArquivosEstaticosMiddleware, RoteamentoBancoMiddleware
+from .models import Agendamento, Consulta, Paciente, Profissional, ResumoFinanceiroMensal, Tarefa
+from .pagination import contagem_estimada
+from .panels import calcular_paineis
+from .reports import COLUNAS_CONSULTAS, xlsx_consultas
+from .query_budget import OrcamentoExcedido, verificar_orcamento
+from .reminders import enviar_lembretes
+from .routers import usar_replica
+from .scheduling import HorarioIndisponivel, reservar_horario
+from .search import TABELA_FTS, BuscaFTS5, buscar_pacientes, fts5_disponivel, normalizar_texto
+from .urls import urlpatterns
+
+
+def criar_paciente(numero, using=None, **campos):
+    dados = {
+        'nome': f'Paciente {numero:04d}',
+        'cpf': f'{numero:03d}.000.000-{numero % 100:02d}',
+        'data_nascimento': date(1980, 1, 1) + timedelta(days=numero),
+        'sexo': 'F',
+        'telefone': '(11) 90000-0000',
+    }
+    dados.update(campos)
+    return Paciente.objects.db_manager(using).create(**dados)
+
+
+def criar_profissional(numero=1, **campos):
+    dados = {
+        'usuario': User.objects.create_user(f'profissional{numero}'),
+        'nome': f'Dr(a). Profissional {numero}',
+        'especialidade': 'Clínica Geral',
+        'crm': f'CRM-{numero:05d}',
+        'telefone': '(11) 3000-0000',
+        'email': f'profissional{numero}@pulse.test',
+    }
+    dados.update(campos)
+    return Profissional.objects.create(**dados)
+
+
+def horario(dia, horas, minutos=0):
+    return timezone.make_aware(datetime.combine(dia, hora(horas, minutos)))
+
+
+def criar_agenda_do_dia(dia, quantidade=6):
+    """Pacientes (alguns aniversariantes), agendamentos e consultas em ``dia``"""
+    profissional = criar_profissional()
+    for numero in range(1, quantidade + 1):
+        nascimento = dia.replace(year=1980) if numero % 2 else date(1980, 1, 1) + timedelta(days=numero)
+        paciente = criar_paciente(numero, data_nascimento=nascimento)
+        agendamento = Agendamento.objects.create(
+            paciente=paciente, profissional=profissional,
+            data_hora=horario(dia, 8) + timedelta(minutes=30 * numero),
+            status='realizado' if numero % 3 == 0 else 'agendado',
+        )
+        if agendamento.status == 'realizado':
+            Consulta.objects.create(
+                agendamento=agendamento, sintomas='-', diagnostico='-', tratamento='-',
+                valor=Decimal('150'), pago=True,
+            )
+    return profissional
+
+
+class DashboardTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        criar_agenda_do_dia(timezone.localdate())
+
+    def test_queries_do_dashboard(self):
+        # Uma agregação por modelo (pacientes, agendamentos, consultas) e as
+        # duas listas do sidebar, independente do número de linhas.
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('core:dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_pacientes'], 6)
+        self.assertEqual(len(response.context['agendamentos_hoje_lista']), 4)
+        self.assertEqual(len(response.context['aniversariantes_lista']), 3)
+        # Só o que o template usa.
+        self.assertNotIn('proximos_agendamentos', response.context)
+        self.assertNotIn('pacientes_recentes', response.context)
+
+    def test_kpis_em_cache(self):
+        self.client.get(reverse('core:dashboard'))
+        with self.assertNumQueries(2):
+            self.client.get(reverse('core:dashboard'))
+
+
+class ApiCondicionalTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.profissional = criar_agenda_do_dia(timezone.localdate())
+
+    def validadores(self, nome):
+        response = self.client.get(reverse(nome))
+        self.assertEqual(response.status_code, 200)
+        return response['ETag'], response['Last-Modified']
+
+    def test_repeticao_com_if_none_match_recebe_304(self):
+        etag, modificado = self.validadores('core:api_dashboard')
+        response = self.client.get(reverse('core:api_dashboard'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(reverse('core:api_dashboard'), HTTP_IF_MODIFIED_SINCE=modificado)
+        self.assertEqual(response.status_code, 304)
+
+    def test_gravacao_muda_o_etag(self):
+        for nome, gravar in [
+            ('core:api_dashboard', lambda: criar_paciente(50)),
+            ('core:api_agenda', lambda: Agendamento.objects.create(
+                paciente=criar_paciente(51), profissional=self.profissional,
+                data_hora=horario(timezone.localdate(), 17),
+            )),
+        ]:
+            with self.subTest(nome):
+                etag, _ = self.validadores(nome)
+                with self.captureOnCommitCallbacks(execute=True):
+                    gravar()
+                response = self.client.get(reverse(nome), HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+
+    def test_virada_do_dia_invalida_os_dois_validadores(self):
+        amanha = timezone.localdate() + timedelta(days=1)
+        for nome in ('core:api_dashboard', 'core:api_agenda'):
+            with self.subTest(nome):
+                etag, modificado = self.validadores(nome)
+                with mock.patch('django.utils.timezone.localdate', return_value=amanha):
+                    por_etag = self.client.get(reverse(nome), HTTP_IF_NONE_MATCH=etag)
+                    por_data = self.client.get(reverse(nome), HTTP_IF_MODIFIED_SINCE=modificado)
+                self.assertEqual(por_etag.status_code, 200)
+                self.assertEqual(por_data.status_code, 200)
+                self.assertNotEqual(por_data['Last-Modified'], modificado)
+
+
+class OrcamentoQueriesTests(TestCase):
+    # Variações das views que mudam o caminho das queries.
+    PARAMETROS = {
+        'pacientes': [{}, {'busca': 'Paciente'}],
+        'financeiro': [{}, {'mes': '2019-02'}],
+    }
+
+    def setUp(self):
+        cache.clear()
+        hoje = timezone.localdate()
+        profissional = criar_agenda_do_dia(hoje)
+        paciente = criar_paciente(99)
+        for dias in range(1, 4):
+            reservar_horario(paciente, profissional, horario(hoje + timedelta(days=dias), 10), duracao=30)
+
+    def views_com_orcamento(self):
+        vistas = set()
+        for padrao in urlpatterns:
+            view = padrao.callback
+            if getattr(view, 'orcamento_queries', None) is None or padrao.pattern.converters or view in vistas:
+                continue
+            vistas.add(view)
+            yield padrao.name, view
+
+    def test_views_dentro_do_orcamento(self):
+        views = list(self.views_com_orcamento())
+        self.assertGreaterEqual(len(views), 4)
+        for nome, view in views:
+            for parametros in self.PARAMETROS.get(nome, [{}]):
+                with self.subTest(view=nome, **parametros):
+                    cache.clear()  # o orçamento vale para o cache frio
+                    with verificar_orcamento(view.orcamento_queries, nome):
+                        response = self.client.get(reverse(f'core:{nome}'), parametros)
+                    self.assertEqual(response.status_code, 200)
+
+    def test_orcamento_excedido_falha(self):
+        with self.assertRaises(OrcamentoExcedido):
+            with verificar_orcamento(1, 'N+1'):
+                for agendamento in Agendamento.objects.all():
+                    agendamento.paciente.nome
+
+
+class EventosAgendaTests(TestCase):
+
+    def setUp(self):
+        self.broker = events.BrokerMemoria()
+        patcher = mock.patch.object(events, '_broker', self.broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+
+    def assinar(self):
+        async def assinar():
+            return self.broker.assinar(events.CANAL_AGENDA)
+        return self.loop.run_until_complete(assinar())
+
+    def proxima(self, assinatura):
+        return self.loop.run_until_complete(assinatura.proxima(timeout=0.1))
+
+    def test_mudanca_de_status_entregue_apos_o_commit(self):
+        agendamento = reservar_horario(
+            criar_paciente(1), criar_profissional(), horario(timezone.localdate() + timedelta(days=1), 9)
+        )
+        assinatura = self.assinar()
+        agendamento = Agendamento.objects.get(pk=agendamento.pk)
+        agendamento.status = 'confirmado'
+        with self.captureOnCommitCallbacks() as callbacks:
+            agendamento.save()
+        self.assertIsNone(self.proxima(assinatura))  # nada antes do commit
+
+        for callback in callbacks:
+            callback()
+        evento = json.loads(self.proxima(assinatura))
+        self.assertEqual(evento['tipo'], 'agendamento.status')
+        self.assertEqual(evento['id'], agendamento.pk)
+        self.assertEqual(evento['status'], 'confirmado')
+        self.assertEqual(evento['status_anterior'], 'agendado')
+
+    def test_cancelar_remove_o_assinante(self):
+        assinatura = self.assinar()
+        outra = self.assinar()
+        self.assertEqual(self.broker.total_assinantes, 2)
+        self.broker.cancelar(assinatura)
+        self.assertEqual(self.broker.total_assinantes, 1)
+
+        events.publicar_evento_agenda('agendamento.criado', id=1)
+        self.assertIsNone(self.proxima(assinatura))
+        self.assertEqual(json.loads(self.proxima(outra))['id'], 1)
+
+
+class BackendComFalha(EmailBackend):
+    """locmem que recusa um destinatário e registra se foi fechado"""
+
+    def __init__(self, recusar=(), **kwargs):
+        super().__init__(**kwargs)
+        self.recusar = set(recusar)
+        self.fechado = False
+
+    def send_messages(self, messages):
+        if any(set(message.to) & self.recusar for message in messages):
+            raise ConnectionError('Destinatário recusado')
+        return super().send_messages(messages)
+
+    def close(self):
+        self.fechado = True
+
+
+class LembretesTests(TestCase):
+
+    def setUp(self):
+        self.dia = timezone.localdate() + timedelta(days=1)
+        profissional = criar_profissional()
+        for numero in range(1, 4):
+            paciente = criar_paciente(numero, email=f'paciente{numero}@pulse.test')
+            reservar_horario(paciente, profissional, horario(self.dia, 8 + numero), duracao=30)
+
+    def test_reexecucao_nao_reenvia(self):
+        self.assertEqual(enviar_lembretes(self.dia).enviados, 3)
+        self.assertEqual(len(mail.outbox), 3)
+
+        resultado = enviar_lembretes(self.dia)
+        self.assertEqual((resultado.enviados, resultado.falhas), (0, 0))
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_falha_e_tentada_de_novo(self):
+        conexao = BackendComFalha(recusar={'paciente2@pulse.test'})
+        resultado = enviar_lembretes(self.dia, conexao=conexao)
+        self.assertEqual((resultado.enviados, resultado.falhas), (2, 1))
+        self.assertFalse(conexao.fechado)  # a conexão é de quem chamou
+
+        resultado = enviar_lembretes(self.dia)
+        self.assertEqual((resultado.enviados, resultado.falhas), (1, 0))
+        self.assertEqual(sorted(email.to[0] for email in mail.outbox), [
+            'paciente1@pulse.test', 'paciente2@pulse.test', 'paciente3@pulse.test',
+        ])
+
+
+class LembretesRecorrentesTests(TestCase):
+
+    def executar_com_falha(self, tentativas):
+        registro = jobs.agendar_lembretes()
+        Tarefa.objects.filter(pk=registro.pk).update(status='executando', tentativas=tentativas)
+        registro.refresh_from_db()
+        with mock.patch.object(jobs, 'enviar_lembretes_do_dia', side_effect=ConnectionError('SMTP fora do ar')):
+            with self.assertRaises(ConnectionError):
+                jobs.enviar_lembretes(registro, **registro.argumentos)
+        return registro
+
+    def test_ultima_falha_agenda_o_proximo_dia(self):
+        registro = self.executar_com_falha(tentativas=3)
+        proxima = Tarefa.objects.exclude(pk=registro.pk).get()
+        self.assertEqual(proxima.status, 'pendente')
+        self.assertEqual(proxima.argumentos, {'recorrente': True})
+
+    def test_falha_com_tentativas_restantes_nao_duplica(self):
+        self.executar_com_falha(tentativas=1)
+        self.assertEqual(Tarefa.objects.count(), 1)
+
+
+@tasks.tarefa('testes.falha', max_tentativas=2)
+def tarefa_que_falha(registro):
+    raise ValueError('falha de teste')
+
+
+@tasks.tarefa('testes.ok')
+def tarefa_ok(registro):
+    return {'ok': True}
+
+
+@override_settings(PULSE_TAREFAS_BACKEND='banco')
+class FilaTarefasTests(TransactionTestCase):
+
+    def rodar_worker(self):
+        tasks.Worker(threads=2, intervalo=0).rodar(ate_esvaziar=True)
+
+    def test_falha_volta_para_a_fila_com_espera(self):
+        registro = tasks.enfileirar('testes.falha')
+        antes = timezone.now()
+        with self.assertLogs('core.tasks', 'WARNING'):
+            self.rodar_worker()
+        depois = timezone.now()
+
+        registro.refresh_from_db()
+        self.assertEqual((registro.status, registro.tentativas), ('pendente', 1))
+        self.assertIn('ValueError: falha de teste', registro.erro)
+        espera = timedelta(seconds=tasks.espera(1))
+        self.assertTrue(antes + espera <= registro.executar_apos <= depois + espera)
+
+    def test_falha_definitiva_apos_max_tentativas(self):
+        registro = tasks.enfileirar('testes.falha')
+        with self.assertLogs('core.tasks', 'WARNING'):
+            for _ in range(registro.max_tentativas):
+                Tarefa.objects.filter(pk=registro.pk).update(executar_apos=timezone.now())
+                self.rodar_worker()
+        registro.refresh_from_db()
+        self.assertEqual((registro.status, registro.tentativas), ('falhou', 2))
+        self.assertIsNotNone(registro.concluido_em)
+        # Nada mais a executar: o worker não a pega de novo.
+        self.rodar_worker()
+        self.assertEqual(Tarefa.objects.get(pk=registro.pk).tentativas, 2)
+
+    def test_tarefa_reservada_uma_unica_vez(self):
+        registro = tasks.enfileirar('testes.ok')
+        self.assertEqual(tasks.reservar('worker-1', limite=5), [registro.pk])
+        self.assertEqual(tasks.reservar('worker-2', limite=5), [])
+        registro.refresh_from_db()
+        self.assertEqual((registro.status, registro.worker, registro.tentativas), ('executando', 'worker-1', 1))
+
+    def test_orfa_em_execucao_volta_para_a_fila(self):
+        atrasada = timezone.now() - timedelta(seconds=tasks.TEMPO_LIMITE + 60)
+        orfa = tasks.enfileirar('testes.ok')
+        esgotada = tasks.enfileirar('testes.ok', max_tentativas=1)
+        recente = tasks.enfileirar('testes.ok')
+        Tarefa.objects.filter(pk__in=[orfa.pk, esgotada.pk]).update(
+            status='executando', iniciado_em=atrasada, tentativas=1
+        )
+        Tarefa.objects.filter(pk=recente.pk).update(status='executando', iniciado_em=timezone.now(), tentativas=1)
+
+        self.rodar_worker()
+        status = dict(Tarefa.objects.values_list('pk', 'status'))
+        self.assertEqual(status[orfa.pk], 'concluida')
+        self.assertEqual(Tarefa.objects.get(pk=orfa.pk).tentativas, 2)
+        self.assertEqual(status[esgotada.pk], 'falhou')
+        self.assertEqual(status[recente.pk], 'executando')
+
+
+class RelatorioConsultasTests(TestCase):
+    NS = {'s': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+
+    def setUp(self):
+        criar_agenda_do_dia(timezone.localdate())  # duas consultas pagas de R$ 150
+        agendamento = Agendamento.objects.filter(consulta__isnull=True).order_by('data_hora').first()
+        # A última do relatório (ordem de registro).
+        self.nao_paga = Consulta.objects.create(
+            agendamento=agendamento, sintomas='-', diagnostico='-', tratamento='-', valor=Decimal('99.90'),
+        )
+        self.client.force_login(User.objects.create_user('gerente', is_staff=True))
+
+    def baixar(self, formato):
+        response = self.client.get(reverse('core:relatorio_consultas'), {'formato': formato})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def linhas_da_planilha(self, conteudo):
+        with zipfile.ZipFile(io.BytesIO(conteudo)) as pacote:
+            self.assertIsNone(pacote.testzip())
+            planilha = ElementTree.fromstring(pacote.read('xl/worksheets/sheet1.xml'))
+        return planilha.findall('s:sheetData/s:row', self.NS)
+
+    def test_csv(self):
+        linhas = self.baixar('csv').decode().splitlines()
+        self.assertEqual(linhas[0], ','.join(COLUNAS_CONSULTAS))
+        self.assertEqual(len(linhas), 4)
+        valores = [linha.split(',')[-2:] for linha in linhas[1:]]
+        self.assertCountEqual(valores, [['150.00', '1'], ['150.00', '1'], ['99.90', '0']])
+        data = linhas[1].split(',')[0]
+        self.assertEqual(datetime.fromisoformat(data).date(), timezone.localdate())
+
+    def test_xlsx(self):
+        linhas = self.linhas_da_planilha(self.baixar('xlsx'))
+        self.assertEqual(len(linhas), 4)
+        cabecalho = [celula.find('s:is/s:t', self.NS).text for celula in linhas[0]]
+        self.assertEqual(cabecalho, COLUNAS_CONSULTAS)
+        data, paciente, *_, valor, pago = linhas[-1]
+        self.assertEqual(data.get('s'), '1')  # estilo de data/hora
+        self.assertEqual(paciente.find('s:is/s:t', self.NS).text, self.nao_paga.agendamento.paciente.nome)
+        self.assertEqual((valor.get('s'), valor.find('s:v', self.NS).text), ('2', '99.90'))
+        self.assertEqual((pago.get('t'), pago.find('s:v', self.NS).text), ('b', '0'))
+
+    def test_xlsx_em_varios_blocos(self):
+        partes = list(xlsx_consultas(Consulta.objects.all(), tamanho_lote=1))
+        self.assertGreater(len(partes), 3)
+        self.assertEqual(len(self.linhas_da_planilha(b''.join(partes))), 4)
+
+
+class FragmentosPorLinhaTests(TestCase):
+    # Mesmo uso da agenda do dia.
+    TEMPLATE = Template(
+        "{% load fragmentos %}{% linhas_em_cache agendamentos 'core/partials/agendamento_card.html' "
+        "'agendamento' campos='atualizado_em,paciente.atualizado_em' modelos='profissional' %}"
+    )
+
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            criar_agenda_do_dia(timezone.localdate(), quantidade=2)
+
+    def renderizar(self):
+        agendamentos = Agendamento.objects.select_related('paciente', 'profissional').order_by('data_hora')
+        return self.TEMPLATE.render(Context({'agendamentos': agendamentos}))
+
+    def test_linha_renderizada_de_novo_quando_muda(self):
+        self.assertIn('Paciente 0001', self.renderizar())
+        agendamento = Agendamento.objects.order_by('data_hora').first()
+        paciente = agendamento.paciente
+
+        # Sem mudar atualizado_em, a linha continua vindo do cache.
+        Paciente.objects.filter(pk=paciente.pk).update(nome='Nome sem save')
+        self.assertIn('Paciente 0001', self.renderizar())
+
+        paciente.nome = 'Paciente Renomeado'
+        paciente.save()
+        self.assertIn('Paciente Renomeado', self.renderizar())
+
+        agendamento.refresh_from_db()
+        agendamento.status = 'cancelado'
+        agendamento.save()
+        self.assertIn('Cancelado', self.renderizar())
+
+    def test_versao_do_modelo_invalida_todas_as_linhas(self):
+        self.assertEqual(self.renderizar().count('Dr(a). Profissional 1'), 2)
+        profissional = Profissional.objects.get()
+        profissional.nome = 'Dra. Nova'
+        with self.captureOnCommitCallbacks(execute=True):
+            profissional.save()
+        html = self.renderizar()
+        self.assertEqual(html.count('Dra. Nova'), 2)
+        self.assertNotIn('Dr(a). Profissional 1', html)
+
+
+class PaginacaoAgendaTests(TestCase):
+
+    def test_agenda_do_dia_em_paginas_por_cursor(self):
+        hoje = timezone.localdate()
+        paciente = criar_paciente(1)
+        for numero in range(1, 4):
+            profissional = criar_profissional(numero)
+            for minutos in range(0, 20 * 20, 20):
+                Agendamento.objects.create(
+                    paciente=paciente, profissional=profissional, duracao=20,
+                    data_hora=horario(hoje, 6) + timedelta(minutes=minutos),
+                )
+
+        primeira = self.client.get(reverse('core:agenda'))
+        self.assertEqual(len(primeira.context['agendamentos_hoje']), 50)
+        cursor = primeira.context['proximo_cursor']
+        self.assertContains(primeira, f'?cursor={cursor}')
+
+        segunda = self.client.get(reverse('core:agenda'), {'cursor': cursor})
+        self.assertEqual(len(segunda.context['agendamentos_hoje']), 10)
+        self.assertEqual(segunda.context['proximo_cursor'], '')
+        self.assertNotContains(segunda, 'Mais agendamentos')
+        self.assertContains(segunda, 'Início do dia')
+        vistos = [a.pk for a in primeira.context['agendamentos_hoje']] + [a.pk for a in segunda.context['agendamentos_hoje']]
+        self.assertCountEqual(vistos, Agendamento.objects.values_list('pk', flat=True))
+
+
+class HistogramasTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def medicao(self, queries=2):
+        medicao = instrumentation.Medicao()
+        medicao.queries = queries
+        return medicao
+
+    def test_registrar_nao_acessa_o_cache(self):
+        agregador = instrumentation.AgregadorHistogramas(intervalo=3600)
+        with mock.patch.object(instrumentation, 'cache') as cache_falso:
+            for _ in range(3):
+                agregador.registrar('core:agenda', self.medicao(), 12.0)
+        self.assertEqual(cache_falso.mock_calls, [])
+
+    def test_processos_somam_contadores_e_rotas(self):
+        # Dois agregadores fazem o papel de dois processos com o mesmo cache.
+        primeiro = instrumentation.AgregadorHistogramas(intervalo=3600)
+        segundo = instrumentation.AgregadorHistogramas(intervalo=3600)
+        primeiro.registrar('core:agenda', self.medicao(), 12.0)
+        segundo.registrar('core:pacientes', self.medicao(), 30.0)
+        segundo.registrar('core:agenda', self.medicao(queries=4), 700.0)
+        primeiro.descarregar()
+        segundo.descarregar()
+
+        self.assertEqual(instrumentation.rotas_registradas(), ['core:agenda', 'core:pacientes'])
+        resumo = instrumentation.resumo_histogramas()
+        self.assertEqual(resumo['core:agenda']['requisicoes'], 2)
+        self.assertEqual(resumo['core:agenda']['queries_media'], 3)
+        self.assertEqual(resumo['core:agenda']['tempo_medio_ms'], 356.0)
+        self.assertEqual(resumo['core:agenda']['histograma']['<= 25 ms'], 1)
+        self.assertEqual(resumo['core:agenda']['histograma']['<= 1000 ms'], 1)
+        self.assertEqual(resumo['core:pacientes']['requisicoes'], 1)
+
+
+class PaineisTests(TransactionTestCase):
+
+    def test_paineis_medidos_a_parte_e_somados(self):
+        criar_agenda_do_dia(timezone.localdate())
+        cache.clear()
+        registrar_query = instrumentation.Medicao.registrar_query
+        threads_por_medicao = {}
+
+        medicoes = []  # mantém as medições vivas: o id de uma liberada seria reaproveitado
+
+        def registrar(medicao, sql, duracao):
+            if id(medicao) not in threads_por_medicao:
+                medicoes.append(medicao)
+            threads_por_medicao.setdefault(id(medicao), set()).add(threading.get_ident())
+            registrar_query(medicao, sql, duracao)
+
+        medicao, token = instrumentation.iniciar_medicao()
+        try:
+            with mock.patch.object(instrumentation.Medicao, 'registrar_query', registrar):
+                resultados = asyncio.run(calcular_paineis(limite=10))
+        finally:
+            instrumentation.encerrar_medicao(token)
+
+        self.assertFalse(any(resultado.atrasado for resultado in resultados))
+        # Nenhuma thread do pool escreve na medição da requisição...
+        self.assertNotIn(id(medicao), threads_por_medicao)
+        # ...e cada medição de painel é escrita por uma única thread.
+        self.assertTrue(all(len(threads) == 1 for threads in threads_por_medicao.values()))
+        self.assertEqual(medicao.queries, len(resultados))
+        self.assertEqual(len(medicao.top_queries), 5)
+
+
+class IntervalosDatasTests(TestCase):
+    # Horário de verão em São Paulo: começou à 00h de 04/11/2018 (a meia-noite
+    # não existiu) e terminou à 00h de 17/02/2019 (23h de 16/02 repetida).
+    SAO_PAULO = ZoneInfo('America/Sao_Paulo')
+
+    def utc(self, *args):
+        return datetime(*args, tzinfo=ZoneInfo('UTC'))
+
+    def duracao(self, intervalo):
+        # Com o mesmo tzinfo, a subtração ignoraria a mudança de deslocamento.
+        inicio, fim = (momento.astimezone(ZoneInfo('UTC')) for momento in intervalo)
+        return fim - inicio
+
+    def test_dia_do_inicio_do_horario_de_verao_tem_23_horas(self):
+        intervalo = intervalo_dias(date(2018, 11, 4), tz=self.SAO_PAULO)
+        self.assertEqual(intervalo, (self.utc(2018, 11, 4, 3), self.utc(2018, 11, 5, 2)))
+        self.assertEqual(self.duracao(intervalo), timedelta(hours=23))
+
+    def test_dia_do_fim_do_horario_de_verao_tem_25_horas(self):
+        intervalo = intervalo_dias(date(2019, 2, 16), tz=self.SAO_PAULO)
+        self.assertEqual(intervalo, (self.utc(2019, 2, 16, 2), self.utc(2019, 2, 17, 3)))
+        self.assertEqual(self.duracao(intervalo), timedelta(hours=25))
+
+    def test_intervalo_de_varios_dias_atravessando_a_transicao(self):
+        intervalo = intervalo_dias(date(2018, 11, 3), date(2018, 11, 5), tz=self.SAO_PAULO)
+        self.assertEqual(self.duracao(intervalo), timedelta(days=3, hours=-1))
+
+    def test_virada_de_mes_e_de_ano(self):
+        self.assertEqual(
+            intervalo_mes(date(2018, 12, 31), tz=self.SAO_PAULO),
+            (self.utc(2018, 12, 1, 2), self.utc(2019, 1, 1, 2)),
+        )
+        self.assertEqual(
+            intervalo_dias(date(2018, 12, 31), tz=self.SAO_PAULO),
+            (self.utc(2018, 12, 31, 2), self.utc(2019, 1, 1, 2)),
+        )
+        # Novembro de 2018 começa em -03:00 e termina em -02:00.
+        intervalo = intervalo_mes(date(2018, 11, 15), tz=self.SAO_PAULO)
+        self.assertEqual(self.duracao(intervalo), timedelta(days=30, hours=-1))
+        self.assertEqual(intervalo_mes(date(2019, 2, 28), tz=self.SAO_PAULO)[1], self.utc(2019, 3, 1, 3))
+
+    def test_filtro_no_banco_respeita_a_hora_repetida(self):
+        profissional = criar_profissional()
+        paciente = criar_paciente(1)
+        horarios = [
+            datetime(2019, 2, 16, 23, 30, tzinfo=self.SAO_PAULO),  # ainda em -02:00
+            datetime(2019, 2, 16, 23, 30, fold=1, tzinfo=self.SAO_PAULO),  # a repetição, em -03:00
+            datetime(2019, 2, 17, 0, 0, tzinfo=self.SAO_PAULO),
+        ]
+        for data_hora in horarios:
+            Agendamento.objects.create(paciente=paciente, profissional=profissional, data_hora=data_hora, status='realizado')
+        with timezone.override(self.SAO_PAULO):
+            dia_16 = Agendamento.objects.filter(no_intervalo('data_hora', intervalo_dias(date(2019, 2, 16))))
+            dia_17 = Agendamento.objects.filter(no_intervalo('data_hora', intervalo_dias(date(2019, 2, 17))))
+            self.assertEqual(dia_16.count(), 2)
+            self.assertEqual(dia_17.count(), 1)
+
+
+class AniversariantesTests(TestCase):
+    NASCIMENTOS = {
+        'bissexto': date(1980, 2, 29),
+        '28/02': date(1985, 2, 28),
+        '01/03': date(1985, 3, 1),
+        '31/12': date(1990, 12, 31),
+        '01/01': date(1991, 1, 1),
+        '15/06': date(1975, 6, 15),
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        for numero, (nome, nascimento) in enumerate(cls.NASCIMENTOS.items(), start=1):
+            criar_paciente(numero, nome=nome, data_nascimento=nascimento)
+
+    def nomes(self, queryset):
+        return set(queryset.values_list('nome', flat=True))
+
+    def test_29_de_fevereiro_no_dia(self):
+        pacientes = Paciente.objects.all()
+        # Ano não bissexto: comemora em 28/02.
+        self.assertEqual(self.nomes(aniversariantes_hoje(pacientes, date(2027, 2, 28))), {'bissexto', '28/02'})
+        self.assertEqual(self.nomes(aniversariantes_hoje(pacientes, date(2027, 3, 1))), {'01/03'})
+        self.assertEqual(self.nomes(aniversariantes_hoje(pacientes, date(2028, 2, 28))), {'28/02'})
+        self.assertEqual(self.nomes(aniversariantes_hoje(pacientes, date(2028, 2, 29))), {'bissexto'})
+
+    def test_semana_na_virada_do_ano(self):
+        semana = aniversariantes_semana(Paciente.objects.all(), date(2026, 12, 28))
+        self.assertEqual(self.nomes(semana), {'31/12', '01/01'})
+        self.assertEqual(list(semana.values_list('nome', flat=True)), ['01/01', '31/12'])
+
+    def test_29_de_fevereiro_na_semana_e_no_mes(self):
+        pacientes = Paciente.objects.all()
+        fevereiro_e_marco = {'bissexto', '28/02', '01/03'}
+        self.assertEqual(self.nomes(aniversariantes_semana(pacientes, date(2027, 2, 24))), fevereiro_e_marco)
+        self.assertEqual(self.nomes(aniversariantes_semana(pacientes, date(2028, 2, 25))), fevereiro_e_marco)
+        self.assertEqual(self.nomes(aniversariantes_semana(pacientes, date(2028, 2, 29))), {'bissexto', '01/03'})
+        for hoje in (date(2027, 2, 10), date(2028, 2, 10)):
+            with self.subTest(hoje=hoje):
+                self.assertEqual(self.nomes(aniversariantes_mes(pacientes, hoje)), {'bissexto', '28/02'})
+        self.assertEqual(self.nomes(aniversariantes_mes(pacientes, date(2027, 3, 5))), {'01/03'})
+
+
+class BuscaPacientesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.jose = criar_paciente(
+            1, nome='José Antônio da Silva', cpf='123.456.789-09', telefone='(11) 98765-4321'
+        )
+        cls.maria = criar_paciente(2, nome='Maria Souza', cpf='987.654.321-00', telefone='(21) 3333-4444')
+
+    def buscar(self, termo):
+        return set(buscar_pacientes(Paciente.objects.all(), termo))
+
+    def test_normalizar_texto(self):
+        self.assertEqual(normalizar_texto('  José da CONCEIÇÃO-Ávila '), 'jose da conceicao avila')
+        self.assertEqual(normalizar_texto('Müller, Çaçá'), 'muller caca')
+        self.assertEqual(normalizar_texto(None), '')
+
+    def test_prefixo_do_nome(self):
+        self.assertEqual(self.buscar('jos'), {self.jose})
+        self.assertEqual(self.buscar('JOSÉ ANT'), {self.jose})
+        self.assertEqual(self.buscar('mar'), {self.maria})
+        # Prefixo, não substring.
+        self.assertEqual(self.buscar('aria'), set())
+
+    def test_digitos_do_cpf_e_do_telefone(self):
+        self.assertEqual(self.buscar('123.456'), {self.jose})
+        self.assertEqual(self.buscar('98765432'), {self.maria})
+        self.assertEqual(self.buscar('(11) 9876'), {self.jose})
+        self.assertEqual(self.buscar('213333'), {self.maria})
+        self.assertEqual(self.buscar('12'), set())  # curto demais
+
+    @unittest.skipUnless(fts5_disponivel(), 'SQLite sem FTS5')
+    def test_indice_fts5_acompanha_save_e_delete(self):
+        def buscar_fts(termo):
+            return set(BuscaFTS5().filtrar(Paciente.objects.all(), termo))
+
+        # Prefixo de qualquer palavra do nome.
+        self.assertEqual(buscar_fts('silv'), {self.jose})
+        self.jose.nome = 'Pedro Lima'
+        self.jose.save()
+        self.assertEqual(buscar_fts('silv'), set())
+        self.assertEqual(buscar_fts('lim'), {self.jose})
+
+        pk = self.jose.pk
+        self.jose.delete()
+        # Direto no índice: o filtro por id esconderia uma entrada órfã.
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT rowid FROM {TABELA_FTS} WHERE {TABELA_FTS} MATCH %s', ['"lima"*'])
+            self.assertNotIn((pk,), cursor.fetchall())
+
+
+class ArquivosEstaticosTests(SimpleTestCase):
+    HASH = 'css/app.0123456789ab.css'
+
+    def setUp(self):
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        self.raiz = Path(pasta.name) / 'static'
+        (self.raiz / 'css').mkdir(parents=True)
+        (self.raiz.parent / 'segredo.txt').write_text('senha')
+        for nome in (self.HASH, 'css/app.css'):
+            (self.raiz / nome).write_text('body{color:red}')
+        (self.raiz / f'{self.HASH}.gz').write_bytes(b'gzip')
+        (self.raiz / f'{self.HASH}.br').write_bytes(b'brotli')
+        with override_settings(PULSE_SERVIR_ESTATICOS=True, STATIC_ROOT=str(self.raiz), STATIC_URL='/static/'):
+            self.middleware = ArquivosEstaticosMiddleware(lambda request: HttpResponseNotFound())
+
+    def get(self, caminho, **headers):
+        response = self.middleware(RequestFactory().get(f'/static/{caminho}', **headers))
+        if hasattr(response, 'streaming_content'):
+            response.conteudo = b''.join(response.streaming_content)
+            response.close()
+        return response
+
+    def test_caminho_fora_da_raiz_e_404(self):
+        for caminho in ('../segredo.txt', 'css/../../segredo.txt', '%2e%2e/segredo.txt'):
+            with self.subTest(caminho):
+                self.assertEqual(self.get(caminho).status_code, 404)
+
+    def test_versao_comprimida_conforme_accept_encoding(self):
+        for aceitas, codificacao, conteudo in [
+            ('gzip, deflate, br', 'br', b'brotli'),
+            ('gzip', 'gzip', b'gzip'),
+            ('', None, b'body{color:red}'),
+        ]:
+            with self.subTest(aceitas):
+                response = self.get(self.HASH, HTTP_ACCEPT_ENCODING=aceitas)
+                self.assertEqual(response.get('Content-Encoding'), codificacao)
+                self.assertEqual(response.conteudo, conteudo)
+                self.assertEqual(response['Content-Type'], 'text/css')
+                self.assertIn('Accept-Encoding', response['Vary'])
+        # As variantes não são servidas diretamente.
+        self.assertEqual(self.get(f'{self.HASH}.gz').status_code, 404)
+
+    def test_cache_imutavel_so_com_hash_no_nome(self):
+        self.assertEqual(self.get(self.HASH)['Cache-Control'], CACHE_IMUTAVEL)
+        self.assertEqual(self.get('css/app.css')['Cache-Control'], CACHE_SEM_HASH)
+
+    def test_minificacao_preserva_strings_e_url(self):
+        css = (
+            '/* cabeçalho */\n.a  >  .b {\n  content: "x  /* não é comentário */  y";\n'
+            '  background: url("img/fundo claro.png") , url(img/a.png);\n}\n'
+        )
+        self.assertEqual(
+            minificar_css(css),
+            '.a>.b{content: "x  /* não é comentário */  y";background: url("img/fundo claro.png"),url(img/a.png)}',
+        )
+        js = '// comentário\nfunction f() {\n    return "http://x  y"; // fim\n}\n\n'
+        self.assertEqual(minificar_js(js), 'function f() {\nreturn "http://x  y"; // fim\n}')
+
+
+class ContagemEstimadaTests(TestCase):
+
+    def test_indices_parciais_nao_reduzem_a_estimativa(self):
+        profissional = criar_profissional()
+        dia = timezone.localdate()
+        for numero in range(1, 31):
+            # 2/3 ficam fora do índice parcial de ativos e da unicidade parcial
+            status = 'agendado' if numero % 3 == 0 else 'realizado'
+            paciente = criar_paciente(numero, ativo=numero % 2 == 0)
+            agendamento = Agendamento.objects.create(
+                paciente=paciente, profissional=profissional,
+                data_hora=horario(dia, 7) + timedelta(minutes=30 * numero), status=status,
+            )
+            Consulta.objects.create(
+                agendamento=agendamento, sintomas='-', diagnostico='-', tratamento='-',
+                valor=Decimal('100'), pago=numero % 4 == 0,
+            )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        for modelo in (Paciente, Agendamento, Consulta):
+            with self.subTest(modelo=modelo.__name__):
+                self.assertEqual(contagem_estimada(modelo), 30)
+
+
+class ReservaHorarioTests(TestCase):
+
+    def setUp(self):
+        self.profissional = criar_profissional()
+        self.paciente = criar_paciente(1)
+        self.inicio = horario(timezone.localdate() + timedelta(days=1), 9)
+
+    def test_sobreposicao_parcial_e_recusada(self):
+        reservar_horario(self.paciente, self.profissional, self.inicio, duracao=30)
+        with self.assertRaises(HorarioIndisponivel):
+            reservar_horario(self.paciente, self.profissional, self.inicio + timedelta(minutes=15), duracao=30)
+        reservar_horario(self.paciente, self.profissional, self.inicio + timedelta(minutes=30), duracao=30)
+
+    def test_cancelado_libera_o_horario(self):
+        agendamento = reservar_horario(self.paciente, self.profissional, self.inicio, duracao=30)
+        agendamento.status = 'cancelado'
+        agendamento.save()
+        reservar_horario(self.paciente, self.profissional, self.inicio + timedelta(minutes=10), duracao=30)
+
+    def test_formulario_recusa_sobreposicao(self):
+        reservar_horario(self.paciente, self.profissional, self.inicio, duracao=60)
+        form = AgendamentoForm(data={
+            'paciente': self.paciente.pk, 'profissional': self.profissional.pk,
+            'data_hora': timezone.localtime(self.inicio + timedelta(minutes=30)).strftime('%Y-%m-%dT%H:%M'),
+            'duracao': 30, 'status': 'agendado',
+        })
+        self.assertFalse(form.is_valid())
+        self.assertIn('Horário já ocupado por outro agendamento.', form.non_field_errors())
+
+    def test_editar_sem_mudar_o_horario_nao_conflita_consigo_mesmo(self):
+        agendamento = reservar_horario(self.paciente, self.profissional, self.inicio, duracao=30)
+        form = AgendamentoForm(instance=agendamento, data={
+            'paciente': self.paciente.pk, 'profissional': self.profissional.pk,
+            'data_hora': timezone.localtime(self.inicio).strftime('%Y-%m-%dT%H:%M'),
+            'duracao': 30, 'status': 'confirmado',
+        })
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        self.assertEqual(Agendamento.objects.get().status, 'confirmado')
+
+
+    def test_importacao_recusa_sobreposicao(self):
+        reservar_horario(self.paciente, self.profissional, self.inicio, duracao=30)
+        local = timezone.localtime(self.inicio)
+        arquivo = io.StringIO(
+            'paciente_cpf,profissional_crm,data_hora,duracao\n'
+            f'{self.paciente.cpf},{self.profissional.crm},{(local + timedelta(minutes=15)).isoformat()},30\n'
+            f'{self.paciente.cpf},{self.profissional.crm},{(local + timedelta(hours=1)).isoformat()},30\n'
+            f'{self.paciente.cpf},{self.profissional.crm},{(local + timedelta(hours=1, minutes=20)).isoformat()},30\n'
+        )
+        resultado = ImportadorAgendamentos().importar(arquivo)
+        self.assertEqual(resultado.importadas, 1)
+        self.assertEqual([linha for linha, _ in resultado.erros], [2, 4])
+        self.assertEqual(Agendamento.objects.count(), 2)
+
+
+class ImportacaoTests(TestCase):
+
+    def test_lote_recusado_pelo_banco_e_refeito_linha_a_linha(self):
+        existente = criar_paciente(2)
+        arquivo = io.StringIO(
+            'nome,cpf,data_nascimento,sexo,telefone\n'
+            'Ana,111.444.777-35,1980-01-01,F,(11) 90000-0001\n'
+            f'Outro paciente,{existente.cpf},1980-01-01,M,(11) 90000-0002\n'
+            'Bia,529.982.247-25,1980-01-01,F,(11) 90000-0003\n'
+        )
+        # Simula o CPF gravado por outro processo depois da checagem de duplicatas.
+        with mock.patch.object(ImportadorPacientes, 'chaves_existentes', return_value=set()):
+            resultado = ImportadorPacientes().importar(arquivo)
+        self.assertEqual(resultado.importadas, 2)
+        self.assertEqual(resultado.erros, [(3, 'Recusado pelo banco: UNIQUE constraint failed: core_paciente.cpf')])
+        self.assertEqual(Paciente.objects.count(), 3)
+
+
+class ReservaConcorrenteTests(TransactionTestCase):
+
+    def test_reservas_simultaneas_do_mesmo_horario(self):
+        profissional = criar_profissional()
+        paciente = criar_paciente(1)
+        inicio = horario(timezone.localdate() + timedelta(days=1), 9)
+        threads_total = 8
+        barreira = threading.Barrier(threads_total)
+        reservados, recusados, falhas = [], [], []
+
+        def reservar(deslocamento):
+            try:
+                barreira.wait()
+                # Horários diferentes, mas todos sobrepostos ao primeiro.
+                reservados.append(reservar_horario(
+                    paciente, profissional, inicio + timedelta(minutes=deslocamento), duracao=30
+                ))
+            except HorarioIndisponivel:
+                recusados.append(deslocamento)
+            except Exception as erro:
+                falhas.append(erro)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=reservar, args=(i * 2,)) for i in range(threads_total)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(falhas, [])
+        self.assertEqual(len(reservados), 1)
+        self.assertEqual(len(recusados), threads_total - 1)
+        self.assertEqual(Agendamento.objects.count(), 1)
+
+
+class BackendSQLiteTests(TransactionTestCase):
+
+    def pragma(self, conexao, nome):
+        with conexao.cursor() as cursor:
+            cursor.execute(f'PRAGMA {nome}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_em_conexao_nova(self):
+        connection.close()
+        self.assertEqual(self.pragma(connection, 'journal_mode'), 'wal')
+        busy_timeout = connection.settings_dict['OPTIONS']['pragmas']['busy_timeout']
+        self.assertEqual(self.pragma(connection, 'busy_timeout'), busy_timeout)
+
+    def test_pragmas_ajustaveis_em_options(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            conexao = SQLitePulse({
+                **connection.settings_dict,
+                'NAME': f'{pasta}/ajustado.sqlite3',
+                'OPTIONS': {'pragmas': {'busy_timeout': 1234, 'journal_mode': None}},
+            }, alias='ajustado')
+            try:
+                self.assertEqual(self.pragma(conexao, 'busy_timeout'), 1234)
+                self.assertEqual(self.pragma(conexao, 'journal_mode'), 'delete')
+            finally:
+                conexao.close()
+
+    def test_transaction_mode_invalido(self):
+        with self.assertRaises(ImproperlyConfigured):
+            SQLitePulse({**connection.settings_dict, 'OPTIONS': {'transaction_mode': 'LAZY'}})
+
+    def test_atomic_abre_com_begin_immediate(self):
+        # _start_transaction_under_autocommit é um gancho privado do Django:
+        # se uma atualização deixar de chamá-lo, o BEGIN volta a ser DEFERRED.
+        with CaptureQueriesContext(connection) as capturadas:
+            with transaction.atomic():
+                Paciente.objects.exists()
+        self.assertEqual(capturadas[0]['sql'], 'BEGIN IMMEDIATE')
+
+
+class ResumosConcorrentesTests(TransactionTestCase):
+
+    def test_consulta_gravada_durante_a_reconstrucao(self):
+        criar_agenda_do_dia(timezone.localdate())  # duas consultas de R$ 150
+        agendamento = Agendamento.objects.filter(consulta__isnull=True).first()
+        agregado = threading.Event()
+        iterar = QuerySet.iterator
+        falhas = []
+
+        def iterar_com_pausa(queryset, *args, **kwargs):
+            linhas = list(iterar(queryset, *args, **kwargs))
+            # Entre a agregação das consultas e a troca dos resumos.
+            if queryset.model is Consulta and not agregado.is_set():
+                agregado.set()
+                time.sleep(0.5)
+            return iter(linhas)
+
+        def gravar_consulta():
+            try:
+                agregado.wait()
+                Consulta.objects.create(
+                    agendamento=agendamento, sintomas='-', diagnostico='-', tratamento='-',
+                    valor=Decimal('200'), pago=True,
+                )
+            except Exception as erro:
+                falhas.append(erro)
+            finally:
+                connections.close_all()
+
+        thread = threading.Thread(target=gravar_consulta)
+        thread.start()
+        with mock.patch.object(QuerySet, 'iterator', iterar_com_pausa):
+            reconstruir_resumos()
+        thread.join()
+
+        self.assertEqual(falhas, [])
+        resumo = ResumoFinanceiroMensal.objects.get()
+        self.assertEqual((resumo.consultas, resumo.valor_total), (3, Decimal('500')))
+
+
+REPLICA = 'replica_teste'
+
+
+@usar_replica
+def nomes_dos_pacientes(request):
+    return JsonResponse({'nomes': sorted(Paciente.objects.values_list('nome', flat=True))})
+
+
+@usar_replica
+def nomes_antes_e_depois_de_gravar(request):
+    antes = sorted(Paciente.objects.values_list('nome', flat=True))
+    criar_paciente(3, nome='Paciente novo')
+    depois = sorted(Paciente.objects.values_list('nome', flat=True))
+    return JsonResponse({'antes': antes, 'depois': depois})
+
+
+@override_settings(PULSE_REPLICAS=[REPLICA])
+class RoteadorReplicasTests(TransactionTestCase):
+    """Primário e réplica como dois SQLite com dados diferentes"""
+
+    @classmethod
+    def setUpClass(cls):
+        # A réplica não está em DATABASES: é registrada (e migrada) só aqui,
+        # depois que o test runner já preparou os bancos declarados.
+        cls.pasta = tempfile.TemporaryDirectory()
+        connections.settings[REPLICA] = connections.configure_settings({
+            **connections.settings,
+            REPLICA: {'ENGINE': 'core.backends.sqlite3', 'NAME': f'{cls.pasta.name}/replica.sqlite3'},
+        })[REPLICA]
+        call_command('migrate', database=REPLICA, verbosity=0)
+        cls.databases = {'default', REPLICA}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.settings[REPLICA]
+        cls.pasta.cleanup()
+
+    def setUp(self):
+        criar_paciente(1, nome='Paciente do primário')
+        criar_paciente(2, using=REPLICA, nome='Paciente da réplica')
+
+    def requisitar(self, view, metodo='get', cookies=None):
+        """Passa pelo middleware como o handler do Django, com ``process_view``"""
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware = RoteamentoBancoMiddleware(get_response)
+        request = getattr(RequestFactory(), metodo)('/')
+        request.COOKIES.update(cookies or {})
+        response = middleware(request)
+        response.dados = json.loads(response.content)
+        return response
+
+    def test_get_em_view_marcada_le_da_replica(self):
+        response = self.requisitar(nomes_dos_pacientes)
+        self.assertEqual(response.dados['nomes'], ['Paciente da réplica'])
+        self.assertNotIn(RoteamentoBancoMiddleware.COOKIE, response.cookies)
+
+    def test_post_le_do_primario(self):
+        response = self.requisitar(nomes_dos_pacientes, metodo='post')
+        self.assertEqual(response.dados['nomes'], ['Paciente do primário'])
+
+    def test_escrita_fixa_o_resto_da_requisicao_no_primario(self):
+        response = self.requisitar(nomes_antes_e_depois_de_gravar)
+        self.assertEqual(response.dados['antes'], ['Paciente da réplica'])
+        self.assertEqual(response.dados['depois'], ['Paciente do primário', 'Paciente novo'])
+        self.assertFalse(Paciente.objects.using(REPLICA).filter(nome='Paciente novo').exists())
+
+    def test_cookie_mantem_a_proxima_requisicao_no_primario(self):
+        escrita = self.requisitar(nomes_antes_e_depois_de_gravar)
+        cookie = escrita.cookies[RoteamentoBancoMiddleware.COOKIE]
+        self.assertEqual(cookie['max-age'], 5)
+
+        seguinte = self.requisitar(nomes_dos_pacientes, cookies={cookie.key: cookie.value})
+        self.assertEqual(seguinte.dados['nomes'], ['Paciente do primário', 'Paciente novo'])
+        # Sem o cookie (expirado), volta à réplica.
+        self.assertEqual(self.requisitar(nomes_dos_pacientes).dados['nomes'], ['Paciente da réplica'])
@@ -1,13 +1,28 @@
 from django.urls import path
-from . import views
+from . import views, api
 
 app_name = 'core'
 
 urlpatterns = [
     path('', views.dashboard, name='home'),
     path('dashboard/', views.dashboard, name='dashboard'),
+    path('dashboard/assincrono/', views.dashboard_assincrono, name='dashboard_assincrono'),
     path('agenda/', views.agenda, name='agenda'),
     path('pacientes/', views.pacientes, name='pacientes'),
     path('financeiro/', views.financeiro, name='financeiro'),
     path('financeiro-novo/', views.financeiro_novo, name='financeiro_novo'),
+    path('metricas/cache/', views.metricas_cache_view, name='metricas_cache'),
+    path('metricas/desempenho/', views.metricas_desempenho_view, name='metricas_desempenho'),
+    path('eventos/agenda/', views.eventos_agenda, name='eventos_agenda'),
+    path('exportar/pacientes.csv', views.exportar_pacientes_csv, name='exportar_pacientes'),
+    path('exportar/agendamentos.csv', views.exportar_agendamentos_csv, name='exportar_agendamentos'),
+    path('relatorios/consultas/', views.relatorio_consultas, name='relatorio_consultas'),
+    path('tarefas/<int:tarefa_id>/', views.tarefa_status, name='tarefa'),
+    path('tarefas/<int:tarefa_id>/arquivo/', views.tarefa_arquivo, name='tarefa_arquivo'),
+    
+    # API JSON somente leitura
+    path('api/dashboard/', api.dashboard, name='api_dashboard'),
+    path('api/agenda/', api.agenda, name='api_agenda'),
+    path('api/pacientes/', api.pacientes, name='api_pacientes'),
+    path('api/profissionais/<int:profissional_id>/horarios/', api.horarios, name='api_horarios'),
 ]
\ No newline at end of file
@@ -1,119 +1,237 @@
-from django.shortcuts import render, redirect
-from django.http import HttpResponse
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, redirect, get_object_or_404
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.core.handlers.asgi import ASGIRequest
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import router
 from django.db.models import Count, Sum, Q
 from django.utils import timezone
-from datetime import date, timedelta
-from .models import Paciente, Agendamento, Consulta, Profissional, Servico
+from datetime import date, datetime, timedelta
+from pathlib import Path
+import json
+import time
+from .models import Paciente, Agendamento, Consulta, Profissional, Servico, Tarefa
+from .search import buscar_pacientes
+from .pagination import KeysetPaginator
+from .birthdays import aniversariantes_hoje
+from .dateranges import intervalo_dias
+from .query_budget import orcamento_queries
+from .caching import estatisticas_dashboard, contadores_pacientes, metricas_cache
+from .instrumentation import resumo_histogramas
+from .events import obter_broker, CANAL_AGENDA
+from .csvio import exportar_pacientes, exportar_agendamentos, resposta_csv
+from .finance import painel_financeiro
+from .reports import consultas_do_periodo, resposta_relatorio, EXPORTADORES
+from .tasks import enfileirar
+from .panels import calcular_paineis
+from .routers import usar_replica
 
+POR_PAGINA = 50
+HEARTBEAT_SEGUNDOS = 15
+# O Django 4.2 não detecta desconexões durante o streaming; o stream é
+# encerrado periodicamente e o EventSource reconecta sozinho.
+DURACAO_MAXIMA_STREAM = 300
+
+@usar_replica
+@orcamento_queries(5)
 def dashboard(request):
     """Dashboard principal com estatísticas"""
-    hoje = timezone.now().date()
-    mes_atual = hoje.replace(day=1)
-    
-    # Agendamentos de hoje
-    agendamentos_hoje_lista = Agendamento.objects.filter(
-        data_hora__date=hoje,
-        status__in=['agendado', 'confirmado']
-    ).select_related('paciente').order_by('data_hora')
-    
-    # Aniversariantes de hoje
-    aniversariantes_hoje_lista = Paciente.objects.filter(
-        ativo=True,
-        data_nascimento__month=hoje.month,
-        data_nascimento__day=hoje.day
-    )
+    hoje = timezone.localdate()
+    stats = estatisticas_dashboard(hoje)
     
-    # Contadores para agendamentos
-    agendamentos_confirmados = Agendamento.objects.filter(
-        data_hora__date=hoje,
-        status='confirmado'
-    ).count()
+    # Listas do sidebar (os contadores vêm do cache de KPIs)
+    agendamentos_hoje_lista = Agendamento.objects.do_dia(hoje).ativos().para_lista(
+    ).order_by('data_hora')[:10]  # Limita a 10 para o sidebar
     
-    # Consultas pagas no mês
-    consultas_pagas = Consulta.objects.filter(
-        criado_em__date__gte=mes_atual,
-        pago=True
-    ).count()
+    aniversariantes_lista = aniversariantes_hoje(
+        Paciente.objects.ativos().para_lista(), hoje
+    )[:5]  # Limita a 5
     
-    # Pacientes novos no mês
-    pacientes_novos_mes = Paciente.objects.filter(
-        ativo=True,
-        criado_em__date__gte=mes_atual
-    ).count()
-    
-    context = {
-        'total_pacientes': Paciente.objects.filter(ativo=True).count(),
-        'agendamentos_hoje': agendamentos_hoje_lista.count(),
-        'agendamentos_hoje_lista': agendamentos_hoje_lista[:10],  # Limita a 10 para o sidebar
-        'agendamentos_confirmados': agendamentos_confirmados,
-        'aniversariantes_hoje': aniversariantes_hoje_lista.count(),
-        'aniversariantes_lista': aniversariantes_hoje_lista[:5],  # Limita a 5
-        'consultas_mes': Consulta.objects.filter(
-            criado_em__date__gte=mes_atual
-        ).count(),
-        'consultas_pagas': consultas_pagas,
-        'pacientes_novos_mes': pacientes_novos_mes,
-        'faturamento_mes': Consulta.objects.filter(
-            criado_em__date__gte=mes_atual,
-            pago=True
-        ).aggregate(total=Sum('valor'))['total'] or 0,
-        'proximos_agendamentos': Agendamento.objects.filter(
-            data_hora__gte=timezone.now(),
-            status__in=['agendado', 'confirmado']
-        ).order_by('data_hora')[:5],
-        'pacientes_recentes': Paciente.objects.filter(
-            ativo=True
-        ).order_by('-criado_em')[:5]
-    }
+    context = stats.as_context()
+    context.update({
+        'agendamentos_hoje_lista': agendamentos_hoje_lista,
+        'aniversariantes_lista': aniversariantes_lista,
+    })
     return render(request, 'core/consultorio_dashboard.html', context)
 
+@usar_replica
+async def dashboard_assincrono(request):
+    """Dashboard com os painéis calculados em paralelo e tempo limite por painel"""
+    resultados = await calcular_paineis()
+    context = {'paineis_atrasados': [r.nome for r in resultados if r.atrasado]}
+    for resultado in resultados:
+        context.update(resultado.contexto)
+    # Renderização fora do loop: os context processors acessam sessão e usuário.
+    response = await sync_to_async(render)(request, 'core/consultorio_dashboard.html', context)
+    response['Server-Timing'] = ', '.join(f'painel-{r.nome};dur={r.duracao_ms:.1f}' for r in resultados)
+    return response
+
+@usar_replica
+@orcamento_queries(2)
 def agenda(request):
     """Página de agenda com agendamentos"""
-    hoje = timezone.now().date()
-    agendamentos_hoje = Agendamento.objects.filter(
-        data_hora__date=hoje
-    ).order_by('data_hora')
+    hoje = timezone.localdate()
+    inicio_hoje, fim_hoje = intervalo_dias(hoje)
+    agendamentos_hoje = KeysetPaginator(
+        Agendamento.objects.para_lista().filter(data_hora__gte=inicio_hoje, data_hora__lt=fim_hoje),
+        campos=('data_hora', 'id'),
+        tamanho=POR_PAGINA
+    ).pagina(request.GET.get('cursor'))
     
-    proximos_agendamentos = Agendamento.objects.filter(
-        data_hora__date__gt=hoje,
-        status__in=['agendado', 'confirmado']
+    proximos_agendamentos = Agendamento.objects.ativos().para_lista().filter(
+        data_hora__gte=fim_hoje
     ).order_by('data_hora')[:10]
     
     context = {
         'agendamentos_hoje': agendamentos_hoje,
+        'proximo_cursor': agendamentos_hoje.proximo_cursor,
         'proximos_agendamentos': proximos_agendamentos,
         'data_hoje': hoje,
     }
     return render(request, 'core/consultorio_agenda.html', context)
 
+@orcamento_queries(3)
 def pacientes(request):
     """Página de gestão de pacientes"""
     busca = request.GET.get('busca', '')
     
-    pacientes_query = Paciente.objects.filter(ativo=True)
+    pacientes_query = Paciente.objects.ativos().para_lista()
     
     if busca:
-        pacientes_query = pacientes_query.filter(
-            Q(nome__icontains=busca) |
-            Q(cpf__icontains=busca) |
-            Q(telefone__icontains=busca)
-        )
+        pacientes_query = buscar_pacientes(pacientes_query, busca)
+    
+    pagina = KeysetPaginator(
+        pacientes_query,
+        campos=('nome', 'id'),
+        tamanho=POR_PAGINA
+    ).pagina(request.GET.get('cursor'))
     
     context = {
-        'pacientes': pacientes_query.order_by('nome')[:50],  # Limita a 50 para performance
-        'total_pacientes': Paciente.objects.filter(ativo=True).count(),
-        'pacientes_novos_mes': Paciente.objects.filter(
-            ativo=True,
-            criado_em__date__gte=date.today().replace(day=1)
-        ).count(),
+        'pacientes': pagina,
+        'proximo_cursor': pagina.proximo_cursor,
         'busca': busca,
+        'data_hoje': timezone.localdate(),
     }
+    context.update(contadores_pacientes())
     return render(request, 'core/consultorio_pacientes.html', context)
 
+@usar_replica
+@orcamento_queries(2)
 def financeiro(request):
-    """Página de controle financeiro nova e funcional"""
-    return render(request, 'core/financeiro_novo.html')
+    """Financeiro do mês (``?mes=AAAA-MM``) a partir dos resumos materializados"""
+    try:
+        mes = datetime.strptime(request.GET.get('mes', ''), '%Y-%m').date()
+    except ValueError:
+        mes = None
+    return render(request, 'core/financeiro_novo.html', painel_financeiro(mes))
 
 def financeiro_novo(request):
-    """Página de controle financeiro nova e funcional"""
-    return render(request, 'core/financeiro_teste.html')
\ No newline at end of file
+    """Endereço antigo da página do financeiro"""
+    return redirect('core:financeiro')
+
+@staff_member_required
+def metricas_cache_view(request):
+    """Hits/misses do cache de KPIs (somente equipe)"""
+    return JsonResponse(metricas_cache())
+
+@staff_member_required
+def metricas_desempenho_view(request):
+    """Histogramas de tempo e médias de queries por rota (somente equipe)"""
+    return JsonResponse(resumo_histogramas())
+
+@usar_replica
+@staff_member_required
+def exportar_pacientes_csv(request):
+    """Exporta os pacientes em CSV (streaming, mesmas colunas da importação)"""
+    # O streaming roda depois do middleware: o banco de leitura fica no queryset.
+    pacientes = Paciente.objects.using(router.db_for_read(Paciente))
+    return resposta_csv(exportar_pacientes(pacientes), 'pacientes.csv')
+
+@usar_replica
+@staff_member_required
+def exportar_agendamentos_csv(request):
+    """Exporta os agendamentos em CSV (streaming, mesmas colunas da importação)"""
+    agendamentos = Agendamento.objects.using(router.db_for_read(Agendamento))
+    return resposta_csv(exportar_agendamentos(agendamentos), 'agendamentos.csv')
+
+@usar_replica
+@staff_member_required
+def relatorio_consultas(request):
+    """Consultas do período (``?inicio=&fim=AAAA-MM-DD&formato=csv|xlsx``) por streaming"""
+    hoje = timezone.localdate()
+    try:
+        inicio = date.fromisoformat(request.GET.get('inicio') or hoje.replace(day=1).isoformat())
+        fim = date.fromisoformat(request.GET.get('fim') or hoje.isoformat())
+    except ValueError:
+        return HttpResponseBadRequest('Datas inválidas (use AAAA-MM-DD).')
+    formato = request.GET.get('formato', 'csv')
+    if formato not in EXPORTADORES or fim < inicio:
+        return HttpResponseBadRequest('Use formato=csv ou xlsx e fim a partir de inicio.')
+    if request.GET.get('assincrono'):
+        tarefa = enfileirar('gerar_relatorio_consultas', inicio=inicio.isoformat(), fim=fim.isoformat(), formato=formato)
+        return JsonResponse({'tarefa': tarefa.pk, 'status_url': reverse('core:tarefa', args=[tarefa.pk])}, status=202)
+    consultas = consultas_do_periodo(inicio, fim).using(router.db_for_read(Consulta))
+    partes = EXPORTADORES[formato](consultas)
+    return resposta_relatorio(partes, formato, f'consultas_{inicio:%Y%m%d}_{fim:%Y%m%d}')
+
+@staff_member_required
+def tarefa_status(request, tarefa_id):
+    """Status e progresso de uma tarefa em segundo plano (somente equipe)"""
+    tarefa = get_object_or_404(Tarefa, pk=tarefa_id)
+    dados = {
+        'id': tarefa.pk,
+        'nome': tarefa.nome,
+        'status': tarefa.status,
+        'progresso': tarefa.progresso,
+        'mensagem': tarefa.mensagem,
+        'tentativas': tarefa.tentativas,
+        'resultado': tarefa.resultado,
+    }
+    if tarefa.status == 'concluida' and (tarefa.resultado or {}).get('arquivo'):
+        dados['arquivo_url'] = reverse('core:tarefa_arquivo', args=[tarefa.pk])
+    return JsonResponse(dados)
+
+@staff_member_required
+def tarefa_arquivo(request, tarefa_id):
+    """Baixa o arquivo gerado por uma tarefa concluída"""
+    tarefa = get_object_or_404(Tarefa, pk=tarefa_id, status='concluida')
+    relativo = (tarefa.resultado or {}).get('arquivo')
+    if not relativo:
+        raise Http404('A tarefa não gerou arquivo.')
+    caminho = Path(settings.MEDIA_ROOT) / relativo
+    if not caminho.is_file():
+        raise Http404('Arquivo não encontrado.')
+    return FileResponse(open(caminho, 'rb'), as_attachment=True, filename=caminho.name)
+
+async def eventos_agenda(request):
+    """Server-Sent Events com as alterações da agenda (requer servidor ASGI)"""
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(
+            'Eventos em tempo real exigem um servidor ASGI (pulse_project.asgi).',
+            status=501,
+            content_type='text/plain; charset=utf-8'
+        )
+    
+    broker = obter_broker()
+    assinatura = broker.assinar(CANAL_AGENDA)
+    
+    async def stream():
+        limite = time.monotonic() + DURACAO_MAXIMA_STREAM
+        try:
+            yield 'retry: 3000\n\n'
+            while time.monotonic() < limite:
+                dados = await assinatura.proxima(timeout=HEARTBEAT_SEGUNDOS)
+                if dados is None:
+                    yield ': ping\n\n'
+                    continue
+                tipo = json.loads(dados).get('tipo', 'message')
+                yield f'event: {tipo}\ndata: {dados}\n\n'
+        finally:
+            broker.cancelar(assinatura)
+    
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Desliga o buffer do nginx
+    return response
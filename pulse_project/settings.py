@@ -47,6 +47,8 @@
 ]
 
 MIDDLEWARE = [
+    'core.middleware.InstrumentacaoMiddleware',  # Primeiro: mede a requisição inteira
+    'core.middleware.RoteamentoBancoMiddleware',  # Antes da sessão: gravá-la conta como escrita
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -60,7 +62,7 @@
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.templating.DjangoTemplates',  # Mede o tempo de renderização
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -77,13 +79,30 @@
 WSGI_APPLICATION = 'pulse_project.wsgi.application'
 
 # Database
+# SQLite com WAL, busy_timeout e BEGIN IMMEDIATE (core/backends/sqlite3):
+# recepção e consultórios gravando ao mesmo tempo esperam pelo lock em vez
+# de receber "database is locked". Ver `manage.py benchmark_sqlite`.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            # Ajustes sobre core.backends.sqlite3.base.PRAGMAS_PADRAO
+            'pragmas': {'busy_timeout': 5000},
+        },
+        # Em arquivo, não em memória: o banco em memória compartilhado
+        # entre threads não tem WAL nem busy_timeout, e os testes de
+        # concorrência falhariam com "database table is locked".
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
+# Leituras das views @usar_replica vão para as réplicas listadas em
+# PULSE_REPLICAS (aliases de DATABASES); vazio = tudo no 'default'
+DATABASE_ROUTERS = ['core.routers.RoteadorReplicas']
+PULSE_REPLICAS = []
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -2,6 +2,8 @@
 Configurações específicas para produção
 Para usar: python manage.py runserver --settings=pulse_project.settings_production
 """
+import os
+
 from .settings import *
 
 # Modo de produção
@@ -36,9 +38,6 @@
     'default': {
         'BACKEND': 'django.core.cache.backends.redis.RedisCache',
         'LOCATION': 'redis://127.0.0.1:6379/1',
-        'OPTIONS': {
-            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
-        },
         'KEY_PREFIX': 'pulse_prod',
         'TIMEOUT': 300,
     }
@@ -108,27 +107,59 @@
     },
 }
 
-# Banco de dados para produção (PostgreSQL recomendado)
-# Descomente e configure se usar PostgreSQL
-"""
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'pulse_db',
-        'USER': 'pulse_user',
-        'PASSWORD': 'sua_senha_segura',
-        'HOST': 'localhost',
-        'PORT': '5432',
-        'OPTIONS': {
-            'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
-        },
-    }
+# Banco de dados para produção: PostgreSQL (requer o pacote psycopg ou psycopg2).
+# Conexões persistentes: cada thread (requisições, painéis do dashboard,
+# worker) reaproveita a sua por CONN_MAX_AGE segundos, e CONN_HEALTH_CHECKS
+# testa a conexão antes de reutilizá-la, então uma conexão derrubada pelo
+# servidor é reaberta em vez de virar erro. Com PgBouncer em modo
+# transaction na frente, defina PULSE_DB_PGBOUNCER=1: o pool fica com ele e
+# os cursores do lado do servidor (usados pelo .iterator()) são desligados.
+BANCO_PRINCIPAL = {
+    'ENGINE': 'django.db.backends.postgresql',
+    'NAME': os.environ.get('PULSE_DB_NOME', 'pulse_db'),
+    'USER': os.environ.get('PULSE_DB_USUARIO', 'pulse_user'),
+    'PASSWORD': os.environ.get('PULSE_DB_SENHA', 'sua_senha_segura'),
+    'HOST': os.environ.get('PULSE_DB_HOST', 'localhost'),
+    'PORT': os.environ.get('PULSE_DB_PORTA', '5432'),
+    'CONN_MAX_AGE': 60,
+    'CONN_HEALTH_CHECKS': True,
+    'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('PULSE_DB_PGBOUNCER') == '1',
+    'OPTIONS': {'connect_timeout': 5},
 }
-"""
+DATABASES = {'default': BANCO_PRINCIPAL}
+
+# Réplicas de leitura (core.routers): hosts separados por vírgula em
+# PULSE_DB_REPLICAS; dashboard, agenda, relatórios e exportações leem delas
+PULSE_REPLICAS = []
+for numero, host in enumerate(filter(None, os.environ.get('PULSE_DB_REPLICAS', '').split(',')), start=1):
+    DATABASES[f'replica{numero}'] = {**BANCO_PRINCIPAL, 'HOST': host.strip(), 'TEST': {'MIRROR': 'default'}}
+    PULSE_REPLICAS.append(f'replica{numero}')
+# Segundos em que o navegador lê do primário depois de uma escrita
+PULSE_REPLICA_ATRASO = 5
 
 # Configurações de arquivos estáticos para produção
 STATIC_ROOT = BASE_DIR / 'staticfiles'
-STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+# `collectstatic` monta os pacotes por página, acrescenta o hash do conteúdo
+# aos nomes e grava as versões .gz/.br (core.storage)
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'core.storage.ArmazenamentoEstatico'},
+}
+PULSE_PACOTES_ESTATICOS = True
+# Serve o STATIC_ROOT pelo próprio Django (cache imutável, versões
+# pré-comprimidas); desligue se um servidor web servir /static/
+PULSE_SERVIR_ESTATICOS = True
+
+# Templates compilados uma única vez por processo. O Django já usa o loader
+# em cache quando ``loaders`` não é definido; explícito aqui para não se
+# perder se alguém acrescentar um loader.
+TEMPLATES[0]['APP_DIRS'] = False
+TEMPLATES[0]['OPTIONS']['loaders'] = [
+    ('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]),
+]
 
 # Configurações de mídia para produção
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -137,8 +168,25 @@
 SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
 SESSION_CACHE_ALIAS = 'default'
 
+# Instrumentação (core.middleware): requisições acima do limite vão para
+# o logger core.performance, com as queries mais lentas
+PULSE_REQUISICAO_LENTA_MS = 500
+PULSE_REQUISICAO_LENTA_TOP_QUERIES = 5
+
+# Dashboard assíncrono (core.panels): painéis calculados em paralelo, cada
+# um com seu tempo limite; threads = conexões simultâneas com o banco
+PULSE_PAINEIS_THREADS = 4
+PULSE_PAINEL_TIMEOUT = 2.0
+
+# Tarefas em segundo plano (core.tasks): executadas por `manage.py run_worker`
+PULSE_TAREFAS_BACKEND = 'banco'
+PULSE_TAREFAS_TEMPO_LIMITE = 60 * 60
+# Horário (local) do envio diário dos lembretes: `manage.py send_reminders --agendar`
+PULSE_LEMBRETES_HORARIO = '18:00'
+
 # Middleware adicional para produção
 MIDDLEWARE.insert(1, 'django.middleware.security.SecurityMiddleware')
+MIDDLEWARE.insert(0, 'core.middleware.ArquivosEstaticosMiddleware')
 
 print("⚙️ Configurações de PRODUÇÃO carregadas!")
 print("🔒 Modo DEBUG desabilitado")
@@ -0,0 +1,33 @@
+// JavaScript para melhorar a experiência
+document.addEventListener('DOMContentLoaded', function() {
+    // Adicionar indicador de loading nos formulários
+    const forms = document.querySelectorAll('form');
+    forms.forEach(form => {
+        form.addEventListener('submit', function() {
+            const submitBtn = form.querySelector('input[type="submit"], button[type="submit"]');
+            if (submitBtn) {
+                submitBtn.innerHTML = '<span class="loading"></span> Salvando...';
+                submitBtn.disabled = true;
+            }
+        });
+    });
+
+    // Melhorar tooltips
+    const tooltips = document.querySelectorAll('[title]');
+    tooltips.forEach(element => {
+        element.style.cursor = 'help';
+    });
+
+    // Adicionar confirmação para deletar
+    const deleteLinks = document.querySelectorAll('a[href*="delete"]');
+    deleteLinks.forEach(link => {
+        link.addEventListener('click', function(e) {
+            if (!confirm('Tem certeza que deseja excluir este item?')) {
+                e.preventDefault();
+            }
+        });
+    });
+
+    // Melhorar navegação
+    console.log('🎨 Interface administrativa Pulse carregada com sucesso!');
+});
@@ -444,39 +444,6 @@ function animateStats() {
     });
 }
 
-// ========================================== 
-//           ATUALIZAÇÃO EM TEMPO REAL
-// ==========================================
-function updateRealTimeData() {
-    // Simular dados atualizados
-    const updates = {
-        pacientesHoje: Math.floor(Math.random() * 20) + 15,
-        receitaDia: Math.floor(Math.random() * 3000) + 2000,
-        consultasMes: Math.floor(Math.random() * 100) + 450,
-        satisfacao: Math.floor(Math.random() * 10) + 90
-    };
-    
-    // Atualizar elementos na página
-    Object.keys(updates).forEach(key => {
-        const element = document.getElementById(key);
-        if (element) {
-            const currentValue = parseInt(element.textContent);
-            const newValue = updates[key];
-            
-            if (currentValue !== newValue) {
-                element.style.transform = 'scale(1.1)';
-                element.style.color = '#8e44ad';
-                
-                setTimeout(() => {
-                    element.textContent = newValue;
-                    element.style.transform = 'scale(1)';
-                    element.style.color = '';
-                }, 300);
-            }
-        }
-    });
-}
-
 // ========================================== 
 //           FRASES MOTIVACIONAIS
 // ==========================================
@@ -514,9 +481,6 @@ document.addEventListener('DOMContentLoaded', function() {
     // Atualizar frase motivacional a cada 30 segundos
     setInterval(updateMotivationalQuote, 30000);
     
-    // Atualizar dados em tempo real a cada 10 segundos
-    setInterval(updateRealTimeData, 10000);
-    
     // Adicionar animações de entrada
     const elements = document.querySelectorAll('.stat-card-advanced, .chart-card, .notifications-panel');
     elements.forEach((el, index) => {
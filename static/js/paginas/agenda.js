@@ -0,0 +1,92 @@
+document.addEventListener('DOMContentLoaded', function() {
+    // Date navigation
+    const currentDateEl = document.getElementById('currentDate');
+    const prevDayBtn = document.getElementById('prevDay');
+    const nextDayBtn = document.getElementById('nextDay');
+
+    let currentDate = new Date();
+
+    function updateDateDisplay() {
+        const options = { 
+            weekday: 'long', 
+            year: 'numeric', 
+            month: 'long', 
+            day: 'numeric' 
+        };
+        currentDateEl.textContent = currentDate.toLocaleDateString('pt-BR', options);
+    }
+
+    prevDayBtn.addEventListener('click', function() {
+        currentDate.setDate(currentDate.getDate() - 1);
+        updateDateDisplay();
+        // Here you would reload appointment data
+    });
+
+    nextDayBtn.addEventListener('click', function() {
+        currentDate.setDate(currentDate.getDate() + 1);
+        updateDateDisplay();
+        // Here you would reload appointment data
+    });
+
+    // View selector
+    const viewButtons = document.querySelectorAll('.view-btn');
+    viewButtons.forEach(btn => {
+        btn.addEventListener('click', function() {
+            viewButtons.forEach(b => b.classList.remove('active'));
+            this.classList.add('active');
+
+            const view = this.dataset.view;
+            console.log('View changed to:', view);
+            // Here you would change the agenda view
+        });
+    });
+
+    // Empty slot click handlers
+    const emptySlots = document.querySelectorAll('.empty-slot');
+    emptySlots.forEach(slot => {
+        slot.addEventListener('click', function() {
+            // Here you would open a new appointment modal
+            console.log('Create new appointment at this time slot');
+        });
+    });
+
+    // Appointment card interactions
+    const appointmentCards = document.querySelectorAll('.appointment-card');
+    appointmentCards.forEach(card => {
+        card.addEventListener('click', function(e) {
+            if (!e.target.closest('.appointment-actions')) {
+                // Here you would open appointment details
+                console.log('Open appointment details');
+            }
+        });
+    });
+
+    // Action button handlers
+    document.querySelectorAll('.action-btn').forEach(btn => {
+        btn.addEventListener('click', function(e) {
+            e.stopPropagation();
+
+            const icon = this.querySelector('i');
+            if (icon.classList.contains('fa-edit')) {
+                console.log('Edit appointment');
+            } else if (icon.classList.contains('fa-times')) {
+                console.log('Cancel appointment');
+            } else if (icon.classList.contains('fa-check')) {
+                console.log('Confirm appointment');
+            } else if (icon.classList.contains('fa-redo')) {
+                console.log('Reschedule appointment');
+            }
+        });
+    });
+
+    // Quick action handlers
+    document.querySelectorAll('.quick-action-btn').forEach(btn => {
+        btn.addEventListener('click', function() {
+            const text = this.textContent.trim();
+            console.log('Quick action:', text);
+        });
+    });
+
+    // Initialize date display
+    updateDateDisplay();
+});
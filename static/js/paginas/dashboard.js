@@ -0,0 +1,46 @@
+// KPIs ao vivo: o servidor envia eventos da agenda por SSE e cada evento
+// dispara uma atualização; o polling (com ETag em If-None-Match, que
+// recebe 304 enquanto nada mudar) fica como rede de segurança. Os
+// endereços vêm dos atributos data-kpis-url e data-eventos-url do template.
+document.addEventListener('DOMContentLoaded', function() {
+    const painel = document.querySelector('[data-kpis-url]');
+    if (!painel) return;
+
+    let kpisEtag = null;
+    function atualizarKpis() {
+        const headers = kpisEtag ? { 'If-None-Match': kpisEtag } : {};
+        fetch(painel.dataset.kpisUrl, { headers, cache: 'no-store', credentials: 'same-origin' })
+            .then(response => {
+                if (response.status === 304 || !response.ok) return null;
+                kpisEtag = response.headers.get('ETag');
+                return response.json();
+            })
+            .then(kpis => {
+                if (!kpis) return;
+                document.querySelectorAll('[data-kpi]').forEach(element => {
+                    const key = element.getAttribute('data-kpi');
+                    if (key in kpis) {
+                        // O "R$" do faturamento é texto fixo do template.
+                        element.textContent = key === 'faturamento_mes' ? Math.round(Number(kpis[key])) : kpis[key];
+                    }
+                });
+            })
+            .catch(() => {});
+    }
+
+    let intervaloPolling = 10000;
+    if (window.EventSource && painel.dataset.eventosUrl) {
+        const eventos = new EventSource(painel.dataset.eventosUrl);
+        ['agendamento.criado', 'agendamento.status', 'agendamento.atualizado', 'agendamento.removido'].forEach(tipo => {
+            eventos.addEventListener(tipo, atualizarKpis);
+        });
+        eventos.onopen = () => { intervaloPolling = 60000; };
+        eventos.onerror = () => {
+            // Servidor sem ASGI (501) ou fora do ar: volta ao polling curto
+            if (eventos.readyState === EventSource.CLOSED) intervaloPolling = 10000;
+        };
+    }
+    (function agendarPolling() {
+        setTimeout(() => { atualizarKpis(); agendarPolling(); }, intervaloPolling);
+    })();
+});